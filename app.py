@@ -1,33 +1,280 @@
-from flask import Flask, render_template, request, send_file, Response
+from flask import Flask, abort, g, jsonify, redirect, render_template, request, stream_with_context, url_for, Response
+import functools
 import os
 import platform
-import networkx as nx
-import random
-from typing import Optional
-from scripts.mutation import mutate_word
-from scripts.visualization import (
-    plot_mutation_tree_static,
-    plot_mutation_tree_interactive,
-    save_graph
+import sys
+import time
+from typing import Dict, List, Optional
+from scripts import morphology
+from scripts import runs
+from scripts.events import EventLog, iter_sse
+from scripts.jobs import DONE, JobContext, JobQueue, read_status, write_status
+from scripts.mutation import rules
+from scripts.result_cache import make_key, open_result_cache
+from scripts.history import open_history
+from scripts.file_serving import precompress, send_artifact, send_zip
+from scripts.graph_io import GRAPH_FORMATS, graph_filename, load_mutation_graph, save_mutation_graph
+from scripts.graph_store import MutationGraph
+from scripts.metrics import (
+    PROFILING_ENABLED, maybe_write_snapshot, profiled, registry, server_timing, should_profile,
+    start_timings, stop_timings, timed,
 )
+from scripts.simulation import GenerationDelta, Simulation
 
 app = Flask(__name__)
 
-# Создаём директории для результатов
-os.makedirs('results/plots', exist_ok=True)
+
+def load_visualization():
+    """
+    Лениво импортирует модуль визуализации (matplotlib, plotly, pygraphviz).
+
+    GET-запросы и скачивание файлов не должны платить за импорт тяжёлых
+    библиотек, поэтому модуль загружается только при построении графа.
+
+    :return: Модуль scripts.visualization.
+    """
+    from scripts import visualization
+    return visualization
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Прогревает тяжёлые зависимости: модели Natasha и модуль визуализации.
+
+    Вызывается из gunicorn.conf.py до fork (preload) или в каждом воркере.
+
+    :return: Длительности этапов прогрева в секундах.
+    """
+    timings = morphology.warm_up()
+    started = time.perf_counter()
+    load_visualization()
+    timings['visualization_import'] = time.perf_counter() - started
+    return timings
+
+# Создаём директорию для результатов запусков
+os.makedirs(runs.RUNS_DIR, exist_ok=True)
+
+# Параметры симуляции веб-приложения
+SIMULATION_PARAMS: Dict[str, float] = {
+    'num_generations': 10,
+    'mutation_rate': 0.3,
+    'max_nodes': 50,
+}
+
+# Что делать с мутантом, совпавшим с известным словом: merge, distinct или resample
+CONVERGENCE = os.environ.get('MUTATO_CONVERGENCE', 'merge')
+
+# Формат статического изображения графа: png, svg или webp
+STATIC_FORMAT = os.environ.get('MUTATO_STATIC_FORMAT', 'png')
+
+# Где строится интерактивный граф: client — в браузере по потоку поколений
+# (/runs/<id>/events), server — дополнительно HTML-файл Plotly на сервере
+INTERACTIVE_RENDER = os.environ.get('MUTATO_INTERACTIVE_RENDER', 'client')
+
+# Дополнительные форматы экспорта графа помимо GraphML (через запятую)
+GRAPH_EXPORTS: List[str] = [
+    fmt for fmt in os.environ.get('MUTATO_GRAPH_EXPORTS', 'npz').split(',') if fmt in GRAPH_FORMATS
+]
+
+# Кэш результатов для повторных запросов с одинаковыми словами и зерном
+result_cache = open_result_cache()
+
+# Очередь фоновых задач генерации графов
+job_queue = JobQueue(
+    max_workers=int(os.environ.get('MUTATO_JOB_WORKERS', 2)),
+    max_renders=int(os.environ.get('MUTATO_MAX_RENDERS', 1)),
+)
+
+# Длительности этапов запроса в заголовке Server-Timing и в журнале
+TIMING_HEADER = os.environ.get('MUTATO_TIMING_HEADER', '0') == '1'
+TIMING_LOG = os.environ.get('MUTATO_TIMING_LOG', '0') == '1'
+
+registry.counter('mutato_http_requests_total', 'HTTP-запросы по обработчику, методу и коду ответа.')
+registry.histogram('mutato_http_request_seconds', 'Длительность обработки HTTP-запросов.')
+registry.counter('mutato_convergences_total', 'Мутанты, совпавшие с уже известным словом.')
+registry.counter('mutato_resampled_mutations_total', 'Повторные мутации политики resample.')
+registry.counter('mutato_rejected_mutations_total', 'Мутации, от которых политика resample отказалась.')
+registry.counter('mutato_morph_cache_hits_total', 'Попадания в кэш морфологического разбора.')
+registry.counter('mutato_morph_cache_misses_total', 'Промахи кэша морфологического разбора.')
+registry.counter('mutato_morph_cache_evictions_total', 'Вытеснения из кэша морфологического разбора.')
+registry.gauge('mutato_morph_cache_entries', 'Записи в кэшах морфологического разбора воркеров.')
+registry.counter('mutato_result_cache_hits_total', 'Попадания в кэш результатов.')
+registry.counter('mutato_result_cache_misses_total', 'Промахи кэша результатов.')
+registry.counter('mutato_result_cache_stores_total', 'Записи, сохранённые в кэш результатов.')
+registry.counter('mutato_result_cache_evictions_total', 'Вытеснения из кэша результатов.')
+registry.gauge('mutato_result_cache_entries', 'Записи в кэше результатов на диске.')
+registry.gauge('mutato_result_cache_bytes', 'Размер кэша результатов на диске.')
+
+
+def collect_cache_metrics() -> Dict[str, int]:
+    """
+    :return: Счётчики кэшей текущего процесса для реестра метрик.
+    """
+    morph = morphology.morph_cache.stats()
+    return {
+        'mutato_morph_cache_hits_total': morph['hits'],
+        'mutato_morph_cache_misses_total': morph['misses'],
+        'mutato_morph_cache_evictions_total': morph['evictions'],
+        'mutato_morph_cache_entries': morph['size'],
+        'mutato_result_cache_hits_total': result_cache.hits,
+        'mutato_result_cache_misses_total': result_cache.misses,
+        'mutato_result_cache_stores_total': result_cache.stores,
+        'mutato_result_cache_evictions_total': result_cache.evictions,
+    }
+
+
+def collect_result_cache_size() -> Dict[str, int]:
+    """
+    :return: Размер кэша результатов на диске (общий для всех воркеров).
+    """
+    entries, size_bytes = result_cache.size()
+    return {'mutato_result_cache_entries': entries, 'mutato_result_cache_bytes': size_bytes}
+
+
+registry.register_collector(collect_cache_metrics)
+registry.register_collector(collect_result_cache_size, shared=True)
+
+def execute_run(context: JobContext, words: List[str], seed: Optional[int],
+                cache_key: Optional[str] = None) -> None:
+    """
+    Выполняет симуляцию, визуализацию и сохранение графа в папку задачи.
+
+    Запускается в фоновом потоке очереди job_queue и сообщает о прогрессе
+    через context. Если передан cache_key, готовые артефакты сохраняются
+    в кэш результатов.
+
+    :param context: Контекст задачи.
+    :param words: Начальные слова.
+    :param seed: Зерно генератора или None.
+    :param cache_key: Ключ кэша результатов или None.
+    """
+    output_dir = context.job_dir
+    simulation = Simulation(words, seed=seed, convergence=CONVERGENCE, **SIMULATION_PARAMS)
+
+    # Генерация мутаций и запись истории (разметка теггером учитывается отдельными счётчиками).
+    # Каждое поколение сразу попадает в журнал событий, который браузер читает потоком
+    graph = simulation.graph
+    history_path = os.path.join(output_dir, 'mutation_history.txt')
+    with context.stage('simulation'), open_history(history_path) as history, EventLog(output_dir) as events:
+        events.write(graph, GenerationDelta(simulation.generation, 0, len(graph), 0, graph.number_of_edges()))
+        for delta in simulation.iter_generations(history):
+            events.write(graph, delta)
+            context.progress('simulation', simulation.generation, simulation.num_generations)
+    context.record_graph(len(simulation.graph), simulation.graph.number_of_edges())
+    context.stats.update(simulation.convergence_stats)
+    stats = simulation.convergence_stats
+    registry.inc('mutato_convergences_total', stats['convergences'], policy=CONVERGENCE)
+    registry.inc('mutato_resampled_mutations_total', stats['resampled'])
+    registry.inc('mutato_rejected_mutations_total', stats['rejected'])
+    with timed('to_networkx'):
+        G = simulation.graph.to_networkx()
+
+    # Визуализация и сохранение графа: раскладка считается один раз для обоих рендереров
+    visualization = load_visualization()
+    plots_dir = os.path.join(output_dir, 'plots')
+    with context.render_slot():
+        with context.stage('layout'):
+            layout = visualization.compute_layout(G, lineage=simulation.graph.lineage())
+        with context.stage('static_plot'):
+            visualization.plot_mutation_tree_static(G, plots_dir, layout, fmt=STATIC_FORMAT)
+        if INTERACTIVE_RENDER == 'server':
+            with context.stage('interactive_plot'):
+                plotly_js = visualization.ensure_plotly_js(app.static_folder)
+                visualization.plot_mutation_tree_interactive(
+                    G, plots_dir, layout, plotly_js=f"{app.static_url_path}/{plotly_js}"
+                )
+    with context.stage('graphml'):
+        visualization.save_graph(G, output_dir)
+    for fmt in GRAPH_EXPORTS:
+        with timed(f'export_{fmt}'):
+            save_mutation_graph(simulation.graph, os.path.join(output_dir, graph_filename('mutation_graph', fmt)), fmt)
+    with context.stage('compress'):
+        precompress(output_dir)
+
+    if cache_key is not None:
+        with timed('cache_store'):
+            result_cache.store(cache_key, output_dir)
+
+
+def execute_profiled_run(context: JobContext, *args) -> None:
+    """
+    Выполняет execute_run под профилировщиком и сохраняет отчёт в папку
+    запуска (profile.html для pyinstrument или profile.txt для cProfile).
+
+    :param context: Контекст задачи.
+    :param args: Аргументы execute_run.
+    """
+    report: Dict[str, str] = {}
+    with profiled(report):
+        execute_run(context, *args)
+    if report:
+        with open(os.path.join(context.job_dir, f"profile.{report['format']}"), 'w', encoding='utf-8') as f:
+            f.write(report['content'])
+
+
+@app.before_request
+def start_request_timing() -> Optional[Response]:
+    """
+    Начинает замер запроса. GET-запрос с ?profile=1 (при MUTATO_PROFILING=1)
+    выполняется под профилировщиком, и вместо ответа возвращается отчёт.
+    """
+    g.request_started = time.perf_counter()
+    start_timings()
+    if (request.method == 'GET' and request.args.get('profile') == '1' and PROFILING_ENABLED
+            and request.endpoint in app.view_functions and request.endpoint != 'static'):
+        report: Dict[str, str] = {}
+        with profiled(report):
+            app.make_response(app.view_functions[request.endpoint](**(request.view_args or {})))
+        if not report:
+            return Response("Профилировщик занят другим запросом.", status=503, mimetype='text/plain')
+        mimetype = 'text/html' if report['format'] == 'html' else 'text/plain'
+        return Response(report['content'], mimetype=mimetype)
+    return None
+
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    """
+    Учитывает запрос в метриках и, если включено, добавляет заголовок
+    Server-Timing и строку журнала с длительностями этапов.
+    """
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unknown'
+    registry.inc('mutato_http_requests_total', endpoint=endpoint, method=request.method,
+                 status=response.status_code)
+    registry.observe('mutato_http_request_seconds', elapsed, endpoint=endpoint)
+    timings = {**(stop_timings() or {}), 'total': elapsed}
+    if TIMING_HEADER:
+        response.headers['Server-Timing'] = server_timing(timings)
+    if TIMING_LOG:
+        app.logger.info("%s %s %s: %s", request.method, request.path, response.status_code,
+                        ', '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in timings.items()))
+    maybe_write_snapshot()
+    return response
+
+
+@app.teardown_request
+def stop_request_timing(error: Optional[BaseException] = None) -> None:
+    """Завершает сбор длительностей этапов запроса, даже если он завершился ошибкой."""
+    stop_timings()
 
 @app.route('/', methods=['GET', 'POST'])
 def index() -> str:
     """
-    Обрабатывает главную страницу: получение слов от пользователя,
-    генерацию и визуализацию мутаций, сохранение результатов.
+    Обрабатывает главную страницу: получение слов от пользователя
+    и постановку генерации графа мутаций в очередь.
 
     GET: Возвращает шаблон index.html.
-    POST: Принимает слова, генерирует граф мутаций,
-    сохраняет историю, статичный и интерактивный графы,
-    сохраняет GraphML и возвращает шаблон result.html.
+    POST: Принимает слова, создаёт папку запуска, ставит симуляцию,
+    визуализацию и сохранение результатов в фоновую очередь и сразу
+    перенаправляет на страницу запуска, где отображается прогресс.
+    Запросы с зерном, результат которых уже есть в кэше, выполняются
+    без симуляции и рендеринга.
 
-    :return: Рендеринг HTML-страницы.
+    :return: Рендеринг HTML-страницы или перенаправление.
     """
     if request.method == 'POST':
         words_input: str = request.form.get('words', '').strip()
@@ -35,74 +282,214 @@ def index() -> str:
             return render_template('index.html', error="Пожалуйста, введите хотя бы одно слово.")
 
         initial_corpus = words_input.split()
-        G = nx.DiGraph()
-
-        # Добавляем начальные узлы
-        for word in initial_corpus:
-            _, pos, _ = mutate_word(word)
-            G.add_node(word, pos=pos)
-
-        # Параметры симуляции
-        num_generations: int = 10
-        mutation_rate: float = 0.3
-        max_nodes: int = 50
-
-        # Генерация мутаций и запись истории
-        history_path = os.path.join('results', 'mutation_history.txt')
-        os.makedirs('results', exist_ok=True)
-        with open(history_path, 'w', encoding='utf-8') as history_file:
-            for _ in range(num_generations):
-                if len(G.nodes) >= max_nodes or not G.nodes:
-                    break
-                count = max(1, int(len(G.nodes) * mutation_rate))
-                to_mutate = random.sample(list(G.nodes), min(count, len(G.nodes)))
-                for w in to_mutate:
-                    new_word, pos, info = mutate_word(w)
-                    G.add_node(new_word, pos=pos)
-                    G.add_edge(w, new_word, mutation=info)
-                    history_file.write(f"{w} ({G.nodes[w]['pos']}) -> {new_word} ({pos}): {info}\n")
-
-        # Визуализация и сохранение графа
-        plot_mutation_tree_static(G)
-        plot_mutation_tree_interactive(G)
-        save_graph(G)
-
-        return render_template('result.html')
+        seed_input: str = request.form.get('seed', '').strip()
+        try:
+            seed: Optional[int] = int(seed_input) if seed_input else None
+        except ValueError:
+            return render_template('index.html', error="Зерно должно быть целым числом.")
+
+        run_id, output_dir = runs.new_run()
+        # Профилируемый запуск всегда выполняется заново, минуя кэш результатов
+        profile = should_profile(request.args.get('profile') == '1' or request.form.get('profile') == '1')
+        cache_key = None
+        if seed is not None:
+            params = {**SIMULATION_PARAMS, 'convergence': CONVERGENCE, 'static_format': STATIC_FORMAT,
+                      'graph_exports': GRAPH_EXPORTS, 'interactive_render': INTERACTIVE_RENDER}
+            cache_key = make_key(initial_corpus, params, seed, rules.digest)
+        with timed('cache_restore'):
+            restored = cache_key is not None and not profile and result_cache.restore(cache_key, output_dir)
+        if restored:
+            write_status(output_dir, DONE, cached=True)
+        else:
+            job_queue.submit(output_dir, execute_profiled_run if profile else execute_run,
+                             initial_corpus, seed, cache_key)
+        return redirect(url_for('show_result', run_id=run_id), code=303)
 
     # GET-запрос
     return render_template('index.html')
 
-@app.route('/download/<filename>')
-def download_file(filename: str) -> Response or tuple[str, int]:
+def get_run_dir(run_id: str) -> str:
+    """
+    Возвращает папку запуска или прерывает запрос с ошибкой 404.
+
+    :param run_id: Идентификатор запуска.
+    :return: Путь к папке запуска.
+    """
+    output_dir = runs.run_dir(run_id)
+    if output_dir is None:
+        abort(404, description="Результаты не найдены или устарели.")
+    return output_dir
+
+@app.route('/runs/<run_id>')
+def show_result(run_id: str) -> str:
+    """
+    Показывает страницу результатов запуска или, пока задача не завершена,
+    страницу ожидания, на которой граф растёт по мере генерации.
+
+    :param run_id: Идентификатор запуска.
+    :return: Рендеринг result.html или pending.html.
+    """
+    output_dir = get_run_dir(run_id)
+    status = read_status(output_dir) or {}
+    if status.get('status') == DONE:
+        return render_template(
+            'result.html',
+            run_id=run_id,
+            static_format=STATIC_FORMAT,
+            graph_exports=[(fmt, graph_filename('mutation_graph', fmt)) for fmt in GRAPH_EXPORTS],
+            profile=next((name for name in ('profile.html', 'profile.txt')
+                          if os.path.exists(os.path.join(output_dir, name))), None),
+            server_graph=os.path.exists(os.path.join(output_dir, 'plots', 'mutation_tree_interactive.html')),
+        )
+    return render_template('pending.html', run_id=run_id, status=status)
+
+@app.route('/runs/<run_id>/status')
+def run_status(run_id: str) -> Response:
+    """
+    Возвращает статус задачи запуска в JSON.
+
+    :param run_id: Идентификатор запуска.
+    :return: JSON со статусом, этапом и прогрессом.
+    """
+    status = read_status(get_run_dir(run_id))
+    if status is None:
+        abort(404, description="Задача не найдена.")
+    return jsonify(status)
+
+@app.route('/runs/<run_id>/events')
+def run_events(run_id: str) -> Response:
+    """
+    Транслирует поколения запуска как Server-Sent Events: новые узлы и рёбра
+    каждого поколения по мере симуляции, смену этапов и завершение задачи.
+
+    Завершённый запуск (в том числе восстановленный из кэша) отдаёт все
+    поколения сразу. Переподключение продолжает поток с заголовка Last-Event-ID.
+
+    :param run_id: Идентификатор запуска.
+    :return: Потоковый ответ text/event-stream или ошибка 404.
+    """
+    output_dir = get_run_dir(run_id)
+    if read_status(output_dir) is None:
+        abort(404, description="Задача не найдена.")
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    offset = int(last_event_id) if last_event_id.isdigit() else 0
+    response = Response(stream_with_context(iter_sse(output_dir, offset)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Отключает буферизацию ответа в nginx, иначе события приходят пачками
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/cache/stats')
+def cache_stats() -> Response:
+    """
+    Возвращает статистику кэша результатов в JSON.
+
+    :return: JSON со счётчиками попаданий, промахов, вытеснений и размером кэша.
     """
-    Предоставляет файл для скачивания из папки results.
+    return jsonify(result_cache.stats())
 
-    :param filename: Имя файла в папке results.
-    :return: Отправка файла или ошибка 404.
+@app.route('/metrics')
+def metrics() -> Response:
     """
-    file_path = os.path.join('results', filename)
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
-    return "Файл не найден.", 404
+    Возвращает метрики всех воркеров в текстовом формате Prometheus:
+    длительности этапов, счётчики теггера, статистику кэшей, размеры графов
+    и HTTP-запросы.
 
-@app.route('/graph')
-def show_graph() -> str:
+    :return: Ответ text/plain; version=0.0.4.
     """
-    Возвращает HTML контент интерактивного графа мутаций.
+    maybe_write_snapshot(force=True)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
-    :return: Строка с HTML-файлом графа.
+@app.route('/runs/<run_id>/download/<path:filename>')
+def download_file(run_id: str, filename: str) -> Response:
     """
-    html_path = os.path.join('results', 'plots', 'mutation_tree_interactive.html')
-    try:
-        with open(html_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
-        return "Граф не найден.", 404
+    Предоставляет файл запуска для скачивания.
+
+    Артефакты завершённого запуска не меняются, поэтому ответ кэшируется
+    браузером на время жизни запуска и поддерживает условные запросы.
+
+    :param run_id: Идентификатор запуска.
+    :param filename: Путь к файлу внутри папки запуска.
+    :return: Отправка файла, 304 или ошибка 404.
+    """
+    return send_artifact(get_run_dir(run_id), filename, as_attachment=True, max_age=runs.RUN_TTL)
+
+@app.route('/runs/<run_id>/download.zip')
+def download_zip(run_id: str) -> Response:
+    """
+    Отдаёт все артефакты запуска одним ZIP-архивом, собираемым на лету.
+
+    :param run_id: Идентификатор запуска.
+    :return: Потоковый ZIP, 304, ошибка 404 или 409, если запуск ещё не завершён.
+    """
+    output_dir = get_run_dir(run_id)
+    status = read_status(output_dir) or {}
+    if status.get('status') != DONE:
+        abort(409, description="Запуск ещё не завершён.")
+    return send_zip(output_dir, f"mutato-{run_id}.zip")
+
+@functools.lru_cache(maxsize=16)
+def load_run_graph(path: str, mtime_ns: int) -> MutationGraph:
+    """
+    Загружает экспорт графа запуска; результат кэшируется вместе с его
+    индексом родословной, пока файл не изменился.
+
+    :param path: Путь к файлу графа.
+    :param mtime_ns: Время изменения файла (часть ключа кэша).
+    :return: MutationGraph.
+    """
+    return load_mutation_graph(path)
+
+@app.route('/runs/<run_id>/lineage')
+def run_lineage(run_id: str) -> Response:
+    """
+    Отвечает на запросы к родословной графа запуска.
+
+    Без параметров возвращает сводку по начальным словам; с ?word=
+    корень, глубину, поколение, предков и потомков слова (не больше ?limit=).
+    Граф читается из экспорта (MUTATO_GRAPH_EXPORTS), а не из GraphML.
+
+    :param run_id: Идентификатор запуска.
+    :return: JSON или ошибка 404.
+    """
+    output_dir = get_run_dir(run_id)
+    for fmt in GRAPH_EXPORTS:
+        path = os.path.join(output_dir, graph_filename('mutation_graph', fmt))
+        if os.path.exists(path):
+            break
+    else:
+        abort(404, description="Граф запуска не сохранён в формате экспорта.")
+    lineage = load_run_graph(path, os.stat(path).st_mtime_ns).lineage()
+
+    word = request.args.get('word')
+    if word is None:
+        return jsonify([stats._asdict() for stats in lineage.root_stats()])
+    if word not in lineage.graph:
+        abort(404, description="Слова нет в графе.")
+    limit = min(max(request.args.get('limit', 1000, type=int), 0), 10000)
+    return jsonify(lineage.describe(word, limit))
+
+@app.route('/runs/<run_id>/graph')
+def show_graph(run_id: str) -> Response:
+    """
+    Возвращает HTML интерактивного графа мутаций запуска.
+
+    :param run_id: Идентификатор запуска.
+    :return: HTML-файл графа или ошибка 404.
+    """
+    return send_artifact(get_run_dir(run_id), 'plots/mutation_tree_interactive.html', max_age=runs.RUN_TTL)
 
 if __name__ == '__main__':
     """
     Запускает Flask-приложение через waitress на Windows или встроенный сервер для других ОС.
+
+    С флагом --startup-timing только измеряет время прогрева зависимостей и завершается.
     """
+    if '--startup-timing' in sys.argv:
+        for stage, seconds in warm_up().items():
+            print(f"{stage:<22}{seconds * 1000:10.1f} мс")
+        sys.exit(0)
+
     port = int(os.environ.get('PORT', 5000))
     if platform.system() == 'Windows':
         from waitress import serve
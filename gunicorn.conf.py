@@ -0,0 +1,59 @@
+import gc
+import os
+
+# Загружаем приложение и модели в мастер-процессе до fork, чтобы воркеры
+# разделяли память моделей Natasha через copy-on-write.
+# MUTATO_PRELOAD=0 отключает предзагрузку: тогда каждый воркер прогревается сам.
+preload_app = os.environ.get('MUTATO_PRELOAD', '1') != '0'
+
+# Поток поколений (/runs/<id>/events) держит соединение открытым, пока идут
+# события (не дольше MUTATO_STREAM_IDLE_SECONDS без них), поэтому воркеру
+# нужны потоки (gthread), чтобы параллельно отвечать на другие запросы.
+threads = int(os.environ.get('MUTATO_THREADS', 8))
+
+
+def on_starting(server):
+    """
+    Удаляет снимки метрик воркеров прошлого запуска сервера и помечает
+    как неудачные задачи, которые остались незавершёнными в их очередях.
+    """
+    from scripts.jobs import fail_unfinished_jobs
+    from scripts.metrics import clear_snapshots
+    from scripts.runs import RUNS_DIR
+    clear_snapshots()
+    failed = fail_unfinished_jobs(RUNS_DIR)
+    if failed:
+        server.log.info("Незавершённых задач прошлого запуска помечено как неудачные: %d", failed)
+
+
+def when_ready(server):
+    """
+    Прогревает модели в мастер-процессе перед запуском воркеров.
+
+    gc.freeze() переносит загруженные объекты в постоянное поколение, чтобы
+    сборщик мусора в воркерах не трогал их страницы и не ломал copy-on-write.
+    """
+    if preload_app:
+        from app import warm_up
+        timings = warm_up()
+        gc.freeze()
+        server.log.info("Модели прогреты до fork за %.2f с", sum(timings.values()))
+
+
+def post_fork(server, worker):
+    """
+    Без предзагрузки прогревает модели сразу после запуска воркера,
+    а не на первом запросе.
+    """
+    if not preload_app:
+        from scripts.morphology import warm_up
+        warm_up()
+
+
+def child_exit(server, worker):
+    """
+    Исключает текущие значения (гауги) завершившегося воркера из /metrics,
+    сохраняя его счётчики.
+    """
+    from scripts.metrics import retire_snapshot
+    retire_snapshot(worker.pid)
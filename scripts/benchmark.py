@@ -0,0 +1,406 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+try:
+    from .corpus import Corpus, CORPUS_PATH
+    from .graph_io import graph_filename, load_mutation_graph, save_mutation_graph
+    from .layout import compute_layout
+    from .lineage import LineageIndex
+    from .morphology import analyze_words, morph_cache, tag_words, warm_up
+    from .mutation import mutate_words, rules
+    from .simulation import Simulation
+except ImportError:
+    from corpus import Corpus, CORPUS_PATH
+    from graph_io import graph_filename, load_mutation_graph, save_mutation_graph
+    from layout import compute_layout
+    from lineage import LineageIndex
+    from morphology import analyze_words, morph_cache, tag_words, warm_up
+    from mutation import mutate_words, rules
+    from simulation import Simulation
+
+# Версия формата отчёта; меняется при несовместимом изменении полей
+REPORT_VERSION = 1
+DEFAULT_SIZES = (50, 5000)
+# Размеры наборов слов для разметки и мутации не растут вместе с графом
+WORD_SET_CAP = 20000
+SEED_WORDS = 5
+
+
+class StageResult(NamedTuple):
+    """Результат замера одного этапа на одном размере графа."""
+    stage: str
+    size: int
+    units: float
+    unit: str
+    latencies: List[float]
+    peak_memory: Optional[int]
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = np.array(self.latencies)
+        median = float(np.median(latencies))
+        return {
+            'stage': self.stage,
+            'size': self.size,
+            'runs': len(self.latencies),
+            'latency_s': {
+                'min': float(latencies.min()),
+                'mean': float(latencies.mean()),
+                'p50': median,
+                'p90': float(np.percentile(latencies, 90)),
+                'p99': float(np.percentile(latencies, 99)),
+                'max': float(latencies.max()),
+            },
+            'throughput': {'value': self.units / median if median > 0 else None,
+                           'unit': f"{self.unit}/s"},
+            'units': self.units,
+            'peak_memory_bytes': self.peak_memory,
+        }
+
+
+def measure(fn: Callable[[], Any], setup: Optional[Callable[[], None]] = None,
+            repeat: int = 5, budget: float = 20.0,
+            trace_memory: bool = True) -> Tuple[List[float], Optional[int]]:
+    """
+    Замеряет функцию: один прогрев (с tracemalloc для пикового потребления
+    памяти), затем до repeat замеров, пока не исчерпан бюджет времени.
+
+    :param fn: Замеряемая функция.
+    :param setup: Подготовка перед каждым запуском (не входит в замер).
+    :param repeat: Максимальное число замеров.
+    :param budget: Бюджет времени на замеры в секундах (минимум один замер).
+    :param trace_memory: Измерять ли пик памяти Python-аллокаций.
+    :return: Кортеж (длительности замеров в секундах, пик памяти в байтах или None).
+    """
+    peak = None
+    if setup is not None:
+        setup()
+    if trace_memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    else:
+        fn()
+
+    latencies: List[float] = []
+    spent = 0.0
+    while len(latencies) < repeat and (not latencies or spent < budget):
+        if setup is not None:
+            setup()
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        latencies.append(elapsed)
+        spent += elapsed
+    return latencies, peak
+
+
+class BenchmarkContext:
+    """Фиксированные входные данные замеров для одного размера графа."""
+
+    def __init__(self, corpus: Corpus, size: int, seed: int, workdir: str) -> None:
+        self.size = size
+        self.seed = seed
+        self.workdir = workdir
+        word_count = min(size, WORD_SET_CAP, len(corpus))
+        self.words = corpus.sample(word_count, random.Random(seed))
+        self.seed_words = self.words[:SEED_WORDS]
+        rng = np.random.default_rng(seed)
+        self.draws = rng.random((len(self.words), 2)).tolist()
+        self._graph = None
+        self._nx_graph = None
+        self._layout = None
+
+    def simulation(self) -> Simulation:
+        return Simulation(self.seed_words, num_generations=10 ** 9, mutation_rate=0.3,
+                          max_nodes=self.size, seed=self.seed)
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = self.simulation().run()
+        return self._graph
+
+    @property
+    def nx_graph(self):
+        if self._nx_graph is None:
+            self._nx_graph = self.graph.to_networkx()
+        return self._nx_graph
+
+    @property
+    def layout(self):
+        if self._layout is None:
+            self._layout = compute_layout(self.nx_graph)
+        return self._layout
+
+
+def _visualization():
+    """Лениво импортирует модуль визуализации (matplotlib, plotly)."""
+    try:
+        from . import visualization
+    except ImportError:
+        import visualization
+    return visualization
+
+
+def _file_megabytes(path: str) -> float:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(path) for name in names) / 1e6
+    return os.path.getsize(path) / 1e6
+
+
+def _run_simulation(ctx: BenchmarkContext) -> Tuple[Callable[[], Any], None, float, str]:
+    def fn():
+        ctx._graph = ctx.simulation().run()
+    # Последнее поколение перескакивает max_nodes, поэтому пропускная способность
+    # считается по фактическому числу узлов; симуляция с зерном даёт тот же граф
+    return fn, None, len(ctx.graph), 'nodes'
+
+
+def _run_tagging(ctx: BenchmarkContext):
+    return (lambda: tag_words(ctx.words)), None, len(ctx.words), 'words'
+
+
+def _run_analysis(ctx: BenchmarkContext):
+    # Холодный кэш: индекс и пакетная разметка промахов
+    return (lambda: analyze_words(ctx.words)), morph_cache.clear, len(ctx.words), 'words'
+
+
+def _run_mutation(ctx: BenchmarkContext):
+    analyze_words(ctx.words)
+    return (lambda: mutate_words(ctx.words, ctx.draws)), None, len(ctx.words), 'mutations'
+
+
+def _run_to_networkx(ctx: BenchmarkContext):
+    graph = ctx.graph
+    return graph.to_networkx, None, len(graph), 'nodes'
+
+
+def _run_lineage(ctx: BenchmarkContext):
+    graph = ctx.graph
+
+    def fn():
+        # Новый индекс на каждый замер: интервалы Эйлера и сводка по корням с нуля
+        LineageIndex(graph).root_stats()
+    return fn, None, len(graph), 'nodes'
+
+
+def _run_layout(ctx: BenchmarkContext):
+    graph = ctx.nx_graph
+    copies: List[Any] = []
+
+    def setup():
+        # compute_layout кэширует раскладку на графе, поэтому каждый замер — на копии
+        copies[:] = [graph.copy()]
+    return (lambda: compute_layout(copies[0])), setup, len(graph), 'nodes'
+
+
+def _run_render_static(ctx: BenchmarkContext):
+    plot_mutation_tree_static = _visualization().plot_mutation_tree_static
+    graph, layout = ctx.nx_graph, ctx.layout
+    output_dir = os.path.join(ctx.workdir, 'plots')
+    return (lambda: plot_mutation_tree_static(graph, output_dir, layout)), None, len(graph), 'nodes'
+
+
+def _run_render_interactive(ctx: BenchmarkContext):
+    plot_mutation_tree_interactive = _visualization().plot_mutation_tree_interactive
+    graph, layout = ctx.nx_graph, ctx.layout
+    output_dir = os.path.join(ctx.workdir, 'plots')
+    return ((lambda: plot_mutation_tree_interactive(graph, output_dir, layout, plotly_js='plotly.min.js')),
+            None, len(graph), 'nodes')
+
+
+def _run_export_graphml(ctx: BenchmarkContext):
+    save_graph = _visualization().save_graph
+    graph = ctx.nx_graph
+    save_graph(graph, ctx.workdir)
+    size = _file_megabytes(os.path.join(ctx.workdir, 'mutation_graph.graphml'))
+    return (lambda: save_graph(graph, ctx.workdir)), None, size, 'MB'
+
+
+def _export_stage(fmt: str):
+    def stage(ctx: BenchmarkContext):
+        path = os.path.join(ctx.workdir, graph_filename('mutation_graph', fmt))
+        save_mutation_graph(ctx.graph, path, fmt)
+        return (lambda: save_mutation_graph(ctx.graph, path, fmt)), None, _file_megabytes(path), 'MB'
+    return stage
+
+
+def _load_stage(fmt: str):
+    def stage(ctx: BenchmarkContext):
+        path = os.path.join(ctx.workdir, graph_filename('mutation_graph', fmt))
+        save_mutation_graph(ctx.graph, path, fmt)
+        return (lambda: load_mutation_graph(path, fmt)), None, _file_megabytes(path), 'MB'
+    return stage
+
+
+# Фабрика этапа возвращает (замеряемая функция, подготовка или None, объём работы, единица объёма)
+StageFactory = Callable[[BenchmarkContext], Tuple[Callable[[], Any], Optional[Callable[[], None]], float, str]]
+
+# Этапы в порядке выполнения
+STAGES: Dict[str, StageFactory] = {
+    'tagging': _run_tagging,
+    'analysis': _run_analysis,
+    'mutation': _run_mutation,
+    'simulation': _run_simulation,
+    'to_networkx': _run_to_networkx,
+    'lineage': _run_lineage,
+    'layout': _run_layout,
+    'render_static': _run_render_static,
+    'render_interactive': _run_render_interactive,
+    'export_graphml': _run_export_graphml,
+    'export_npz': _export_stage('npz'),
+    'export_binary': _export_stage('binary'),
+    'export_jsonl': _export_stage('jsonl'),
+    'load_npz': _load_stage('npz'),
+    'load_binary': _load_stage('binary'),
+    'load_jsonl': _load_stage('jsonl'),
+}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: List[int], stages: List[str], seed: int = 42, repeat: int = 5,
+                   budget: float = 20.0, trace_memory: bool = True,
+                   corpus_path: str = CORPUS_PATH) -> Dict[str, Any]:
+    """
+    Выполняет замеры всех этапов на всех размерах графа.
+
+    Слова берутся из корпуса с фиксированным зерном, симуляция тоже
+    детерминирована, поэтому входные данные совпадают между коммитами.
+
+    :param sizes: Размеры графа (число узлов).
+    :param stages: Имена этапов из STAGES.
+    :param seed: Зерно выборки слов и симуляции.
+    :param repeat: Максимальное число замеров этапа.
+    :param budget: Бюджет времени на замеры одного этапа в секундах.
+    :param trace_memory: Измерять ли пик памяти.
+    :param corpus_path: Путь к корпусу.
+    :return: Отчёт (JSON-сериализуемый словарь).
+    """
+    warm_up()
+    results = []
+    with Corpus(corpus_path) as corpus:
+        for size in sizes:
+            workdir = tempfile.mkdtemp(prefix='mutato-bench-')
+            try:
+                ctx = BenchmarkContext(corpus, size, seed, workdir)
+                for stage in stages:
+                    # Сообщения рендереров и экспорта не должны смешиваться с JSON-отчётом
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        fn, setup, units, unit = STAGES[stage](ctx)
+                        latencies, peak = measure(fn, setup, repeat, budget, trace_memory)
+                    result = StageResult(stage, size, units, unit, latencies, peak).to_dict()
+                    results.append(result)
+                    throughput = result['throughput']
+                    print(f"{stage:>20} size={size:<8} p50={result['latency_s']['p50']:.4f} с "
+                          f"{throughput['value'] or 0:,.1f} {throughput['unit']}", file=sys.stderr)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'version': REPORT_VERSION,
+        'meta': {
+            'commit': _git_commit(),
+            'rules': rules.digest,
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+            'sizes': sizes,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Сравнивает два отчёта по медианной задержке.
+
+    :param baseline: Отчёт базового коммита.
+    :param current: Отчёт текущего коммита.
+    :return: Список {stage, size, baseline_s, current_s, ratio}; ratio < 1 — ускорение.
+    """
+    base = {(r['stage'], r['size']): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = base.get((result['stage'], result['size']))
+        if old is None:
+            continue
+        old_p50, new_p50 = old['latency_s']['p50'], result['latency_s']['p50']
+        rows.append({
+            'stage': result['stage'],
+            'size': result['size'],
+            'baseline_s': old_p50,
+            'current_s': new_p50,
+            'ratio': new_p50 / old_p50 if old_p50 > 0 else None,
+        })
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Замеры производительности этапов MUTATO.")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="размеры графа через запятую (например, 50,5000,500000)")
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"этапы через запятую: {', '.join(STAGES)}")
+    parser.add_argument('--seed', type=int, default=42, help="зерно выборки слов и симуляции")
+    parser.add_argument('--repeat', type=int, default=5, help="максимальное число замеров этапа")
+    parser.add_argument('--budget', type=float, default=20.0,
+                        help="бюджет времени на замеры одного этапа, секунд")
+    parser.add_argument('--no-memory', action='store_true', help="не измерять пик памяти")
+    parser.add_argument('--corpus', default=CORPUS_PATH, help="путь к корпусу")
+    parser.add_argument('--output', default=None, help="файл JSON-отчёта (по умолчанию stdout)")
+    parser.add_argument('--compare', default=None, metavar='BASELINE',
+                        help="JSON-отчёт базового коммита для сравнения")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"неизвестные этапы: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    report = run_benchmarks(sizes, stages, args.seed, args.repeat, args.budget,
+                            not args.no_memory, args.corpus)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            report['comparison'] = compare_reports(json.load(f), report)
+        for row in report['comparison']:
+            ratio = f"x{row['ratio']:.2f}" if row['ratio'] is not None else "n/a"
+            print(f"{row['stage']:>20} size={row['size']:<8} {row['baseline_s']:.4f} с -> "
+                  f"{row['current_s']:.4f} с ({ratio})", file=sys.stderr)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"Отчёт сохранён по пути: {args.output}", file=sys.stderr)
+    else:
+        print(text)
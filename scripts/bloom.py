@@ -0,0 +1,78 @@
+import hashlib
+import math
+from typing import Iterable
+
+# Ниже этой вероятности ложного срабатывания фильтр не настраивается:
+# число хеш-функций растёт, а выигрыш в точности уже не нужен
+MIN_ERROR_RATE = 1e-9
+
+
+class BloomFilter:
+    """
+    Вероятностное множество строк фиксированного размера.
+
+    Проверка «слово уже встречалось» никогда не даёт ложного отрицания и
+    даёт ложное срабатывание с вероятностью около error_rate, пока добавлено
+    не больше capacity слов. Память — около 1,2 байта на слово при 1 %
+    ошибок и не растёт с числом добавлений, поэтому фильтр подходит для
+    очень длинных симуляций, где словарь всех слов не помещается в память.
+
+    Битовые позиции получаются двойным хешированием одного BLAKE2b-дайджеста,
+    поэтому результат одинаков во всех процессах и запусках (в отличие от hash()).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        """
+        :param capacity: Ожидаемое число слов.
+        :param error_rate: Допустимая доля ложных срабатываний (0 < error_rate < 1).
+        :raises ValueError: при недопустимых параметрах.
+        """
+        if capacity <= 0:
+            raise ValueError("Ёмкость фильтра должна быть положительной.")
+        if not 0 < error_rate < 1:
+            raise ValueError("Доля ложных срабатываний должна быть между 0 и 1.")
+        error_rate = max(error_rate, MIN_ERROR_RATE)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, word: str) -> Iterable[int]:
+        digest = hashlib.blake2b(word.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        num_bits = self.num_bits
+        return ((h1 + i * h2) % num_bits for i in range(self.num_hashes))
+
+    def add(self, word: str) -> bool:
+        """
+        Добавляет слово.
+
+        :param word: Слово.
+        :return: True, если слово (вероятно) уже было в фильтре.
+        """
+        bits = self._bits
+        present = True
+        for position in self._positions(word):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        if not present:
+            self.count += 1
+        return present
+
+    def __contains__(self, word: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(word))
+
+    def __len__(self) -> int:
+        """Число добавленных различных слов (без учёта ложных срабатываний)."""
+        return self.count
+
+    @property
+    def memory_bytes(self) -> int:
+        """Размер битового массива в байтах."""
+        return len(self._bits)
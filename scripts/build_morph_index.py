@@ -0,0 +1,57 @@
+import argparse
+import os
+import time
+from typing import List
+
+try:
+    from .morphology import MORPH_INDEX_PATH, tag_words
+    from .morph_index import write_index
+except ImportError:
+    from morphology import MORPH_INDEX_PATH, tag_words
+    from morph_index import write_index
+
+
+def read_vocabulary(corpus_path: str) -> List[str]:
+    """
+    Читает уникальные очищенные слова корпуса в порядке первого появления.
+
+    :param corpus_path: Путь к файлу корпуса (одно слово в строке).
+    :return: Список уникальных слов.
+    """
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        words = (line.strip().replace("?", "") for line in f)
+        return list(dict.fromkeys(word for word in words if word))
+
+
+def build_morph_index(corpus_path: str, index_path: str, batch_size: int = 5000) -> int:
+    """
+    Размечает все слова корпуса и записывает бинарный индекс части речи и рода.
+
+    :param corpus_path: Путь к файлу корпуса.
+    :param index_path: Путь к итоговому файлу индекса.
+    :param batch_size: Число слов, размечаемых за один вызов теггера.
+    :return: Количество слов в индексе.
+    """
+    vocabulary = read_vocabulary(corpus_path)
+    entries = []
+    started = time.perf_counter()
+    for start in range(0, len(vocabulary), batch_size):
+        batch = vocabulary[start:start + batch_size]
+        entries.extend((a.word, a.pos, a.gender) for a in tag_words(batch))
+        print(f"Размечено {len(entries)}/{len(vocabulary)} слов "
+              f"({time.perf_counter() - started:.1f} с)")
+    return write_index(entries, index_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Сборка морфологического индекса корпуса.")
+    parser.add_argument('--corpus', default=os.path.join('data', 'corpus.txt'),
+                        help="путь к корпусу (по умолчанию data/corpus.txt)")
+    parser.add_argument('--output', default=MORPH_INDEX_PATH,
+                        help="путь к файлу индекса")
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help="число слов в одном вызове теггера")
+    args = parser.parse_args()
+
+    count = build_morph_index(args.corpus, args.output, args.batch_size)
+    print(f"Индекс из {count} слов сохранён по пути: {os.path.normpath(args.output)}")
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Tuple
+
+try:
+    from .graph_io import GRAPH_FORMATS, graph_filename, load_mutation_graph, save_mutation_graph
+    from .graph_store import MutationGraph
+except ImportError:
+    from graph_io import GRAPH_FORMATS, graph_filename, load_mutation_graph, save_mutation_graph
+    from graph_store import MutationGraph
+
+# Контрольная точка — папка с файлом состояния и файлом графа, на который
+# оно ссылается. Состояние заменяется атомарно и только после того, как
+# новый граф полностью записан, поэтому прерывание в любой момент оставляет
+# последнюю целую контрольную точку.
+STATE_FILE = 'checkpoint.json'
+CHECKPOINT_VERSION = 1
+# Форматы графа, пригодные для контрольных точек (один файл)
+CHECKPOINT_FORMATS = ('binary', 'npz')
+
+
+def _fsync_file(path: str) -> None:
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def write_checkpoint(directory: str, graph: MutationGraph, state: Dict[str, Any],
+                     graph_format: str = 'binary') -> str:
+    """
+    Записывает контрольную точку: граф и состояние симуляции.
+
+    :param directory: Папка контрольной точки.
+    :param graph: Граф мутаций.
+    :param state: Состояние симуляции (JSON-сериализуемое).
+    :param graph_format: Формат файла графа: 'binary' (компактный) или 'npz' (быстрый).
+    :return: Путь к файлу состояния.
+    :raises ValueError: при неподходящем формате графа.
+    """
+    if graph_format not in CHECKPOINT_FORMATS:
+        raise ValueError(f"Формат графа не подходит для контрольной точки: {graph_format}")
+    os.makedirs(directory, exist_ok=True)
+    generation = state.get('generation', 0)
+    graph_name = graph_filename(f"graph-{generation:08d}", graph_format)
+    graph_path = os.path.join(directory, graph_name)
+    tmp_graph = os.path.join(directory, f".{graph_name}.tmp{GRAPH_FORMATS[graph_format].extension}")
+    save_mutation_graph(graph, tmp_graph, graph_format)
+    _fsync_file(tmp_graph)
+    os.replace(tmp_graph, graph_path)
+
+    state_path = os.path.join(directory, STATE_FILE)
+    previous = _read_state(directory)
+    payload = {**state, 'version': CHECKPOINT_VERSION, 'graph_file': graph_name, 'graph_format': graph_format}
+    tmp_state = f"{state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_state, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_state, state_path)
+
+    # Граф предыдущей контрольной точки больше не нужен
+    if previous and previous.get('graph_file') not in (None, graph_name):
+        try:
+            os.remove(os.path.join(directory, previous['graph_file']))
+        except FileNotFoundError:
+            pass
+    return state_path
+
+
+def _read_state(directory: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(directory, STATE_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def has_checkpoint(directory: str) -> bool:
+    """
+    :param directory: Папка контрольной точки.
+    :return: True, если в папке есть целая контрольная точка.
+    """
+    return bool(_read_state(directory))
+
+
+def read_checkpoint(directory: str) -> Tuple[MutationGraph, Dict[str, Any]]:
+    """
+    Читает последнюю контрольную точку.
+
+    :param directory: Папка контрольной точки.
+    :return: Кортеж (граф, состояние симуляции).
+    :raises FileNotFoundError: если контрольной точки нет.
+    :raises ValueError: при неподдерживаемой версии.
+    """
+    state = _read_state(directory)
+    if not state:
+        raise FileNotFoundError(f"Контрольная точка не найдена: {directory}")
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия контрольной точки: {state.get('version')}")
+    graph = load_mutation_graph(os.path.join(directory, state['graph_file']), state['graph_format'])
+    return graph, state
@@ -0,0 +1,298 @@
+import mmap
+import os
+import random
+import struct
+from typing import Callable, Iterator, List, Optional
+import numpy as np
+
+try:
+    from .morphology import analyze_words
+except ImportError:
+    from morphology import analyze_words
+
+CORPUS_PATH = os.environ.get('MUTATO_CORPUS_PATH', os.path.join('data', 'corpus.txt'))
+
+# Формат индекса строк:
+#   заголовок | смещения начала непустых строк uint64[n]
+# Размер и время изменения корпуса в заголовке позволяют заметить, что
+# корпус изменился, и пересобрать индекс.
+LINE_INDEX_MAGIC = b'MUTLIDX1'
+LINE_INDEX_VERSION = 2
+LINE_INDEX_HEADER = struct.Struct('<8sBxxxQQq')  # magic, версия, строки, размер, mtime_ns
+BUILD_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Строки, от которых после str.strip() ничего не остаётся, не индексируются.
+# Такой может быть только строка, которая начинается с пробельного байта ASCII
+# или с ведущего байта пробела Юникода вне ASCII (неразрывный пробел, U+3000
+# и т. п.); только эти немногие строки проверяются точно, через str.strip().
+_MAYBE_BLANK_START = np.zeros(256, dtype=bool)
+_MAYBE_BLANK_START[[c for c in range(128) if chr(c).isspace()]] = True
+_MAYBE_BLANK_START[[chr(c).encode('utf-8')[0] for c in range(128, 0x3001) if chr(c).isspace()]] = True
+
+
+def line_index_path(corpus_path: str) -> str:
+    """
+    :param corpus_path: Путь к корпусу.
+    :return: Путь к индексу строк рядом с корпусом (data/corpus.lines.idx).
+    """
+    return os.path.splitext(corpus_path)[0] + '.lines.idx'
+
+
+def _blank_lines(chunk: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    :param chunk: Байты блока корпуса.
+    :param starts: Начала строк в блоке.
+    :param ends: Концы строк в блоке (позиции переводов строки).
+    :return: Маска строк, состоящих только из пробельных символов.
+    """
+    blank = ends == starts
+    first = chunk[np.minimum(starts, len(chunk) - 1)]
+    for i in np.flatnonzero(~blank & _MAYBE_BLANK_START[first]).tolist():
+        blank[i] = not chunk[starts[i]:ends[i]].tobytes().decode('utf-8', errors='replace').strip()
+    return blank
+
+
+def build_line_index(corpus_path: str, index_path: str) -> int:
+    """
+    Потоково строит индекс начал непустых строк корпуса.
+
+    Корпус читается блоками фиксированного размера, переводы строк ищутся
+    numpy, поэтому память не зависит от размера корпуса. Каждый блок
+    обрабатывается до последнего перевода строки, так что строки не
+    разрываются между блоками. Пустые строки и строки из одних пробельных
+    символов пропускаются — индекс совпадает с тем, что выдаёт
+    Corpus.iter_chunks. Файл индекса записывается атомарно.
+
+    :param corpus_path: Путь к корпусу (одно слово в строке, UTF-8).
+    :param index_path: Путь к файлу индекса.
+    :return: Количество строк в индексе.
+    """
+    stat = os.stat(corpus_path)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    count = 0
+    with open(corpus_path, 'rb') as source, open(tmp_path, 'wb') as target:
+        target.write(LINE_INDEX_HEADER.pack(LINE_INDEX_MAGIC, 0, 0, 0, 0))
+        position = 0
+        buffer = bytearray(BUILD_CHUNK_SIZE)
+        while True:
+            source.seek(position)
+            size = source.readinto(buffer)
+            if not size:
+                break
+            chunk = np.frombuffer(buffer, dtype=np.uint8, count=size)
+            ends = np.flatnonzero(chunk == 10)
+            at_end = size < len(buffer)
+            if not len(ends) and not at_end:
+                # Строка длиннее блока: перечитываем блоком вдвое больше
+                buffer = bytearray(2 * len(buffer))
+                continue
+            if at_end and (not len(ends) or ends[-1] != size - 1):
+                # Последняя строка без завершающего перевода строки
+                ends = np.append(ends, size)
+            starts = np.concatenate(([0], ends[:-1] + 1))
+            keep = ~_blank_lines(chunk, starts, ends)
+            target.write((starts[keep] + position).astype('<u8').tobytes())
+            count += int(keep.sum())
+            position += int(ends[-1]) + 1
+        target.seek(0)
+        target.write(LINE_INDEX_HEADER.pack(
+            LINE_INDEX_MAGIC, LINE_INDEX_VERSION, count, stat.st_size, stat.st_mtime_ns
+        ))
+    os.replace(tmp_path, index_path)
+    return count
+
+
+def _index_is_fresh(index_path: str, corpus_path: str) -> bool:
+    try:
+        with open(index_path, 'rb') as f:
+            magic, version, count, size, mtime_ns = LINE_INDEX_HEADER.unpack(f.read(LINE_INDEX_HEADER.size))
+        stat = os.stat(corpus_path)
+        return (magic == LINE_INDEX_MAGIC and version == LINE_INDEX_VERSION
+                and size == stat.st_size and mtime_ns == stat.st_mtime_ns
+                and os.path.getsize(index_path) == LINE_INDEX_HEADER.size + 8 * count)
+    except (OSError, struct.error):
+        return False
+
+
+class Corpus:
+    """
+    Доступ к корпусу «одно слово в строке» без загрузки его в память.
+
+    Корпус и индекс начал строк отображаются в память, поэтому открытие
+    корпуса любого размера занимает O(1) памяти, строка по номеру читается
+    за O(1), а выборка k слов — за O(k). Индекс строится при первом открытии
+    и пересобирается, если корпус изменился.
+    """
+
+    def __init__(self, path: str = CORPUS_PATH, index_path: Optional[str] = None) -> None:
+        """
+        :param path: Путь к корпусу.
+        :param index_path: Путь к индексу строк (по умолчанию рядом с корпусом).
+        :raises FileNotFoundError: если корпус не найден.
+        """
+        self.path = path
+        self.index_path = index_path or line_index_path(path)
+        if not _index_is_fresh(self.index_path, path):
+            build_line_index(path, self.index_path)
+
+        self._corpus_mmap: Optional[mmap.mmap] = None
+        self._index_mmap: Optional[mmap.mmap] = None
+        self._count = 0
+        if os.path.getsize(path) == 0:
+            return
+        with open(path, 'rb') as f:
+            self._corpus_mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(self.index_path, 'rb') as f:
+            self._index_mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = LINE_INDEX_HEADER.unpack_from(self._index_mmap, 0)[2]
+        self._starts = np.frombuffer(self._index_mmap, dtype='<u8', count=self._count,
+                                     offset=LINE_INDEX_HEADER.size)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> str:
+        """
+        :param i: Номер непустой строки.
+        :return: Слово без пробельных символов по краям.
+        """
+        if not -self._count <= i < self._count:
+            raise IndexError("Номер строки вне корпуса.")
+        start = int(self._starts[i])
+        end = self._corpus_mmap.find(b'\n', start)
+        if end < 0:
+            end = len(self._corpus_mmap)
+        return self._corpus_mmap[start:end].decode('utf-8').strip()
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def iter_chunks(self, chunk_size: int = 10000) -> Iterator[List[str]]:
+        """
+        Перебирает корпус кусками, не загружая его целиком.
+
+        :param chunk_size: Число слов в куске.
+        :return: Итератор списков слов.
+        """
+        for start in range(0, self._count, chunk_size):
+            stop = min(start + chunk_size, self._count)
+            begin = int(self._starts[start])
+            if stop < self._count:
+                end = int(self._starts[stop])
+            else:
+                end = len(self._corpus_mmap)
+            text = self._corpus_mmap[begin:end].decode('utf-8')
+            yield [word for word in (line.strip() for line in text.split('\n')) if word]
+
+    def sample(self, k: int, rng: Optional[random.Random] = None) -> List[str]:
+        """
+        Выбирает k разных строк корпуса за O(k).
+
+        При одинаковом rng выбор совпадает с random.Random.sample по списку
+        всех строк, поэтому прежние зёрна дают те же слова.
+
+        :param k: Размер выборки (не больше размера корпуса).
+        :param rng: Генератор random.Random (по умолчанию новый случайный).
+        :return: Список слов.
+        """
+        rng = rng or random.Random()
+        return [self[i] for i in rng.sample(range(self._count), min(k, self._count))]
+
+    def sample_where(self, k: int, predicate: Optional[Callable[[str], bool]] = None,
+                     pos: Optional[str] = None, rng: Optional[random.Random] = None,
+                     batch_size: int = 256, max_draws: Optional[int] = None) -> List[str]:
+        """
+        Выбирает до k разных слов, удовлетворяющих условиям.
+
+        Кандидаты вытягиваются пакетами и отбрасываются, если не подходят;
+        часть речи пакета определяется одним вызовом analyze_words (через
+        морфологический индекс и кэш). Если подходящие слова редки и лимит
+        вытягиваний исчерпан, корпус просматривается потоково с выборкой
+        по резервуару, так что результат не зависит от удачи.
+
+        :param k: Размер выборки.
+        :param predicate: Условие на слово (см. word_filter) или None.
+        :param pos: Требуемая часть речи (UD) или None.
+        :param rng: Генератор random.Random (по умолчанию новый случайный).
+        :param batch_size: Число кандидатов в пакете.
+        :param max_draws: Лимит вытягиваний до перехода к полному просмотру
+            (по умолчанию 50 * k + 1000).
+        :return: Список подходящих слов (меньше k, если их столько нет в корпусе).
+        """
+        rng = rng or random.Random()
+        if k <= 0 or not self._count:
+            return []
+        max_draws = max_draws if max_draws is not None else 50 * k + 1000
+
+        chosen: List[str] = []
+        seen = set()
+        draws = 0
+        while len(chosen) < k and draws < max_draws and len(seen) < self._count:
+            batch = [rng.randrange(self._count) for _ in range(batch_size)]
+            draws += batch_size
+            candidates = [i for i in dict.fromkeys(batch) if i not in seen]
+            seen.update(candidates)
+            words = [self[i] for i in candidates]
+            chosen.extend(self._matching(words, predicate, pos)[:k - len(chosen)])
+        if len(chosen) == k:
+            return chosen
+        return self._reservoir(k, predicate, pos, rng)
+
+    def _matching(self, words: List[str], predicate: Optional[Callable[[str], bool]],
+                  pos: Optional[str]) -> List[str]:
+        if predicate is not None:
+            words = [word for word in words if predicate(word)]
+        if pos is not None and words:
+            words = [word for word, analysis in zip(words, analyze_words(words)) if analysis.pos == pos]
+        return words
+
+    def _reservoir(self, k: int, predicate: Optional[Callable[[str], bool]], pos: Optional[str],
+                   rng: random.Random) -> List[str]:
+        reservoir: List[str] = []
+        seen = 0
+        for chunk in self.iter_chunks():
+            for word in self._matching(chunk, predicate, pos):
+                if len(reservoir) < k:
+                    reservoir.append(word)
+                else:
+                    j = rng.randrange(seen + 1)
+                    if j < k:
+                        reservoir[j] = word
+                seen += 1
+        return reservoir
+
+    def close(self) -> None:
+        """Освобождает отображения файлов."""
+        if self._index_mmap is not None:
+            self._starts = None
+            self._index_mmap.close()
+            self._corpus_mmap.close()
+            self._index_mmap = self._corpus_mmap = None
+
+    def __enter__(self) -> 'Corpus':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def word_filter(min_length: Optional[int] = None, max_length: Optional[int] = None,
+                prefix: Optional[str] = None) -> Callable[[str], bool]:
+    """
+    Строит условие для Corpus.sample_where по длине слова и префиксу.
+
+    :param min_length: Минимальная длина слова.
+    :param max_length: Максимальная длина слова.
+    :param prefix: Требуемое начало слова (без учёта регистра).
+    :return: Функция word -> bool.
+    """
+    prefix = prefix.lower() if prefix else None
+
+    def predicate(word: str) -> bool:
+        if min_length is not None and len(word) < min_length:
+            return False
+        if max_length is not None and len(word) > max_length:
+            return False
+        return prefix is None or word.lower().startswith(prefix)
+    return predicate
@@ -0,0 +1,151 @@
+import json
+import os
+import time
+from typing import IO, Iterator, Optional
+
+try:
+    from .graph_store import MutationGraph
+    from .jobs import DONE, FAILED, read_status
+    from .simulation import GenerationDelta
+except ImportError:
+    from graph_store import MutationGraph
+    from jobs import DONE, FAILED, read_status
+    from simulation import GenerationDelta
+
+# Поколения пишутся в журнал событий в папке запуска, а не в очередь в памяти:
+# поток событий может читать любой воркер gunicorn, переподключившийся
+# браузер продолжает с места обрыва, а журнал кэшированного запуска
+# восстанавливается вместе с остальными артефактами.
+#
+# Формат журнала — одна JSON-строка на поколение:
+#   {"generation": g, "nodes": [[id, слово, часть речи, родитель, глубина], ...],
+#    "edges": [[источник, цель, мутация], ...]}
+# Поколение 0 содержит начальные слова. Идентификатор события SSE — смещение
+# в байтах конца строки, поэтому Last-Event-ID сразу указывает, откуда читать.
+EVENTS_FILE = 'events.jsonl'
+
+# Как часто поток проверяет журнал и статус задачи
+STREAM_POLL_INTERVAL = 0.2
+# Каждое открытое соединение занимает поток воркера gunicorn, поэтому поток
+# событий закрывается, если в нём нет новых событий STREAM_IDLE_SECONDS
+# (например, пока идёт рендеринг или задача ждёт в очереди), и в любом случае
+# через STREAM_MAX_SECONDS. Браузер переподключается сам через RETRY_MS
+# и продолжает с Last-Event-ID.
+STREAM_IDLE_SECONDS = float(os.environ.get('MUTATO_STREAM_IDLE_SECONDS', 5))
+STREAM_MAX_SECONDS = float(os.environ.get('MUTATO_STREAM_MAX_SECONDS', 30))
+# Пауза перед переподключением EventSource, мс
+RETRY_MS = 1000
+
+
+def generation_event(graph: MutationGraph, delta: GenerationDelta) -> dict:
+    """
+    :param graph: Граф симуляции.
+    :param delta: Узлы и рёбра, добавленные поколением.
+    :return: Словарь события поколения (формат журнала).
+    """
+    nodes = [
+        [i, graph.words[i], graph.pos(i), graph.parent[i], graph.depth[i]]
+        for i in range(delta.node_start, delta.node_stop)
+    ]
+    edges = [
+        [graph.edge_source[i], graph.edge_target[i], graph.mutations[graph.edge_mutation[i]]]
+        for i in range(delta.edge_start, delta.edge_stop)
+    ]
+    return {'generation': delta.generation, 'nodes': nodes, 'edges': edges}
+
+
+class EventLog:
+    """Дописывает события поколений в журнал папки запуска."""
+
+    def __init__(self, job_dir: str) -> None:
+        """
+        :param job_dir: Папка запуска.
+        """
+        self.path = os.path.join(job_dir, EVENTS_FILE)
+        self._file: Optional[IO[str]] = open(self.path, 'w', encoding='utf-8')
+
+    def write(self, graph: MutationGraph, delta: GenerationDelta) -> None:
+        """
+        Записывает поколение одной строкой и сразу сбрасывает её на диск,
+        чтобы читатели потока увидели её без задержки.
+
+        :param graph: Граф симуляции.
+        :param delta: Узлы и рёбра, добавленные поколением.
+        """
+        self._file.write(json.dumps(generation_event(graph, delta), ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'EventLog':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _read_lines(path: str, offset: int) -> Iterator[tuple]:
+    # Только полные строки: последняя может быть ещё не дописана
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return
+    end = data.rfind(b'\n')
+    for line in data[:end + 1].splitlines(keepends=True):
+        offset += len(line)
+        yield offset, line.decode('utf-8').rstrip('\n')
+
+
+def _sse(data: str, event: Optional[str] = None, event_id: Optional[int] = None) -> str:
+    head = ''
+    if event_id is not None:
+        head += f"id: {event_id}\n"
+    if event is not None:
+        head += f"event: {event}\n"
+    return f"{head}data: {data}\n\n"
+
+
+def iter_sse(job_dir: str, offset: int = 0, idle_seconds: float = STREAM_IDLE_SECONDS,
+             max_seconds: float = STREAM_MAX_SECONDS) -> Iterator[str]:
+    """
+    Поток Server-Sent Events запуска: события generation из журнала по мере
+    их записи, status при смене этапа и завершающее done или failed.
+
+    Статус читается раньше журнала, поэтому к моменту done все поколения
+    уже отправлены. После idle_seconds без событий или через max_seconds
+    поток закрывается без завершающего события, и браузер переподключается
+    с Last-Event-ID.
+
+    :param job_dir: Папка запуска.
+    :param offset: Смещение в журнале, с которого продолжать (Last-Event-ID).
+    :param idle_seconds: Сколько ждать новых событий перед закрытием соединения.
+    :param max_seconds: Наибольшая длительность одного соединения.
+    :return: Итератор фрагментов text/event-stream.
+    """
+    path = os.path.join(job_dir, EVENTS_FILE)
+    yield f"retry: {RETRY_MS}\n\n"
+    started = last_sent = time.monotonic()
+    last_update = None
+    while True:
+        status = read_status(job_dir) or {}
+        for offset, line in _read_lines(path, offset):
+            yield _sse(line, 'generation', offset)
+            last_sent = time.monotonic()
+        state = status.get('status')
+        if state in (DONE, FAILED):
+            yield _sse(json.dumps(status, ensure_ascii=False), 'done' if state == DONE else 'failed')
+            return
+        if status.get('updated') != last_update:
+            last_update = status.get('updated')
+            yield _sse(json.dumps(status, ensure_ascii=False), 'status')
+            last_sent = time.monotonic()
+
+        now = time.monotonic()
+        if now - last_sent >= idle_seconds or now - started >= max_seconds:
+            return
+        time.sleep(STREAM_POLL_INTERVAL)
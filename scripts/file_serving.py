@@ -0,0 +1,214 @@
+import gzip
+import hashlib
+import io
+import mimetypes
+import os
+import zipfile
+from typing import Iterator, List, Optional, Tuple
+from flask import Response, abort, request, send_file, stream_with_context
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость
+    brotli = None
+
+# Типы файлов, которые имеет смысл сжимать заранее
+COMPRESSIBLE_EXTENSIONS = frozenset(('.html', '.json', '.jsonl', '.csv', '.txt', '.graphml', '.svg'))
+# Уже сжатые форматы кладутся в ZIP без повторного сжатия
+STORED_EXTENSIONS = frozenset(('.png', '.webp', '.gz', '.br', '.zip', '.npz'))
+# Файлы меньше этого размера не сжимаются: выигрыш меньше накладных расходов
+MIN_COMPRESS_SIZE = 1024
+ZIP_CHUNK_SIZE = 64 * 1024
+
+# Расширение варианта и значение Content-Encoding в порядке предпочтения
+ENCODINGS: List[Tuple[str, str]] = [('.br', 'br'), ('.gz', 'gzip')]
+# Служебные файлы запуска, которые не отдаются в архиве
+EXCLUDED_FILES = frozenset(('status.json',))
+
+
+def precompress(directory: str) -> int:
+    """
+    Создаёт рядом с текстовыми артефактами сжатые варианты .gz и, если
+    установлен brotli, .br, чтобы при отдаче не сжимать файлы заново.
+
+    :param directory: Папка с артефактами (обходится рекурсивно).
+    :return: Количество созданных сжатых файлов.
+    """
+    created = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = os.path.join(root, name)
+            if os.path.getsize(path) < MIN_COMPRESS_SIZE:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            variants = [('.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+            for extension, compress in variants:
+                compressed = compress(data)
+                if len(compressed) >= len(data):
+                    continue
+                tmp_path = f"{path}{extension}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp_path, path + extension)
+                created += 1
+    return created
+
+
+def resolve_path(directory: str, filename: str) -> str:
+    """
+    Безопасно строит путь к файлу внутри папки или прерывает запрос с ошибкой 404.
+
+    :param directory: Корневая папка.
+    :param filename: Относительный путь из URL.
+    :return: Абсолютный путь к существующему файлу.
+    """
+    path = safe_join(os.path.abspath(directory), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return path
+
+
+def _pick_variant(path: str) -> Tuple[str, Optional[str]]:
+    """
+    Выбирает заранее сжатый вариант файла, который принимает клиент.
+
+    :return: Кортеж (путь к отдаваемому файлу, Content-Encoding или None).
+    """
+    mtime = os.path.getmtime(path)
+    for extension, encoding in ENCODINGS:
+        if not request.accept_encodings[encoding]:
+            continue
+        variant = path + extension
+        try:
+            if os.path.getmtime(variant) >= mtime:
+                return variant, encoding
+        except FileNotFoundError:
+            continue
+    return path, None
+
+
+def send_artifact(directory: str, filename: str, as_attachment: bool = False,
+                  max_age: Optional[int] = None) -> Response:
+    """
+    Отдаёт файл запуска потоком с ETag, Last-Modified и условными запросами.
+
+    Если клиент принимает br или gzip и рядом лежит сжатый вариант файла,
+    отдаётся он с заголовком Content-Encoding; Vary: Accept-Encoding
+    не даёт прокси перепутать варианты.
+
+    :param directory: Папка запуска.
+    :param filename: Относительный путь файла.
+    :param as_attachment: Отдать как вложение для скачивания.
+    :param max_age: Время кэширования ответа браузером в секундах.
+    :return: Ответ Flask (200, 206 или 304).
+    """
+    path = resolve_path(directory, filename)
+    served_path, encoding = _pick_variant(path)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = send_file(
+        served_path,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=os.path.basename(path),
+        conditional=True,
+        etag=True,
+        max_age=max_age,
+    )
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    # Ссылка на запуск известна только его автору, общим прокси кэшировать нечего
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _artifact_files(directory: str) -> List[Tuple[str, str]]:
+    """
+    :return: Отсортированный список (путь, имя в архиве) артефактов без
+        служебных файлов и сжатых вариантов.
+    """
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            arcname = os.path.relpath(path, directory).replace(os.sep, '/')
+            if arcname in EXCLUDED_FILES or name.endswith('.tmp'):
+                continue
+            if any(name.endswith(extension) and os.path.exists(path[:-len(extension)])
+                   for extension, _ in ENCODINGS):
+                continue
+            files.append((path, arcname))
+    return sorted(files, key=lambda item: item[1])
+
+
+class _ChunkSink(io.RawIOBase):
+    """Несматываемый поток, накапливающий записанные байты до выдачи клиенту."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(files: List[Tuple[str, str]]) -> Iterator[bytes]:
+    """
+    Собирает ZIP-архив на лету, не держа его целиком в памяти и на диске.
+
+    :param files: Список (путь, имя в архиве).
+    :return: Итератор частей архива.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for path, arcname in files:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            stored = os.path.splitext(arcname)[1] in STORED_EXTENSIONS
+            info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+            with open(path, 'rb') as source, archive.open(info, 'w') as target:
+                while True:
+                    chunk = source.read(ZIP_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    yield sink.pop()
+            yield sink.pop()
+    yield sink.pop()
+
+
+def send_zip(directory: str, download_name: str) -> Response:
+    """
+    Отдаёт все артефакты папки потоковым ZIP-архивом.
+
+    ETag строится по именам, размерам и времени изменения файлов, поэтому
+    повторная загрузка неизменившегося запуска получает 304 без сборки архива.
+
+    :param directory: Папка запуска.
+    :param download_name: Имя архива для браузера.
+    :return: Потоковый ответ Flask.
+    """
+    files = _artifact_files(directory)
+    digest = hashlib.sha256()
+    for path, arcname in files:
+        stat = os.stat(path)
+        digest.update(f"{arcname}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode('utf-8'))
+
+    response = Response(stream_with_context(iter_zip(files)), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    response.set_etag(digest.hexdigest()[:32])
+    return response.make_conditional(request)
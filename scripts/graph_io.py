@@ -0,0 +1,445 @@
+import argparse
+import gzip
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+try:
+    from .graph_store import MutationGraph
+except ImportError:
+    from graph_store import MutationGraph
+
+# Версия всех форматов экспорта; загрузчики отвергают файлы другой версии
+FORMAT_VERSION = 1
+
+# Разделитель слов в упакованной таблице строк: не встречается в словах
+_SEPARATOR = '\0'
+
+# Сжатый двоичный формат: заголовок, столбцы узлов и рёбер, таблицы строк
+BINARY_MAGIC = b'MUTGRPH1'
+_BINARY_HEADER = struct.Struct('<8sIIIII')  # magic, версия, узлы, рёбра, байты слов, байты метаданных
+_NODE_COLUMNS = (('parent', 'i'), ('node_generation', 'i'), ('node_pos', 'B'))
+_EDGE_COLUMNS = (('edge_source', 'i'), ('edge_target', 'i'), ('edge_mutation', 'i'), ('edge_generation', 'i'))
+
+
+class GraphFormat(NamedTuple):
+    """Формат экспорта графа мутаций: расширение файла, функции записи и чтения."""
+    extension: str
+    save: Callable[[MutationGraph, str], None]
+    load: Callable[[str], MutationGraph]
+
+
+def _pack_words(words: List[str]) -> bytes:
+    """
+    Упаковывает слова в одну строку UTF-8 с разделителем.
+
+    :raises ValueError: если слово содержит разделитель.
+    """
+    blob = _SEPARATOR.join(words)
+    if blob.count(_SEPARATOR) != max(len(words) - 1, 0):
+        raise ValueError("Слова графа не должны содержать символ \\0.")
+    return blob.encode('utf-8')
+
+
+def _unpack_words(blob: bytes, count: int) -> List[str]:
+    return blob.decode('utf-8').split(_SEPARATOR) if count else []
+
+
+def _metadata(graph: MutationGraph) -> Dict:
+    return {'version': FORMAT_VERSION, 'pos_tags': graph.pos_tags, 'mutations': graph.mutations,
+            'convergence': graph.convergence}
+
+
+def _check_version(meta: Dict, path: str) -> None:
+    if meta.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия формата графа в {path}: {meta.get('version')}")
+
+
+def _le_bytes(column: array) -> bytes:
+    """Возвращает содержимое столбца в порядке байтов little-endian."""
+    if sys.byteorder == 'big' and column.itemsize > 1:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_le_bytes(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == 'big' and column.itemsize > 1:
+        column.byteswap()
+    return column
+
+
+def _from_numpy(typecode: str, values: np.ndarray) -> array:
+    column = array(typecode)
+    column.frombytes(np.ascontiguousarray(values, dtype=np.dtype(typecode)).tobytes())
+    return column
+
+
+# --- JSON Lines: потоковый список узлов и рёбер ---
+
+def save_jsonl(graph: MutationGraph, path: str, batch_size: int = 10000) -> None:
+    """
+    Потоково пишет граф в JSON Lines: строка заголовка, затем узлы, затем рёбра.
+    Путь с окончанием .gz сжимается gzip.
+
+    :param graph: Граф мутаций.
+    :param path: Путь к файлу .jsonl или .jsonl.gz.
+    :param batch_size: Количество строк, записываемых одной операцией.
+    """
+    if path.endswith('.gz'):
+        stream = gzip.open(path, 'wt', encoding='utf-8', newline='\n', compresslevel=6)
+    else:
+        stream = open(path, 'w', encoding='utf-8', newline='\n')
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    with stream as f:
+        f.write(dumps({'type': 'graph', 'version': FORMAT_VERSION, 'nodes': len(graph),
+                       'edges': graph.number_of_edges(), 'convergence': graph.convergence}) + '\n')
+        batch: List[str] = []
+        for node_id, word in enumerate(graph.words):
+            batch.append(dumps({
+                'type': 'node', 'id': node_id, 'word': word, 'pos': graph.pos(node_id),
+                'generation': graph.node_generation[node_id], 'parent': graph.parent[node_id],
+            }))
+            if len(batch) >= batch_size:
+                f.write('\n'.join(batch) + '\n')
+                batch.clear()
+        mutations = graph.mutations
+        for u, v, m, generation in zip(graph.edge_source, graph.edge_target,
+                                       graph.edge_mutation, graph.edge_generation):
+            batch.append(dumps({
+                'type': 'edge', 'source': u, 'target': v,
+                'mutation': mutations[m], 'generation': generation,
+            }))
+            if len(batch) >= batch_size:
+                f.write('\n'.join(batch) + '\n')
+                batch.clear()
+        if batch:
+            f.write('\n'.join(batch) + '\n')
+
+
+def load_jsonl(path: str) -> MutationGraph:
+    """
+    Потоково читает граф из JSON Lines (возможно, gzip).
+
+    :param path: Путь к файлу .jsonl или .jsonl.gz.
+    :return: MutationGraph.
+    :raises ValueError: при неподдерживаемой версии или неизвестной строке.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline() or '{}')
+        _check_version(header, path)
+        graph = MutationGraph(header.get('convergence', 'merge'))
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            kind = item['type']
+            if kind == 'node':
+                graph.add_node(item['word'], item['pos'], item['generation'], item['parent'])
+            elif kind == 'edge':
+                graph.add_edge(item['source'], item['target'], item['mutation'], item['generation'])
+            else:
+                raise ValueError(f"Неизвестная строка графа в {path}: {kind}")
+    return graph
+
+
+# --- NumPy .npz: столбцы узлов и рёбер ---
+
+def save_npz(graph: MutationGraph, path: str) -> None:
+    """
+    Сохраняет столбцы графа в .npz (без pickle, загружается одним чтением).
+
+    :param graph: Граф мутаций.
+    :param path: Путь к файлу .npz.
+    """
+    columns = {name: np.frombuffer(getattr(graph, name), dtype=np.dtype(typecode))
+               for name, typecode in _NODE_COLUMNS + _EDGE_COLUMNS}
+    meta = json.dumps(_metadata(graph), ensure_ascii=False).encode('utf-8')
+    with open(path, 'wb') as f:
+        np.savez(
+            f,
+            words=np.frombuffer(_pack_words(graph.words), dtype=np.uint8),
+            meta=np.frombuffer(meta, dtype=np.uint8),
+            **columns,
+        )
+
+
+def load_npz(path: str) -> MutationGraph:
+    """
+    :param path: Путь к файлу .npz, записанному save_npz.
+    :return: MutationGraph.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+        _check_version(meta, path)
+        columns = {name: _from_numpy(typecode, data[name])
+                   for name, typecode in _NODE_COLUMNS + _EDGE_COLUMNS}
+        words = _unpack_words(data['words'].tobytes(), len(columns['parent']))
+    return MutationGraph.from_columns(
+        words, pos_tags=meta['pos_tags'], mutations=meta['mutations'],
+        convergence=meta.get('convergence', 'merge'), **columns
+    )
+
+
+# --- Сжатый двоичный формат ---
+
+def save_binary(graph: MutationGraph, path: str) -> None:
+    """
+    Сохраняет граф в компактный двоичный формат, сжатый gzip: заголовок,
+    столбцы array в порядке little-endian, слова и метаданные (JSON).
+    Не требует numpy и читается без разбора текста.
+
+    :param graph: Граф мутаций.
+    :param path: Путь к файлу .mgb.
+    """
+    words = _pack_words(graph.words)
+    meta = json.dumps(_metadata(graph), ensure_ascii=False).encode('utf-8')
+    with gzip.open(path, 'wb', compresslevel=6) as f:
+        f.write(_BINARY_HEADER.pack(BINARY_MAGIC, FORMAT_VERSION, len(graph),
+                                    graph.number_of_edges(), len(words), len(meta)))
+        for name, _ in _NODE_COLUMNS + _EDGE_COLUMNS:
+            f.write(_le_bytes(getattr(graph, name)))
+        f.write(words)
+        f.write(meta)
+
+
+def load_binary(path: str) -> MutationGraph:
+    """
+    :param path: Путь к файлу, записанному save_binary.
+    :return: MutationGraph.
+    :raises ValueError: если файл не является графом MUTATO или обрезан.
+    """
+    with gzip.open(path, 'rb') as f:
+        header = f.read(_BINARY_HEADER.size)
+        if len(header) != _BINARY_HEADER.size:
+            raise ValueError(f"Файл графа обрезан: {path}")
+        magic, version, n_nodes, n_edges, words_size, meta_size = _BINARY_HEADER.unpack(header)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"Файл не является графом MUTATO: {path}")
+        _check_version({'version': version}, path)
+
+        def read_exact(size: int) -> bytes:
+            data = f.read(size)
+            if len(data) != size:
+                raise ValueError(f"Файл графа обрезан: {path}")
+            return data
+
+        columns = {}
+        for names, count in ((_NODE_COLUMNS, n_nodes), (_EDGE_COLUMNS, n_edges)):
+            for name, typecode in names:
+                columns[name] = _from_le_bytes(typecode, read_exact(count * array(typecode).itemsize))
+        words = _unpack_words(read_exact(words_size), n_nodes)
+        meta = json.loads(read_exact(meta_size).decode('utf-8'))
+    return MutationGraph.from_columns(
+        words, pos_tags=meta['pos_tags'], mutations=meta['mutations'],
+        convergence=meta.get('convergence', 'merge'), **columns
+    )
+
+
+# --- Parquet (необязательная зависимость pyarrow) ---
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Для формата parquet установите пакет pyarrow.") from None
+    return pyarrow, pyarrow.parquet
+
+
+def _dictionary_array(pa, codes: np.ndarray, values: List[Optional[str]]):
+    """
+    Строит словарный столбец из кодов и таблицы значений.
+
+    Parquet не записывает null внутри словаря, поэтому None (например,
+    «нет части речи» в POS_TAGS) исключается из словаря, а его коды
+    становятся пропусками в индексах.
+    """
+    present = [value is not None for value in values]
+    lookup = np.cumsum(present, dtype=np.int64) - 1
+    lookup[~np.asarray(present, dtype=bool)] = -1
+    indices = lookup[codes] if len(values) else np.zeros(0, dtype=np.int64)
+    return pa.DictionaryArray.from_arrays(
+        pa.array(indices, type=pa.int32(), mask=indices < 0),
+        pa.array([value for value in values if value is not None], type=pa.string()),
+    )
+
+
+def save_parquet(graph: MutationGraph, path: str) -> None:
+    """
+    Сохраняет граф в папку с двумя таблицами Parquet: nodes.parquet и
+    edges.parquet. Части речи и мутации хранятся словарным кодированием,
+    узлы без части речи — пропусками (null).
+
+    :param graph: Граф мутаций.
+    :param path: Путь к папке .parquet.
+    """
+    pa, pq = _require_pyarrow()
+    os.makedirs(path, exist_ok=True)
+    nodes = pa.table({
+        'word': pa.array(graph.words, type=pa.string()),
+        'pos': _dictionary_array(pa, np.frombuffer(graph.node_pos, dtype=np.uint8), graph.pos_tags),
+        'generation': np.frombuffer(graph.node_generation, dtype=np.int32),
+        'parent': np.frombuffer(graph.parent, dtype=np.int32),
+    }, metadata={'version': str(FORMAT_VERSION), 'convergence': graph.convergence})
+    edges = pa.table({
+        'source': np.frombuffer(graph.edge_source, dtype=np.int32),
+        'target': np.frombuffer(graph.edge_target, dtype=np.int32),
+        'mutation': _dictionary_array(pa, np.frombuffer(graph.edge_mutation, dtype=np.int32), graph.mutations),
+        'generation': np.frombuffer(graph.edge_generation, dtype=np.int32),
+    }, metadata={'version': str(FORMAT_VERSION)})
+    pq.write_table(nodes, os.path.join(path, 'nodes.parquet'))
+    pq.write_table(edges, os.path.join(path, 'edges.parquet'))
+
+
+def _dictionary_column(column, nullable: bool) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """
+    Возвращает коды и словарь строкового столбца Parquet.
+
+    Если nullable, пропуски получают код 0, а словарь начинается с None
+    (как POS_TAGS); иначе пропуски в столбце считаются ошибкой.
+    """
+    encoded = column.combine_chunks()
+    if not hasattr(encoded, 'dictionary'):
+        encoded = encoded.dictionary_encode()
+    values = encoded.dictionary.to_pylist()
+    # to_numpy() превратил бы целые индексы с пропусками в float с NaN
+    codes = encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+    if nullable:
+        return codes + 1, [None] + values
+    if (codes < 0).any():
+        raise ValueError("В столбце мутаций есть пропуски.")
+    return codes, values
+
+
+def load_parquet(path: str) -> MutationGraph:
+    """
+    :param path: Путь к папке, записанной save_parquet.
+    :return: MutationGraph.
+    """
+    _, pq = _require_pyarrow()
+    nodes = pq.read_table(os.path.join(path, 'nodes.parquet'))
+    edges = pq.read_table(os.path.join(path, 'edges.parquet'))
+    metadata = nodes.schema.metadata or {}
+    _check_version({'version': int(metadata.get(b'version', b'0'))}, path)
+    node_pos, pos_tags = _dictionary_column(nodes.column('pos'), nullable=True)
+    edge_mutation, mutations = _dictionary_column(edges.column('mutation'), nullable=False)
+    return MutationGraph.from_columns(
+        nodes.column('word').to_pylist(),
+        parent=_from_numpy('i', nodes.column('parent').to_numpy()),
+        node_generation=_from_numpy('i', nodes.column('generation').to_numpy()),
+        node_pos=_from_numpy('B', node_pos),
+        pos_tags=pos_tags,
+        edge_source=_from_numpy('i', edges.column('source').to_numpy()),
+        edge_target=_from_numpy('i', edges.column('target').to_numpy()),
+        edge_mutation=_from_numpy('i', edge_mutation),
+        edge_generation=_from_numpy('i', edges.column('generation').to_numpy()),
+        mutations=mutations,
+        convergence=metadata.get(b'convergence', b'merge').decode('utf-8'),
+    )
+
+
+GRAPH_FORMATS: Dict[str, GraphFormat] = {
+    'jsonl': GraphFormat('.jsonl.gz', save_jsonl, load_jsonl),
+    'npz': GraphFormat('.npz', save_npz, load_npz),
+    'binary': GraphFormat('.mgb', save_binary, load_binary),
+    'parquet': GraphFormat('.parquet', save_parquet, load_parquet),
+}
+
+
+def register_graph_format(name: str, extension: str, save: Callable[[MutationGraph, str], None],
+                          load: Callable[[str], MutationGraph]) -> None:
+    """
+    Регистрирует дополнительный формат экспорта графа.
+
+    :param name: Имя формата.
+    :param extension: Расширение файла.
+    :param save: Функция save(graph, path).
+    :param load: Функция load(path) -> MutationGraph.
+    """
+    GRAPH_FORMATS[name] = GraphFormat(extension, save, load)
+
+
+def graph_filename(base: str, fmt: str) -> str:
+    """
+    :param base: Имя файла без расширения.
+    :param fmt: Формат экспорта.
+    :return: Имя файла с расширением формата.
+    """
+    return base + GRAPH_FORMATS[fmt].extension
+
+
+def detect_format(path: str) -> str:
+    """
+    :param path: Путь к файлу графа.
+    :return: Имя формата по расширению (самое длинное совпадение).
+    :raises ValueError: если расширение не распознано.
+    """
+    normalized = path.rstrip('/\\')
+    if normalized.endswith('.jsonl'):
+        return 'jsonl'
+    matches = [name for name, spec in GRAPH_FORMATS.items() if normalized.endswith(spec.extension)]
+    if not matches:
+        raise ValueError(f"Не удалось определить формат графа по имени файла: {path}")
+    return max(matches, key=lambda name: len(GRAPH_FORMATS[name].extension))
+
+
+def save_mutation_graph(graph: MutationGraph, path: str, fmt: Optional[str] = None) -> str:
+    """
+    Сохраняет граф мутаций в одном из форматов экспорта.
+
+    :param graph: Граф мутаций.
+    :param path: Путь к файлу.
+    :param fmt: Формат ('jsonl', 'npz', 'binary', 'parquet' или
+        зарегистрированный); по умолчанию определяется по расширению.
+    :return: Путь к сохранённому файлу.
+    :raises ValueError: при неизвестном формате.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in GRAPH_FORMATS:
+        raise ValueError(f"Неизвестный формат графа: {fmt}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    GRAPH_FORMATS[fmt].save(graph, path)
+    return path
+
+
+def load_mutation_graph(path: str, fmt: Optional[str] = None) -> MutationGraph:
+    """
+    Загружает граф мутаций, сохранённый save_mutation_graph.
+
+    Результат — обычный MutationGraph: его можно дополнить новыми мутациями
+    или экспортировать в NetworkX без повторной симуляции.
+
+    :param path: Путь к файлу.
+    :param fmt: Формат; по умолчанию определяется по расширению.
+    :return: MutationGraph.
+    :raises ValueError: при неизвестном формате.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in GRAPH_FORMATS:
+        raise ValueError(f"Неизвестный формат графа: {fmt}")
+    return GRAPH_FORMATS[fmt].load(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Конвертация графа мутаций между форматами экспорта.")
+    parser.add_argument('input', help="исходный файл графа")
+    parser.add_argument('output', help="файл результата")
+    parser.add_argument('--from', dest='from_format', choices=sorted(GRAPH_FORMATS), default=None,
+                        help="формат исходного файла (по умолчанию по расширению)")
+    parser.add_argument('--to', dest='to_format', choices=sorted(GRAPH_FORMATS), default=None,
+                        help="формат результата (по умолчанию по расширению)")
+    args = parser.parse_args()
+
+    graph = load_mutation_graph(args.input, args.from_format)
+    save_mutation_graph(graph, args.output, args.to_format)
+    print(f"Граф ({len(graph)} узлов, {graph.number_of_edges()} рёбер) сохранён по пути: {args.output}")
@@ -0,0 +1,368 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+import networkx as nx
+import numpy as np
+
+try:
+    from .lineage import LineageIndex, lineage_columns
+    from .morph_index import POS_TAGS
+except ImportError:
+    from lineage import LineageIndex, lineage_columns
+    from morph_index import POS_TAGS
+
+# Как поступать, когда мутант совпал с уже известным словом:
+#   merge    — ребро ведёт в существующий узел (граф перестаёт быть деревом);
+#   distinct — совпавшее слово становится новым узлом со своим id.
+CONVERGENCE_POLICIES = ('merge', 'distinct')
+
+
+class NodeView:
+    """Лёгкое представление узла MutationGraph по его целочисленному id."""
+    __slots__ = ('_graph', 'id')
+
+    def __init__(self, graph: 'MutationGraph', node_id: int) -> None:
+        self._graph = graph
+        self.id = node_id
+
+    @property
+    def word(self) -> str:
+        return self._graph.words[self.id]
+
+    @property
+    def pos(self) -> Optional[str]:
+        return self._graph.pos(self.id)
+
+    @property
+    def generation(self) -> int:
+        return self._graph.node_generation[self.id]
+
+    @property
+    def parent(self) -> int:
+        return self._graph.parent[self.id]
+
+    def __repr__(self) -> str:
+        return f"NodeView({self.id}, {self.word!r}, pos={self.pos!r}, generation={self.generation})"
+
+
+class EdgeView:
+    """Лёгкое представление ребра MutationGraph по его индексу."""
+    __slots__ = ('_graph', 'index')
+
+    def __init__(self, graph: 'MutationGraph', index: int) -> None:
+        self._graph = graph
+        self.index = index
+
+    @property
+    def source(self) -> int:
+        return self._graph.edge_source[self.index]
+
+    @property
+    def target(self) -> int:
+        return self._graph.edge_target[self.index]
+
+    @property
+    def mutation(self) -> str:
+        return self._graph.mutations[self._graph.edge_mutation[self.index]]
+
+    @property
+    def generation(self) -> int:
+        return self._graph.edge_generation[self.index]
+
+    def __repr__(self) -> str:
+        words = self._graph.words
+        return f"EdgeView({words[self.source]!r} -> {words[self.target]!r}, {self.mutation!r})"
+
+
+class MutationGraph:
+    """
+    Компактное хранилище графа мутаций для ядра симуляции.
+
+    Слова интернируются в целочисленные id, а атрибуты узлов и рёбер хранятся
+    в плотных массивах array: родитель, поколение и код части речи для узлов,
+    источник, приёмник, код мутации и поколение для рёбер. Строки мутаций
+    тоже интернируются. Граф NetworkX строится только при экспорте
+    (to_networkx) для сохранения и визуализации.
+
+    Слова хранятся в интернированной таблице: words — слово по id, ids —
+    id первого узла с этим словом (хеш-поиск). Повторное появление слова
+    обрабатывается по политике convergence: при 'merge' новый узел не
+    создаётся, а часть речи и родитель остаются от первого появления; при
+    'distinct' слово получает новый узел, а таблица ids строится лениво при
+    первом обращении, чтобы длинные симуляции не держали словарь всех слов.
+    Корень и глубина узла в лесу первых предков ведутся при добавлении
+    (root, depth) и служат основой индекса родословной (lineage).
+    """
+
+    def __init__(self, convergence: str = 'merge') -> None:
+        """
+        :param convergence: Политика совпадающих слов: 'merge' или 'distinct'.
+        :raises ValueError: при неизвестной политике.
+        """
+        if convergence not in CONVERGENCE_POLICIES:
+            raise ValueError(f"Неизвестная политика совпадений: {convergence}")
+        self.convergence = convergence
+        self.words: List[str] = []
+        self._ids: Optional[Dict[str, int]] = {} if convergence == 'merge' else None
+        self.parent = array('i')
+        self.node_generation = array('i')
+        self.node_pos = array('B')
+        self.root = array('i')
+        self.depth = array('i')
+        self._lineage: Optional[LineageIndex] = None
+
+        self.edge_source = array('i')
+        self.edge_target = array('i')
+        self.edge_mutation = array('i')
+        self.edge_generation = array('i')
+
+        self.pos_tags: List[Optional[str]] = list(POS_TAGS)
+        self._pos_codes: Dict[Optional[str], int] = {tag: code for code, tag in enumerate(self.pos_tags)}
+        self.mutations: List[str] = []
+        self._mutation_codes: Dict[str, int] = {}
+
+    @classmethod
+    def from_columns(cls, words: List[str], parent: Iterable[int], node_generation: Iterable[int],
+                     node_pos: Iterable[int], pos_tags: List[Optional[str]],
+                     edge_source: Iterable[int], edge_target: Iterable[int],
+                     edge_mutation: Iterable[int], edge_generation: Iterable[int],
+                     mutations: List[str], convergence: str = 'merge') -> 'MutationGraph':
+        """
+        Собирает граф из готовых столбцов (для быстрых загрузчиков экспорта).
+
+        :param words: Слова в порядке id.
+        :param parent: id родителей узлов.
+        :param node_generation: Поколения узлов.
+        :param node_pos: Коды частей речи узлов (индексы в pos_tags).
+        :param pos_tags: Таблица частей речи.
+        :param edge_source: id источников рёбер.
+        :param edge_target: id приёмников рёбер.
+        :param edge_mutation: Коды мутаций рёбер (индексы в mutations).
+        :param edge_generation: Поколения рёбер.
+        :param mutations: Таблица описаний мутаций.
+        :param convergence: Политика совпадающих слов графа.
+        :return: MutationGraph, который можно дальше расширять.
+        :raises ValueError: если столбцы несогласованы или слова повторяются
+            при политике 'merge'.
+        """
+        graph = cls(convergence)
+        graph.words = list(words)
+        if convergence == 'merge':
+            graph._ids = {word: node_id for node_id, word in enumerate(graph.words)}
+        graph.parent = array('i', parent)
+        graph.node_generation = array('i', node_generation)
+        graph.node_pos = array('B', node_pos)
+        graph.edge_source = array('i', edge_source)
+        graph.edge_target = array('i', edge_target)
+        graph.edge_mutation = array('i', edge_mutation)
+        graph.edge_generation = array('i', edge_generation)
+        graph.pos_tags = list(pos_tags)
+        graph._pos_codes = {tag: code for code, tag in enumerate(graph.pos_tags)}
+        graph.mutations = list(mutations)
+        graph._mutation_codes = {mutation: code for code, mutation in enumerate(graph.mutations)}
+        root, depth = lineage_columns(np.frombuffer(graph.parent, dtype=np.int32))
+        graph.root = array('i', root.tobytes())
+        graph.depth = array('i', depth.tobytes())
+
+        n = len(graph.words)
+        if convergence == 'merge' and len(graph._ids) != n:
+            raise ValueError("Слова графа должны быть уникальными.")
+        if not len(graph.parent) == len(graph.node_generation) == len(graph.node_pos) == n:
+            raise ValueError("Длины столбцов узлов не совпадают.")
+        if not (len(graph.edge_source) == len(graph.edge_target)
+                == len(graph.edge_mutation) == len(graph.edge_generation)):
+            raise ValueError("Длины столбцов рёбер не совпадают.")
+        return graph
+
+    @property
+    def ids(self) -> Dict[str, int]:
+        """Словарь слово -> id первого узла с этим словом."""
+        if self._ids is None:
+            ids: Dict[str, int] = {}
+            for node_id, word in enumerate(self.words):
+                ids.setdefault(word, node_id)
+            self._ids = ids
+        return self._ids
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.ids
+
+    def number_of_edges(self) -> int:
+        return len(self.edge_source)
+
+    def _pos_code(self, pos: Optional[str]) -> int:
+        code = self._pos_codes.get(pos)
+        if code is None:
+            code = len(self.pos_tags)
+            self.pos_tags.append(pos)
+            self._pos_codes[pos] = code
+        return code
+
+    def _mutation_code(self, mutation: str) -> int:
+        code = self._mutation_codes.get(mutation)
+        if code is None:
+            code = len(self.mutations)
+            self.mutations.append(mutation)
+            self._mutation_codes[mutation] = code
+        return code
+
+    def add_node(self, word: str, pos: Optional[str], generation: int = 0, parent: int = -1) -> int:
+        """
+        Добавляет слово. При политике 'merge' для уже известного слова
+        возвращает id существующего узла, не меняя его атрибутов.
+
+        :param word: Слово.
+        :param pos: Метка части речи.
+        :param generation: Поколение, в котором слово появилось.
+        :param parent: id родителя (-1 для начальных слов).
+        :return: id узла.
+        """
+        if self.convergence == 'merge':
+            node_id = self._ids.get(word)
+            if node_id is not None:
+                return node_id
+        node_id = len(self.words)
+        self.words.append(word)
+        if self._ids is not None:
+            self._ids.setdefault(word, node_id)
+        self.parent.append(parent)
+        self.node_generation.append(generation)
+        self.node_pos.append(self._pos_code(pos))
+        if parent >= 0:
+            self.root.append(self.root[parent])
+            self.depth.append(self.depth[parent] + 1)
+        else:
+            self.root.append(node_id)
+            self.depth.append(0)
+        return node_id
+
+    def add_edge(self, source: int, target: int, mutation: str, generation: int = 0) -> int:
+        """
+        Добавляет ребро мутации между двумя узлами.
+
+        :param source: id исходного узла.
+        :param target: id мутанта.
+        :param mutation: Описание мутации.
+        :param generation: Поколение мутации.
+        :return: Индекс ребра.
+        """
+        self.edge_source.append(source)
+        self.edge_target.append(target)
+        self.edge_mutation.append(self._mutation_code(mutation))
+        self.edge_generation.append(generation)
+        return len(self.edge_source) - 1
+
+    def pos(self, node_id: int) -> Optional[str]:
+        """
+        :param node_id: id узла.
+        :return: Метка части речи узла.
+        """
+        return self.pos_tags[self.node_pos[node_id]]
+
+    def node(self, word: str) -> NodeView:
+        """
+        :param word: Слово.
+        :return: NodeView узла.
+        :raises KeyError: если слова нет в графе.
+        """
+        return NodeView(self, self.ids[word])
+
+    def nodes(self) -> Iterator[NodeView]:
+        """Перебирает узлы в порядке добавления."""
+        for node_id in range(len(self.words)):
+            yield NodeView(self, node_id)
+
+    def edges(self) -> Iterator[EdgeView]:
+        """Перебирает рёбра в порядке добавления."""
+        for index in range(len(self.edge_source)):
+            yield EdgeView(self, index)
+
+    def lineage(self) -> LineageIndex:
+        """
+        :return: Индекс родословной графа (создаётся один раз и следит за ростом графа).
+        """
+        if self._lineage is None:
+            self._lineage = LineageIndex(self)
+        return self._lineage
+
+    def subgraph(self, node_ids: Iterable[int]) -> 'MutationGraph':
+        """
+        Выделяет подграф на заданных узлах с рёбрами между ними.
+
+        Узлы копируются в порядке возрастания id, поэтому родитель остаётся
+        раньше потомка; родитель вне подграфа заменяется на -1.
+
+        :param node_ids: id узлов.
+        :return: Новый MutationGraph.
+        """
+        keep = np.unique(np.fromiter(node_ids, dtype=np.int64))
+        n = len(self.words)
+        new_ids = np.full(n + 1, -1, dtype=np.int32)  # последний элемент отвечает родителю -1
+        new_ids[keep] = np.arange(len(keep), dtype=np.int32)
+
+        parent = np.frombuffer(self.parent[:n], dtype=np.int32)
+        source = np.frombuffer(self.edge_source[:], dtype=np.int32)
+        target = np.frombuffer(self.edge_target[:], dtype=np.int32)
+        edges = np.flatnonzero((new_ids[source] >= 0) & (new_ids[target] >= 0))
+        return MutationGraph.from_columns(
+            [self.words[i] for i in keep.tolist()],
+            parent=new_ids[parent[keep]].tolist(),
+            node_generation=[self.node_generation[i] for i in keep.tolist()],
+            node_pos=[self.node_pos[i] for i in keep.tolist()],
+            pos_tags=self.pos_tags,
+            edge_source=new_ids[source[edges]].tolist(),
+            edge_target=new_ids[target[edges]].tolist(),
+            edge_mutation=[self.edge_mutation[i] for i in edges.tolist()],
+            edge_generation=[self.edge_generation[i] for i in edges.tolist()],
+            mutations=self.mutations,
+            convergence=self.convergence,
+        )
+
+    def merge(self, other: 'MutationGraph') -> None:
+        """
+        Добавляет в граф все узлы и рёбра другого графа в их порядке добавления.
+
+        Совпадающие слова обрабатываются по политике этого графа, как при
+        add_node, поэтому результат слияния нескольких графов детерминирован
+        и зависит только от их порядка.
+
+        :param other: Граф, узлы и рёбра которого добавляются.
+        """
+        id_map = array('i', [0]) * len(other)
+        for node_id, word in enumerate(other.words):
+            parent = other.parent[node_id]
+            id_map[node_id] = self.add_node(
+                word,
+                other.pos(node_id),
+                other.node_generation[node_id],
+                id_map[parent] if parent >= 0 else -1,
+            )
+        for u, v, m, generation in zip(other.edge_source, other.edge_target,
+                                       other.edge_mutation, other.edge_generation):
+            self.add_edge(id_map[u], id_map[v], other.mutations[m], generation)
+
+    def to_networkx(self) -> nx.DiGraph:
+        """
+        Экспортирует граф в nx.DiGraph с атрибутами 'word' и 'pos' узлов
+        и 'mutation' рёбер.
+
+        Узлы NetworkX — id узлов графа: при политике 'distinct' одно слово
+        может встречаться в нескольких узлах, а любой ключ, составленный
+        из слова, мог бы совпасть с другим словом.
+
+        :return: Направленный граф NetworkX.
+        """
+        graph = nx.DiGraph()
+        pos_tags = self.pos_tags
+        graph.add_nodes_from(
+            (node_id, {'word': word, 'pos': pos_tags[code]})
+            for node_id, (word, code) in enumerate(zip(self.words, self.node_pos))
+        )
+        mutations = self.mutations
+        graph.add_edges_from(
+            (u, v, {'mutation': mutations[m]})
+            for u, v, m in zip(self.edge_source, self.edge_target, self.edge_mutation)
+        )
+        return graph
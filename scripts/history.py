@@ -0,0 +1,283 @@
+import csv
+import gzip
+import io
+import json
+import os
+from typing import Dict, Iterator, List, NamedTuple, Optional, TextIO, Type
+
+
+class HistoryRecord(NamedTuple):
+    """Одна запись истории мутаций."""
+    generation: int
+    source: str
+    source_pos: Optional[str]
+    target: str
+    target_pos: Optional[str]
+    mutation: str
+
+
+class HistoryWriter:
+    """
+    Буферизованный приёмник истории мутаций.
+
+    Записи копятся в буфере и сбрасываются в поток одной операцией записи,
+    когда буфер заполнен, при flush() и при закрытии. Подклассы задают формат
+    через _format_batch и, при необходимости, _header.
+    """
+
+    extension = '.txt'
+
+    def __init__(self, stream: TextIO, buffer_size: int = 1000, close_stream: bool = False,
+                 append: bool = False) -> None:
+        """
+        :param stream: Текстовый поток для записи.
+        :param buffer_size: Количество записей в буфере до сброса.
+        :param close_stream: Закрывать ли поток в close().
+        :param append: Поток дописывает существующую историю (заголовок не пишется).
+        """
+        self.stream = stream
+        self.buffer_size = max(1, buffer_size)
+        self.close_stream = close_stream
+        self.records_written = 0
+        # Смещение начала потока в файле (для дописываемого gzip, см. open_history)
+        self.base_offset = 0
+        self._buffer: List[HistoryRecord] = []
+        header = self._header()
+        if header and not append:
+            self.stream.write(header)
+
+    def _header(self) -> str:
+        return ""
+
+    def _format_batch(self, records: List[HistoryRecord]) -> str:
+        raise NotImplementedError
+
+    def write(self, record: HistoryRecord) -> None:
+        """
+        Добавляет запись в буфер.
+
+        :param record: Запись истории.
+        """
+        self._buffer.append(record)
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Сбрасывает буфер в поток."""
+        if self._buffer:
+            self.stream.write(self._format_batch(self._buffer))
+            self.records_written += len(self._buffer)
+            self._buffer.clear()
+
+    def checkpoint(self) -> int:
+        """
+        Сбрасывает буфер и поток на диск и возвращает смещение конца истории.
+
+        Для файлов смещение считается в байтах несжатых данных (для gzip —
+        после распаковки), его принимает truncate_history при возобновлении.
+
+        :return: Смещение конца записанной истории.
+        """
+        self.flush()
+        self.stream.flush()
+        buffer = getattr(self.stream, 'buffer', None)
+        if buffer is None:
+            return self.stream.tell()
+        buffer.flush()
+        try:
+            os.fsync(buffer.fileno())
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            pass
+        return self.base_offset + buffer.tell()
+
+    def close(self) -> None:
+        """Сбрасывает буфер и, если поток принадлежит приёмнику, закрывает его."""
+        self.flush()
+        if self.close_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+    def __enter__(self) -> 'HistoryWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class TextHistoryWriter(HistoryWriter):
+    """Человекочитаемый формат: «слово (ЧР) -> мутант (ЧР): мутация»."""
+
+    extension = '.txt'
+
+    def _format_batch(self, records: List[HistoryRecord]) -> str:
+        return "".join(
+            f"{r.source} ({r.source_pos}) -> {r.target} ({r.target_pos}): {r.mutation}\n"
+            for r in records
+        )
+
+
+class JsonlHistoryWriter(HistoryWriter):
+    """JSON Lines: по одному JSON-объекту с полями HistoryRecord на строку."""
+
+    extension = '.jsonl'
+
+    def _format_batch(self, records: List[HistoryRecord]) -> str:
+        dumps = json.dumps
+        return "".join(dumps(r._asdict(), ensure_ascii=False) + "\n" for r in records)
+
+
+class CsvHistoryWriter(HistoryWriter):
+    """CSV с заголовком из имён полей HistoryRecord."""
+
+    extension = '.csv'
+
+    def _header(self) -> str:
+        return ",".join(HistoryRecord._fields) + "\n"
+
+    def _format_batch(self, records: List[HistoryRecord]) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(records)
+        return buffer.getvalue()
+
+
+# Реестр форматов истории; новые форматы добавляются через register_history_format
+HISTORY_FORMATS: Dict[str, Type[HistoryWriter]] = {
+    'text': TextHistoryWriter,
+    'jsonl': JsonlHistoryWriter,
+    'csv': CsvHistoryWriter,
+}
+
+
+def register_history_format(name: str, writer_class: Type[HistoryWriter]) -> None:
+    """
+    Регистрирует дополнительный формат истории.
+
+    :param name: Имя формата.
+    :param writer_class: Подкласс HistoryWriter.
+    """
+    HISTORY_FORMATS[name] = writer_class
+
+
+def history_filename(base: str, fmt: str = 'text', compress: bool = False) -> str:
+    """
+    :param base: Имя файла без расширения.
+    :param fmt: Формат истории.
+    :param compress: Сжимать ли gzip.
+    :return: Имя файла с расширением формата и, при сжатии, .gz.
+    """
+    return base + HISTORY_FORMATS[fmt].extension + ('.gz' if compress else '')
+
+
+def open_history(path: str, fmt: str = 'text', compress: Optional[bool] = None,
+                 buffer_size: int = 1000, append: bool = False) -> HistoryWriter:
+    """
+    Открывает файл истории для потоковой записи.
+
+    :param path: Путь к файлу.
+    :param fmt: Формат: 'text', 'jsonl', 'csv' или зарегистрированный.
+    :param compress: Сжимать ли gzip; по умолчанию — если путь оканчивается на .gz.
+    :param buffer_size: Количество записей в буфере до сброса.
+    :param append: Дописывать существующий файл (при возобновлении симуляции);
+        для gzip добавляется новый член архива.
+    :return: HistoryWriter, владеющий открытым файлом.
+    :raises ValueError: при неизвестном формате.
+    """
+    if fmt not in HISTORY_FORMATS:
+        raise ValueError(f"Неизвестный формат истории: {fmt}")
+    if compress is None:
+        compress = path.endswith('.gz')
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    append = append and os.path.exists(path)
+    mode = 'a' if append else 'w'
+    base_offset = 0
+    if compress:
+        if append:
+            # Позиция нового члена gzip отсчитывается от нуля, смещение добавляется вручную
+            base_offset = _uncompressed_size(path)
+        stream = gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    else:
+        stream = open(path, mode, encoding='utf-8', newline='')
+    writer = HISTORY_FORMATS[fmt](stream, buffer_size, close_stream=True, append=append)
+    writer.base_offset = base_offset
+    return writer
+
+
+def _uncompressed_size(path: str) -> int:
+    size = 0
+    with gzip.open(path, 'rb') as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                return size
+            size += len(chunk)
+
+
+def truncate_history(path: str, offset: int) -> None:
+    """
+    Обрезает файл истории до смещения, сохранённого в контрольной точке,
+    чтобы удалить записи поколений, выполненных после неё.
+
+    Обычный файл обрезается на месте; gzip-файл перепаковывается из первых
+    offset байт распакованных данных.
+
+    :param path: Путь к файлу истории.
+    :param offset: Смещение из HistoryWriter.checkpoint.
+    :raises ValueError: если файл короче смещения.
+    """
+    if not path.endswith('.gz'):
+        if os.path.getsize(path) < offset:
+            raise ValueError(f"Файл истории короче контрольной точки: {path}")
+        with open(path, 'r+b') as f:
+            f.truncate(offset)
+        return
+    tmp_path = f"{path}.tmp"
+    remaining = offset
+    with gzip.open(path, 'rb') as source, gzip.open(tmp_path, 'wb') as target:
+        while remaining:
+            chunk = source.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            target.write(chunk)
+            remaining -= len(chunk)
+    if remaining:
+        os.remove(tmp_path)
+        raise ValueError(f"Файл истории короче контрольной точки: {path}")
+    os.replace(tmp_path, path)
+
+
+def _open_text(path: str) -> TextIO:
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def _optional(value: str) -> Optional[str]:
+    return None if value in ('', 'None') else value
+
+
+def read_history(path: str) -> Iterator[HistoryRecord]:
+    """
+    Потоково читает структурированную историю (JSON Lines или CSV, возможно gzip).
+
+    :param path: Путь к файлу .jsonl, .csv или их .gz-вариантам.
+    :return: Итератор записей HistoryRecord.
+    :raises ValueError: если формат файла не структурированный.
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.jsonl'):
+        with _open_text(path) as f:
+            for line in f:
+                if line.strip():
+                    yield HistoryRecord(**json.loads(line))
+    elif name.endswith('.csv'):
+        with _open_text(path) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for generation, source, source_pos, target, target_pos, mutation in reader:
+                yield HistoryRecord(int(generation), source, _optional(source_pos),
+                                    target, _optional(target_pos), mutation)
+    else:
+        raise ValueError(f"Чтение поддерживается только для .jsonl и .csv: {path}")
@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    from .metrics import SIZE_BUCKETS, maybe_write_snapshot, registry, start_timings, stop_timings, timed
+except ImportError:
+    from metrics import SIZE_BUCKETS, maybe_write_snapshot, registry, start_timings, stop_timings, timed
+
+logger = logging.getLogger(__name__)
+
+# Статус задачи хранится в папке её запуска, а не в памяти процесса:
+# запрос статуса может попасть в любой воркер gunicorn.
+STATUS_FILE = 'status.json'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Задачи живут в очереди процесса-воркера. Если воркер перезапущен или убит
+# (max_requests, OOM, таймаут), его задачи пропадают, а статус остаётся
+# незавершённым. Такая задача считается потерянной, если процесс, записавший
+# статус, уже не существует; при старте сервера потерянными считаются все
+# незавершённые задачи (fail_unfinished_jobs). Возраст статуса не учитывается:
+# задача в очереди, в ожидании слота рендеринга или на долгом этапе раскладки
+# не обновляет статус, но жива.
+ORPHANED_ERROR = "Процесс, выполнявший задачу, завершился. Запустите генерацию ещё раз."
+
+registry.counter('mutato_jobs_total', 'Завершённые задачи генерации графа по итоговому статусу.')
+registry.gauge('mutato_jobs_queued', 'Задачи в очереди, ещё не начавшие выполнение.')
+registry.gauge('mutato_jobs_running', 'Выполняющиеся задачи.')
+registry.histogram('mutato_job_seconds', 'Полная длительность задачи генерации графа.')
+registry.histogram('mutato_graph_nodes', 'Число узлов построенных графов.', SIZE_BUCKETS)
+registry.histogram('mutato_graph_edges', 'Число рёбер построенных графов.', SIZE_BUCKETS)
+
+
+def write_status(job_dir: str, status: str, **fields: Any) -> None:
+    """
+    Атомарно записывает статус задачи в её папку. Незавершённый статус
+    запоминает pid процесса, выполняющего задачу.
+
+    :param job_dir: Папка задачи.
+    :param status: Одно из QUEUED, RUNNING, DONE, FAILED.
+    :param fields: Дополнительные поля (stage, done, total, error).
+    """
+    payload = {'status': status, 'updated': time.time(), **fields}
+    if status in (QUEUED, RUNNING):
+        payload['pid'] = os.getpid()
+    path = os.path.join(job_dir, STATUS_FILE)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # os.kill на Windows завершает процесс, а не проверяет его
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def is_orphaned(status: Dict[str, Any]) -> bool:
+    """
+    :param status: Словарь статуса задачи.
+    :return: True, если задача не завершена, а процесс, выполнявший её, завершился.
+    """
+    if status.get('status') not in (QUEUED, RUNNING):
+        return False
+    pid = status.get('pid')
+    return pid is not None and not _process_alive(pid)
+
+
+def read_status(job_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Читает статус задачи. Потерянная задача (см. is_orphaned) при чтении
+    помечается как FAILED, чтобы страница ожидания не ждала её вечно.
+
+    :param job_dir: Папка задачи.
+    :return: Словарь статуса или None, если задача не ставилась в очередь.
+    """
+    try:
+        with open(os.path.join(job_dir, STATUS_FILE), 'r', encoding='utf-8') as f:
+            status = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if is_orphaned(status):
+        logger.warning("Задача %s потеряна (статус %s), помечаем как неудачную", job_dir, status['status'])
+        write_status(job_dir, FAILED, error=ORPHANED_ERROR)
+        registry.inc('mutato_jobs_total', status=FAILED)
+        return read_status(job_dir)
+    return status
+
+
+def fail_unfinished_jobs(root: str) -> int:
+    """
+    Помечает как FAILED все незавершённые задачи в папках запусков.
+    Вызывается при старте сервера, когда очередей прошлого запуска уже нет.
+
+    :param root: Папка с папками запусков.
+    :return: Количество помеченных задач.
+    """
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return 0
+    failed = 0
+    for entry in entries:
+        if not entry.is_dir():
+            continue
+        try:
+            with open(os.path.join(entry.path, STATUS_FILE), 'r', encoding='utf-8') as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if status.get('status') in (QUEUED, RUNNING):
+            write_status(entry.path, FAILED, error=ORPHANED_ERROR)
+            failed += 1
+    return failed
+
+
+class JobContext:
+    """Интерфейс, через который задача сообщает о прогрессе и занимает слот рендеринга."""
+
+    def __init__(self, job_dir: str, render_slots: threading.Semaphore) -> None:
+        self.job_dir = job_dir
+        self._render_slots = render_slots
+        # Длительности этапов в секундах и статистика задачи; попадают в итоговый status.json
+        self.timings: Dict[str, float] = {}
+        self.stats: Dict[str, Any] = {}
+
+    def progress(self, stage: str, done: Optional[int] = None, total: Optional[int] = None) -> None:
+        """
+        Обновляет статус выполняющейся задачи.
+
+        :param stage: Название текущего этапа.
+        :param done: Сколько шагов этапа выполнено.
+        :param total: Сколько шагов в этапе всего.
+        """
+        write_status(self.job_dir, RUNNING, stage=stage, done=done, total=total)
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """
+        Сообщает о начале этапа и замеряет его длительность
+        (в timings задачи и гистограмме mutato_stage_seconds).
+
+        :param stage: Название этапа.
+        """
+        self.progress(stage)
+        with timed(stage):
+            yield
+
+    def record_graph(self, nodes: int, edges: int) -> None:
+        """
+        Учитывает размер построенного графа в метриках.
+
+        :param nodes: Число узлов.
+        :param edges: Число рёбер.
+        """
+        registry.observe('mutato_graph_nodes', nodes)
+        registry.observe('mutato_graph_edges', edges)
+
+    @contextmanager
+    def render_slot(self) -> Iterator[None]:
+        """Ограничивает число одновременных тяжёлых рендерингов в процессе."""
+        with self._render_slots:
+            yield
+
+
+class JobQueue:
+    """
+    Локальная очередь задач на пуле потоков без внешнего брокера.
+
+    Пул создаётся лениво при первой задаче, то есть уже после fork воркера
+    gunicorn. Число одновременных задач ограничено max_workers, а число
+    одновременных рендерингов — max_renders (matplotlib.pyplot не потокобезопасен,
+    поэтому по умолчанию рендеринг идёт по одному).
+    """
+
+    def __init__(self, max_workers: int = 2, max_renders: int = 1) -> None:
+        """
+        :param max_workers: Число потоков, выполняющих задачи.
+        :param max_renders: Число одновременных рендерингов.
+        """
+        self.max_workers = max_workers
+        self._render_slots = threading.Semaphore(max(1, max_renders))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='mutato-job'
+                )
+            return self._executor
+
+    def submit(self, job_dir: str, fn: Callable[..., None], *args: Any) -> None:
+        """
+        Ставит задачу в очередь.
+
+        :param job_dir: Папка задачи, куда пишутся статус и артефакты.
+        :param fn: Функция fn(context, *args), выполняющая работу.
+        :param args: Аргументы функции.
+        """
+        write_status(job_dir, QUEUED)
+        registry.inc('mutato_jobs_queued')
+        self._get_executor().submit(self._run, job_dir, fn, args)
+
+    def _run(self, job_dir: str, fn: Callable[..., None], args: tuple) -> None:
+        started = time.perf_counter()
+        registry.inc('mutato_jobs_queued', -1)
+        registry.inc('mutato_jobs_running')
+        write_status(job_dir, RUNNING, stage='start')
+        context = JobContext(job_dir, self._render_slots)
+        start_timings(context.timings)
+        try:
+            fn(context, *args)
+        except Exception as e:
+            logger.exception("Задача %s завершилась с ошибкой", job_dir)
+            write_status(job_dir, FAILED, error=str(e))
+            registry.inc('mutato_jobs_total', status=FAILED)
+        else:
+            elapsed = time.perf_counter() - started
+            write_status(job_dir, DONE, elapsed=elapsed, timings=context.timings, stats=context.stats)
+            registry.inc('mutato_jobs_total', status=DONE)
+            registry.observe('mutato_job_seconds', elapsed)
+            logger.info("Задача %s выполнена за %.2f с: %s", job_dir, elapsed, ', '.join(
+                f"{stage}={seconds:.3f}" for stage, seconds in context.timings.items()
+            ))
+        finally:
+            stop_timings()
+            registry.inc('mutato_jobs_running', -1)
+            maybe_write_snapshot(force=True)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Останавливает пул потоков."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
@@ -0,0 +1,159 @@
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Dict, Hashable, List, NamedTuple, Optional, Tuple
+from weakref import WeakKeyDictionary
+import networkx as nx
+
+if TYPE_CHECKING:
+    from lineage import LineageIndex
+
+# Аргументы dot, с которыми строились деревья мутаций
+DOT_ARGS = '-Granksep=3 -Gnodesep=2'
+# Расстояния между уровнями и соседними листьями в tree_layout (в пунктах, как у dot)
+TREE_RANK_SEP = 216.0
+TREE_NODE_SEP = 144.0
+# Начиная с этого размера режим 'auto' не запускает dot
+DOT_MAX_NODES = 500
+
+Position = Tuple[float, float]
+
+
+class GraphLayout(NamedTuple):
+    """
+    Раскладка графа, общая для всех рендереров.
+
+    positions — координаты узлов, depths — глубина каждого узла от ближайшего
+    корня, max_depth — наибольшая глубина (не меньше 1, чтобы на неё можно
+    было делить), method — каким способом посчитаны координаты.
+    """
+    positions: Dict[Hashable, Position]
+    depths: Dict[Hashable, int]
+    max_depth: int
+    method: str
+
+
+def compute_depths(graph: nx.DiGraph) -> Tuple[List[Hashable], Dict[Hashable, int], Dict[Hashable, Hashable]]:
+    """
+    Находит корни и считает глубины обходом в ширину сразу от всех корней.
+
+    Корни — узлы без входящих рёбер. Узлы, недостижимые из них (например,
+    цикл из-за совпавших мутантов), тоже получают корень: первый такой узел
+    в порядке графа.
+
+    :param graph: Граф мутаций.
+    :return: Кортеж (корни, глубины узлов, родитель каждого узла в дереве обхода).
+    """
+    roots = [node for node, degree in graph.in_degree() if degree == 0]
+    depths: Dict[Hashable, int] = {}
+    parents: Dict[Hashable, Hashable] = {}
+
+    def visit(sources: List[Hashable]) -> None:
+        for source in sources:
+            depths[source] = 0
+        queue = deque(sources)
+        while queue:
+            node = queue.popleft()
+            depth = depths[node] + 1
+            for child in graph.successors(node):
+                if child not in depths:
+                    depths[child] = depth
+                    parents[child] = node
+                    queue.append(child)
+
+    visit(roots)
+    if len(depths) < graph.number_of_nodes():
+        for node in graph.nodes:
+            if node not in depths:
+                roots.append(node)
+                visit([node])
+    return roots, depths, parents
+
+
+def tree_layout(graph: nx.DiGraph, roots: List[Hashable], depths: Dict[Hashable, int],
+                parents: Dict[Hashable, Hashable]) -> Dict[Hashable, Position]:
+    """
+    Быстрая раскладка леса за O(n) без вызова graphviz.
+
+    Листья дерева обхода расставляются слева направо с шагом TREE_NODE_SEP,
+    внутренний узел ставится посередине между крайними потомками, уровни
+    разнесены на TREE_RANK_SEP по вертикали (корни сверху, как у dot).
+
+    :param graph: Граф мутаций.
+    :param roots: Корни леса.
+    :param depths: Глубины узлов.
+    :param parents: Родители узлов в дереве обхода.
+    :return: Координаты узлов.
+    """
+    children: Dict[Hashable, List[Hashable]] = {node: [] for node in graph.nodes}
+    for node, parent in parents.items():
+        children[parent].append(node)
+
+    max_depth = max(depths.values(), default=0)
+    positions: Dict[Hashable, Position] = {}
+    next_leaf = 0.0
+    for root in roots:
+        # Итеративный обход в глубину: узел размещается после всех своих детей
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            kids = children[node]
+            if not kids:
+                positions[node] = (next_leaf, (max_depth - depths[node]) * TREE_RANK_SEP)
+                next_leaf += TREE_NODE_SEP
+            elif expanded:
+                x = (positions[kids[0]][0] + positions[kids[-1]][0]) / 2
+                positions[node] = (x, (max_depth - depths[node]) * TREE_RANK_SEP)
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(kids))
+    return positions
+
+
+_layout_cache: 'WeakKeyDictionary[nx.DiGraph, Dict[Tuple, GraphLayout]]' = WeakKeyDictionary()
+_layout_lock = threading.Lock()
+
+
+def compute_layout(graph: nx.DiGraph, method: str = 'auto',
+                   lineage: Optional['LineageIndex'] = None) -> GraphLayout:
+    """
+    Считает раскладку и глубины графа один раз и кэширует их для этого графа.
+
+    Повторные вызовы для того же неизменённого графа (например, из статического
+    и интерактивного рендереров) возвращают сохранённый результат без
+    повторного запуска dot.
+
+    :param graph: Граф мутаций.
+    :param method: 'dot' (graphviz), 'tree' (быстрая раскладка) или 'auto' —
+        dot для графов до DOT_MAX_NODES узлов, иначе tree.
+    :param lineage: Индекс родословной MutationGraph, из которого получен
+        graph (MutationGraph.lineage()); если передан, корни, глубины и
+        дерево берутся из него без обхода графа, иначе считаются compute_depths.
+    :return: GraphLayout.
+    :raises ValueError: при неизвестном методе.
+    """
+    if method == 'auto':
+        method = 'dot' if graph.number_of_nodes() <= DOT_MAX_NODES else 'tree'
+    if method not in ('dot', 'tree'):
+        raise ValueError(f"Неизвестный метод раскладки: {method}")
+
+    signature = (method, graph.number_of_nodes(), graph.number_of_edges(), lineage is not None)
+    with _layout_lock:
+        cached = _layout_cache.get(graph, {}).get(signature)
+    if cached is not None:
+        return cached
+
+    roots, depths, parents = lineage.as_tree() if lineage is not None else compute_depths(graph)
+    if method == 'dot':
+        from networkx.drawing.nx_agraph import graphviz_layout
+        # Только структура: атрибут узла 'pos' (часть речи) graphviz принял бы за координаты
+        bare = nx.DiGraph()
+        bare.add_nodes_from(graph)
+        bare.add_edges_from(graph.edges)
+        positions = graphviz_layout(bare, prog='dot', args=DOT_ARGS)
+    else:
+        positions = tree_layout(graph, roots, depths, parents)
+    layout = GraphLayout(positions, depths, max(max(depths.values(), default=0), 1), method)
+
+    with _layout_lock:
+        _layout_cache.setdefault(graph, {})[signature] = layout
+    return layout
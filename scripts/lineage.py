@@ -0,0 +1,299 @@
+import argparse
+import json
+import threading
+from typing import TYPE_CHECKING, Dict, Hashable, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+if TYPE_CHECKING:
+    from graph_store import MutationGraph
+
+# Индекс родословной опирается на лес первых предков MutationGraph.parent:
+# родитель всегда добавлен раньше потомка, поэтому корень и глубина нового
+# узла известны сразу при его добавлении (graph.root, graph.depth). Интервалы
+# обхода Эйлера (tin, tout) строятся векторно по уровням за O(n) при первом
+# запросе после роста графа; узел b лежит в поддереве a, если
+# tin[a] <= tin[b] < tout[a], а поддерево — это срез order[tin[a]:tout[a]].
+
+
+def _column(values, n: int) -> np.ndarray:
+    # Копия среза: представление самого array запретило бы графу расти
+    return np.frombuffer(values[:n], dtype=np.int32)
+
+
+class RootStats(NamedTuple):
+    """Сводка по потомкам одного начального слова."""
+    root: str
+    nodes: int
+    leaves: int
+    max_depth: int
+    mean_depth: float
+
+
+def lineage_columns(parent: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Считает корень и глубину каждого узла по массиву родителей удвоением
+    указателей за O(n log h), где h — высота леса.
+
+    :param parent: id родителей (-1 у корней).
+    :return: Кортеж (корни, глубины) в виде массивов int32.
+    """
+    parent = np.asarray(parent, dtype=np.int64)
+    n = len(parent)
+    ids = np.arange(n, dtype=np.int64)
+    up = np.where(parent >= 0, parent, ids)
+    # dist — длина пути от узла до up[узла]
+    dist = (parent >= 0).astype(np.int64)
+    while True:
+        next_up = up[up]
+        if np.array_equal(next_up, up):
+            break
+        dist = dist + dist[up]
+        up = next_up
+    return up.astype(np.int32), dist.astype(np.int32)
+
+
+def euler_intervals(parent: np.ndarray, depth: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Строит интервалы обхода в глубину леса за O(n) проходами по уровням.
+
+    Дети узла обходятся в порядке добавления, корни — тоже.
+
+    :param parent: id родителей (-1 у корней).
+    :param depth: Глубины узлов.
+    :return: Кортеж (tin, tout, order): время входа, время выхода
+        (tin + размер поддерева) и узлы в порядке обхода.
+    """
+    n = len(parent)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    parent = np.asarray(parent, dtype=np.int64)
+    by_depth = np.argsort(depth, kind='stable')
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(depth))))
+    levels = [by_depth[bounds[d]:bounds[d + 1]] for d in range(len(bounds) - 1)]
+
+    # Размеры поддеревьев: снизу вверх по уровням
+    size = np.ones(n, dtype=np.int64)
+    for nodes in reversed(levels[1:]):
+        np.add.at(size, parent[nodes], size[nodes])
+
+    # Время входа: сверху вниз, дети одного родителя идут подряд после него
+    tin = np.empty(n, dtype=np.int64)
+    roots = levels[0]
+    tin[roots] = np.cumsum(size[roots]) - size[roots]
+    for nodes in levels[1:]:
+        nodes = nodes[np.argsort(parent[nodes], kind='stable')]
+        parents = parent[nodes]
+        sizes = size[nodes]
+        before = np.cumsum(sizes) - sizes
+        group_start = np.concatenate(([True], parents[1:] != parents[:-1]))
+        # before не убывает, поэтому максимум по префиксу даёт начало группы
+        base = np.maximum.accumulate(np.where(group_start, before, 0))
+        tin[nodes] = tin[parents] + 1 + before - base
+
+    order = np.empty(n, dtype=np.int64)
+    order[tin] = np.arange(n)
+    return tin, tin + size, order
+
+
+class LineageIndex:
+    """
+    Индекс родословной графа мутаций: корень, глубина и интервал обхода
+    Эйлера каждого узла.
+
+    Корень и глубина читаются из столбцов графа, которые ведутся при
+    добавлении узлов; интервалы пересчитываются лениво, если граф вырос
+    с момента последнего запроса. После этого проверка предка — O(1),
+    поддерево из k узлов — O(k), сводка по корню — O(1).
+    """
+
+    def __init__(self, graph: 'MutationGraph') -> None:
+        """
+        :param graph: Граф мутаций.
+        """
+        self.graph = graph
+        self._lock = threading.Lock()
+        self._size = -1
+        self._tin = self._tout = self._order = None
+        self._stats: Optional[List[RootStats]] = None
+
+    def _ensure(self) -> None:
+        n = len(self.graph)
+        if self._size == n:
+            return
+        with self._lock:
+            if self._size == n:
+                return
+            parent = _column(self.graph.parent, n)
+            depth = _column(self.graph.depth, n)
+            self._tin, self._tout, self._order = euler_intervals(parent, depth)
+            self._stats = None
+            self._size = n
+
+    def _id(self, node) -> int:
+        return self.graph.ids[node] if isinstance(node, str) else int(node)
+
+    def root(self, node) -> str:
+        """
+        :param node: Слово или id узла.
+        :return: Начальное слово, от которого произошёл узел.
+        """
+        return self.graph.words[self.graph.root[self._id(node)]]
+
+    def depth(self, node) -> int:
+        """
+        :param node: Слово или id узла.
+        :return: Число мутаций от начального слова.
+        """
+        return self.graph.depth[self._id(node)]
+
+    def is_ancestor(self, ancestor, node) -> bool:
+        """
+        :param ancestor: Слово или id предполагаемого предка.
+        :param node: Слово или id узла.
+        :return: True, если node — потомок ancestor (или совпадает с ним).
+        """
+        self._ensure()
+        a, b = self._id(ancestor), self._id(node)
+        return bool(self._tin[a] <= self._tin[b] < self._tout[a])
+
+    def ancestors(self, node) -> List[str]:
+        """
+        :param node: Слово или id узла.
+        :return: Цепочка предков от родителя до начального слова (O(глубина)).
+        """
+        parent = self.graph.parent
+        chain = []
+        current = parent[self._id(node)]
+        while current >= 0:
+            chain.append(self.graph.words[current])
+            current = parent[current]
+        return chain
+
+    def subtree_ids(self, node) -> np.ndarray:
+        """
+        :param node: Слово или id узла.
+        :return: id узла и всех его потомков в порядке обхода в глубину.
+        """
+        self._ensure()
+        node_id = self._id(node)
+        return self._order[self._tin[node_id]:self._tout[node_id]]
+
+    def subtree(self, node) -> List[str]:
+        """
+        :param node: Слово или id узла.
+        :return: Слово узла и слова всех его потомков в порядке обхода в глубину.
+        """
+        words = self.graph.words
+        return [words[i] for i in self.subtree_ids(node).tolist()]
+
+    def subtree_size(self, node) -> int:
+        """
+        :param node: Слово или id узла.
+        :return: Число узлов в поддереве (включая сам узел).
+        """
+        self._ensure()
+        node_id = self._id(node)
+        return int(self._tout[node_id] - self._tin[node_id])
+
+    def subtree_graph(self, node) -> 'MutationGraph':
+        """
+        :param node: Слово или id узла.
+        :return: Подграф из поддерева узла (узел становится корнем).
+        """
+        return self.graph.subgraph(np.sort(self.subtree_ids(node)).tolist())
+
+    def roots(self) -> List[str]:
+        """
+        :return: Начальные слова в порядке добавления.
+        """
+        root = _column(self.graph.root, len(self.graph))
+        words = self.graph.words
+        return [words[i] for i in np.flatnonzero(root == np.arange(len(root))).tolist()]
+
+    def root_stats(self) -> List[RootStats]:
+        """
+        :return: Сводка по каждому начальному слову: число потомков (с ним
+            самим), листьев, наибольшая и средняя глубина.
+        """
+        self._ensure()
+        with self._lock:
+            if self._stats is not None:
+                return self._stats
+            n = self._size
+            root = _column(self.graph.root, n)
+            depth = _column(self.graph.depth, n)
+            leaf = (self._tout - self._tin) == 1
+            roots = np.flatnonzero(root == np.arange(n))
+            nodes = np.bincount(root, minlength=n)
+            leaves = np.bincount(root, weights=leaf, minlength=n)
+            depth_sum = np.bincount(root, weights=depth, minlength=n)
+            max_depth = np.zeros(n, dtype=np.int64)
+            np.maximum.at(max_depth, root, depth)
+            self._stats = [
+                RootStats(self.graph.words[r], int(nodes[r]), int(leaves[r]), int(max_depth[r]),
+                          float(depth_sum[r] / nodes[r]))
+                for r in roots.tolist()
+            ]
+            return self._stats
+
+    def as_tree(self) -> Tuple[List[int], Dict[Hashable, int], Dict[Hashable, Hashable]]:
+        """
+        Представляет лес первых предков в виде, который принимает раскладка
+        (см. layout.tree_layout).
+
+        :return: Кортеж (корни, глубины узлов, родитель каждого узла) по id
+            узлов — тем же ключам, что у MutationGraph.to_networkx.
+        """
+        n = len(self.graph)
+        root = self.graph.root[:n]
+        depths = dict(enumerate(self.graph.depth[:n].tolist()))
+        parents = {i: p for i, p in enumerate(self.graph.parent[:n].tolist()) if p >= 0}
+        roots = [i for i in range(n) if root[i] == i]
+        return roots, depths, parents
+
+    def describe(self, node, limit: int = 1000) -> Dict[str, object]:
+        """
+        Сводка по узлу для API запросов.
+
+        :param node: Слово или id узла.
+        :param limit: Наибольшее число возвращаемых потомков.
+        :return: Словарь с корнем, глубиной, предками, размером и началом поддерева.
+        """
+        node_id = self._id(node)
+        descendants = self.subtree_ids(node_id)[1:limit + 1].tolist()
+        return {
+            'word': self.graph.words[node_id],
+            'root': self.root(node_id),
+            'depth': self.depth(node_id),
+            'generation': self.graph.node_generation[node_id],
+            'ancestors': self.ancestors(node_id),
+            'subtree_size': self.subtree_size(node_id),
+            'descendants': [self.graph.words[i] for i in descendants],
+        }
+
+
+# Запросы к сохранённому графу из командной строки
+if __name__ == '__main__':
+    from graph_io import GRAPH_FORMATS, load_mutation_graph, save_mutation_graph
+
+    parser = argparse.ArgumentParser(description="Запросы к родословной сохранённого графа мутаций.")
+    parser.add_argument('graph', help="файл графа (.npz, .mgb, .jsonl.gz, .parquet)")
+    parser.add_argument('--word', help="слово, для которого выводятся корень, глубина, предки и потомки")
+    parser.add_argument('--limit', type=int, default=1000, help="наибольшее число выводимых потомков")
+    parser.add_argument('--subtree', metavar='OUTPUT',
+                        help="сохранить поддерево --word в файл (формат по расширению)")
+    parser.add_argument('--format', choices=sorted(GRAPH_FORMATS), default=None,
+                        help="формат файла поддерева, если его нельзя определить по расширению")
+    args = parser.parse_args()
+
+    lineage = load_mutation_graph(args.graph).lineage()
+    if args.word is None:
+        result = [stats._asdict() for stats in lineage.root_stats()]
+    else:
+        if args.word not in lineage.graph:
+            parser.error(f"Слова нет в графе: {args.word}")
+        result = lineage.describe(args.word, args.limit)
+        if args.subtree:
+            save_mutation_graph(lineage.subtree_graph(args.word), args.subtree, args.format)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,473 @@
+import contextvars
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import pyinstrument
+except ImportError:  # pyinstrument — необязательная зависимость
+    pyinstrument = None
+
+# Метрики ведутся в памяти процесса. Чтобы /metrics в любом воркере
+# gunicorn показывал сумму по всем воркерам, каждый процесс периодически
+# сбрасывает снимок своих метрик в общую папку, а при выдаче снимки
+# складываются — так же, как статусы задач, видимые всем воркерам.
+METRICS_DIR = os.environ.get('MUTATO_METRICS_DIR', os.path.join('results', 'metrics'))
+SNAPSHOT_INTERVAL = 1.0
+
+# Границы корзин гистограмм по умолчанию: секунды этапов и размеры графов
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+
+# Профилирование отдельных запросов и задач: MUTATO_PROFILING=1 разрешает
+# ?profile=1, MUTATO_PROFILE_SAMPLE_RATE — доля задач, профилируемых без запроса.
+PROFILING_ENABLED = os.environ.get('MUTATO_PROFILING', '0') == '1'
+PROFILE_SAMPLE_RATE = float(os.environ.get('MUTATO_PROFILE_SAMPLE_RATE', 0))
+PROFILE_TOP = 40
+
+_NAME_RE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*$')
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ''
+    escaped = (
+        f'{name}="' + value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Реестр счётчиков, гауг и гистограмм процесса в формате Prometheus.
+
+    Запись потокобезопасна и дешева (словарь под блокировкой), поэтому
+    вызовы можно оставлять на горячих путях. Значения, которые удобнее
+    считать в момент выдачи (статистика кэшей), поставляются
+    функциями-сборщиками.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # имя -> (тип, описание, границы корзин гистограммы)
+        self._meta: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {}
+        self._values: Dict[str, Dict[LabelKey, Any]] = {}
+        self._collectors: List[Tuple[Callable[[], Dict[str, Any]], bool]] = []
+
+    def _declare(self, name: str, kind: str, help_text: str, buckets: Tuple[float, ...] = ()) -> None:
+        if not _NAME_RE.match(name):
+            raise ValueError(f"Некорректное имя метрики: {name}")
+        with self._lock:
+            known = self._meta.get(name)
+            if known is not None and known[0] != kind:
+                raise ValueError(f"Метрика {name} уже объявлена как {known[0]}")
+            self._meta[name] = (kind, help_text, tuple(sorted(buckets)))
+            self._values.setdefault(name, {})
+
+    def counter(self, name: str, help_text: str) -> None:
+        """
+        Объявляет счётчик (монотонно растущее значение).
+
+        :param name: Имя метрики, по соглашению с суффиксом _total.
+        :param help_text: Описание для строки # HELP.
+        """
+        self._declare(name, 'counter', help_text)
+
+    def gauge(self, name: str, help_text: str) -> None:
+        """
+        Объявляет гаугу (текущее значение).
+
+        :param name: Имя метрики.
+        :param help_text: Описание для строки # HELP.
+        """
+        self._declare(name, 'gauge', help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = TIME_BUCKETS) -> None:
+        """
+        Объявляет гистограмму.
+
+        :param name: Имя метрики.
+        :param help_text: Описание для строки # HELP.
+        :param buckets: Верхние границы корзин (корзина +Inf добавляется сама).
+        """
+        self._declare(name, 'histogram', help_text, buckets)
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """
+        Увеличивает счётчик или гаугу.
+
+        :param name: Имя объявленной метрики.
+        :param value: Приращение.
+        :param labels: Метки.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        """
+        Устанавливает значение гауги.
+
+        :param name: Имя объявленной гауги.
+        :param value: Новое значение.
+        :param labels: Метки.
+        """
+        with self._lock:
+            self._values[name][_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """
+        Добавляет наблюдение в гистограмму.
+
+        :param name: Имя объявленной гистограммы.
+        :param value: Наблюдаемое значение.
+        :param labels: Метки.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            buckets = self._meta[name][2]
+            series = self._values[name]
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * len(buckets), 0, 0.0]
+            counts = state[0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+            state[1] += 1
+            state[2] += value
+
+    def register_collector(self, collector: Callable[[], Dict[str, Any]], shared: bool = False) -> None:
+        """
+        Регистрирует функцию, возвращающую значения метрик в момент выдачи.
+
+        Сборщик возвращает словарь имя -> значение или имя -> {метки: значение},
+        где метки — кортеж пар (имя, значение). Метрики должны быть объявлены.
+
+        :param collector: Функция-сборщик.
+        :param shared: True, если значения общие для всех процессов (например,
+            размер кэша на диске) и не суммируются по воркерам.
+        """
+        with self._lock:
+            self._collectors.append((collector, shared))
+
+    def _collect(self, shared: bool) -> Dict[str, Dict[LabelKey, Any]]:
+        with self._lock:
+            collectors = [fn for fn, is_shared in self._collectors if is_shared == shared]
+        collected: Dict[str, Dict[LabelKey, Any]] = {}
+        for collector in collectors:
+            for name, value in collector().items():
+                series = value if isinstance(value, dict) else {(): value}
+                collected.setdefault(name, {}).update(series)
+        return collected
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        :return: Снимок значений процесса (без общих сборщиков), пригодный для JSON.
+        """
+        collected = self._collect(shared=False)
+        with self._lock:
+            # Состояния гистограмм изменяются на месте, поэтому копируются под блокировкой
+            values = {
+                name: {key: [list(value[0]), value[1], value[2]] if isinstance(value, list) else value
+                       for key, value in series.items()}
+                for name, series in self._values.items()
+            }
+        for name, series in collected.items():
+            values.setdefault(name, {}).update(series)
+        return {
+            'pid': os.getpid(),
+            'types': {name: meta[0] for name, meta in self._meta.items()},
+            'values': {
+                name: [[list(map(list, key)), value] for key, value in series.items()]
+                for name, series in values.items()
+            },
+        }
+
+    def write_snapshot(self, directory: str = METRICS_DIR) -> None:
+        """
+        Атомарно сохраняет снимок процесса в <directory>/<pid>.json.
+
+        :param directory: Папка снимков.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def merged(self, directory: Optional[str] = METRICS_DIR) -> Dict[str, Dict[LabelKey, Any]]:
+        """
+        Складывает живые значения процесса со снимками остальных процессов.
+
+        :param directory: Папка снимков или None (только текущий процесс).
+        :return: Словарь имя -> {метки: значение}.
+        """
+        snapshots = [self.snapshot()]
+        if directory is not None:
+            try:
+                names = os.listdir(directory)
+            except FileNotFoundError:
+                names = []
+            for name in names:
+                if not name.endswith('.json') or name == f"{os.getpid()}.json":
+                    continue
+                try:
+                    with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        merged: Dict[str, Dict[LabelKey, Any]] = {}
+        for snapshot in snapshots:
+            for name, series in snapshot['values'].items():
+                if name not in self._meta:
+                    continue
+                target = merged.setdefault(name, {})
+                for key, value in series:
+                    key = tuple(tuple(pair) for pair in key)
+                    if self._meta[name][0] == 'histogram':
+                        state = target.setdefault(key, [[0] * len(value[0]), 0, 0.0])
+                        state[0] = [a + b for a, b in zip(state[0], value[0])]
+                        state[1] += value[1]
+                        state[2] += value[2]
+                    else:
+                        target[key] = target.get(key, 0) + value
+        for name, series in self._collect(shared=True).items():
+            merged.setdefault(name, {}).update(series)
+        return merged
+
+    def render(self, directory: Optional[str] = METRICS_DIR) -> str:
+        """
+        Формирует текст в формате экспозиции Prometheus (text/plain; version=0.0.4).
+
+        :param directory: Папка снимков других процессов или None.
+        :return: Текст метрик.
+        """
+        merged = self.merged(directory)
+        lines: List[str] = []
+        for name in sorted(self._meta):
+            kind, help_text, buckets = self._meta[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(merged.get(name, {}).items()):
+                if kind != 'histogram':
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                    continue
+                counts, count, total = value
+                for bound, bucket_count in zip(buckets, counts):
+                    le = (('le', _format_value(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(key, le)} {bucket_count}")
+                lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def clear_snapshots(directory: str = METRICS_DIR) -> None:
+    """
+    Удаляет снимки метрик прошлых процессов (вызывается при старте сервера).
+
+    :param directory: Папка снимков.
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def retire_snapshot(pid: int, directory: str = METRICS_DIR) -> None:
+    """
+    Убирает гауги из снимка завершившегося процесса: его счётчики и
+    гистограммы продолжают входить в сумму, а текущие значения — нет.
+
+    :param pid: Идентификатор завершившегося процесса.
+    :param directory: Папка снимков.
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return
+    snapshot['values'] = {
+        name: series for name, series in snapshot['values'].items()
+        if snapshot.get('types', {}).get(name) != 'gauge'
+    }
+    tmp_path = f"{path}.retired.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+registry = MetricsRegistry()
+registry.histogram('mutato_stage_seconds', 'Длительность этапов генерации графа и обработки запросов.')
+registry.counter('mutato_tagger_calls_total', 'Пакетные вызовы теггера Natasha.')
+registry.counter('mutato_tagger_words_total', 'Слова, размеченные теггером Natasha.')
+registry.counter('mutato_tagger_seconds_total', 'Время работы теггера Natasha.')
+registry.counter('mutato_morph_index_hits_total', 'Слова, найденные в предвычисленном морфологическом индексе.')
+
+_last_snapshot = 0.0
+_snapshot_lock = threading.Lock()
+# Одновременно в процессе может работать только один профилировщик
+_profile_lock = threading.Lock()
+
+
+def maybe_write_snapshot(force: bool = False) -> None:
+    """
+    Сбрасывает снимок метрик процесса не чаще раза в SNAPSHOT_INTERVAL секунд.
+
+    :param force: Записать снимок независимо от интервала.
+    """
+    global _last_snapshot
+    with _snapshot_lock:
+        now = time.monotonic()
+        if not force and now - _last_snapshot < SNAPSHOT_INTERVAL:
+            return
+        _last_snapshot = now
+    try:
+        registry.write_snapshot()
+    except OSError:
+        pass
+
+
+# Длительности этапов текущего запроса или задачи (для заголовка Server-Timing и status.json)
+_current_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    'mutato_timings', default=None
+)
+
+
+def start_timings(timings: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """
+    Начинает сбор длительностей этапов в текущем потоке (контексте).
+
+    :param timings: Словарь, куда складывать длительности (по умолчанию новый).
+    :return: Словарь длительностей.
+    """
+    timings = {} if timings is None else timings
+    _current_timings.set(timings)
+    return timings
+
+
+def stop_timings() -> Optional[Dict[str, float]]:
+    """
+    Завершает сбор длительностей в текущем контексте.
+
+    :return: Собранные длительности или None, если сбор не начинался.
+    """
+    timings = _current_timings.get()
+    _current_timings.set(None)
+    return timings
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Замеряет этап: добавляет наблюдение в mutato_stage_seconds и, если в
+    контексте идёт сбор (start_timings), прибавляет длительность к нему.
+
+    :param stage: Название этапа.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe('mutato_stage_seconds', elapsed, stage=stage)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """
+    :param timings: Длительности этапов в секундах.
+    :return: Значение заголовка Server-Timing (длительности в миллисекундах).
+    """
+    return ', '.join(f"{re.sub(r'[^A-Za-z0-9_-]', '_', stage)};dur={seconds * 1000:.1f}"
+                     for stage, seconds in timings.items())
+
+
+def should_profile(requested: bool = False) -> bool:
+    """
+    :param requested: Профилирование явно запрошено (?profile=1).
+    :return: True, если запрос или задачу нужно профилировать.
+    """
+    if requested and PROFILING_ENABLED:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+@contextmanager
+def profiled(report: Dict[str, str]) -> Iterator[None]:
+    """
+    Профилирует блок кода: pyinstrument (выборочный, HTML), если он
+    установлен, иначе cProfile (текстовый отчёт pstats). Если профилировщик
+    уже занят другим запросом, блок выполняется без профилирования.
+
+    :param report: Словарь, в который после выхода из блока записываются
+        'format' ('html' или 'txt') и 'content'; пустой, если профилирования не было.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        yield
+        return
+    try:
+        with _profile(report):
+            yield
+    finally:
+        _profile_lock.release()
+
+
+@contextmanager
+def _profile(report: Dict[str, str]) -> Iterator[None]:
+    if pyinstrument is not None:
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            report.update(format='html', content=profiler.output_html())
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        report.update(format='txt', content=stream.getvalue())
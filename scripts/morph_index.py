@@ -0,0 +1,157 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Iterable, Optional, Tuple
+
+# Формат файла индекса:
+#   заголовок | смещения uint32[n + 1] | коды uint8[2 * n] | UTF-8 слова подряд
+# Слова отсортированы по байтам UTF-8, поэтому поиск — бинарный по смещениям.
+MAGIC = b'MUTMIDX1'
+HEADER = struct.Struct('<8sBxxxII')
+BYTEORDER_FLAGS = {'little': 1, 'big': 2}
+
+# Коды частей речи (Universal Dependencies) и родов; 0 — неизвестно
+POS_TAGS: Tuple[Optional[str], ...] = (
+    None, 'ADJ', 'ADP', 'ADV', 'AUX', 'CCONJ', 'DET', 'INTJ', 'NOUN', 'NUM',
+    'PART', 'PRON', 'PROPN', 'PUNCT', 'SCONJ', 'SYM', 'VERB', 'X',
+)
+GENDERS: Tuple[str, ...] = ('unknown', 'masc', 'fem', 'neut')
+
+_POS_CODES = {tag: code for code, tag in enumerate(POS_TAGS)}
+_GENDER_CODES = {gender: code for code, gender in enumerate(GENDERS)}
+
+
+class MorphIndex:
+    """
+    Отображённый в память индекс части речи и рода для слов корпуса.
+
+    Файл не копируется в память процесса: все воркеры, открывшие один и тот же
+    индекс, разделяют страницы через page cache. Поиск слова — O(log n).
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Путь к файлу, созданному write_index.
+        :raises ValueError: если файл не является индексом или собран на машине
+            с другим порядком байтов.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, byteorder, count, blob_size = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path}: неверная сигнатура индекса")
+            if byteorder != BYTEORDER_FLAGS[sys.byteorder]:
+                raise ValueError(f"{path}: индекс собран с другим порядком байтов")
+            offsets_start = HEADER.size
+            codes_start = offsets_start + 4 * (count + 1)
+            blob_start = codes_start + 2 * count
+            if len(self._mmap) != blob_start + blob_size:
+                raise ValueError(f"{path}: повреждённый файл индекса")
+        except (ValueError, struct.error):
+            self._mmap.close()
+            raise
+
+        view = memoryview(self._mmap)
+        self._count = count
+        self._offsets = view[offsets_start:codes_start].cast('I')
+        self._codes = view[codes_start:blob_start]
+        self._blob = view[blob_start:]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _word_at(self, i: int) -> bytes:
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes()
+
+    def find(self, word: str) -> int:
+        """
+        Ищет слово бинарным поиском.
+
+        :param word: Очищенное слово.
+        :return: Позиция слова в индексе или -1, если его нет.
+        """
+        key = word.encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._word_at(lo) == key:
+            return lo
+        return -1
+
+    def lookup(self, word: str) -> Optional[Tuple[Optional[str], str]]:
+        """
+        Возвращает часть речи и род слова из индекса.
+
+        :param word: Очищенное слово.
+        :return: Кортеж (часть_речи, род) или None, если слова нет в индексе.
+        """
+        i = self.find(word)
+        if i < 0:
+            return None
+        return POS_TAGS[self._codes[2 * i]], GENDERS[self._codes[2 * i + 1]]
+
+    def close(self) -> None:
+        """Освобождает отображение файла."""
+        self._offsets.release()
+        self._codes.release()
+        self._blob.release()
+        self._mmap.close()
+
+
+def write_index(entries: Iterable[Tuple[str, Optional[str], str]], path: str) -> int:
+    """
+    Записывает индекс из троек (слово, часть_речи, род).
+
+    Повторяющиеся слова схлопываются (остаётся последнее значение), неизвестные
+    метки кодируются как 0. Файл записывается атомарно.
+
+    :param entries: Тройки (слово, часть_речи, род).
+    :param path: Путь к итоговому файлу индекса.
+    :return: Количество слов в индексе.
+    """
+    table = {}
+    for word, pos, gender in entries:
+        table[word.encode('utf-8')] = (_POS_CODES.get(pos, 0), _GENDER_CODES.get(gender, 0))
+
+    offsets = array('I', [0])
+    codes = bytearray()
+    blob = bytearray()
+    for key in sorted(table):
+        blob += key
+        offsets.append(len(blob))
+        codes += bytes(table[key])
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, BYTEORDER_FLAGS[sys.byteorder], len(table), len(blob)))
+        f.write(offsets.tobytes())
+        f.write(codes)
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return len(table)
+
+
+def open_index(path: str) -> Optional[MorphIndex]:
+    """
+    Открывает индекс, если он существует и корректен.
+
+    :param path: Путь к файлу индекса.
+    :return: MorphIndex или None, если индекс отсутствует или не подходит.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return MorphIndex(path)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,358 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from .metrics import registry
+    from .morph_index import open_index
+except ImportError:
+    from metrics import registry
+    from morph_index import open_index
+
+# Модели Natasha создаются лениво при первом обращении (см. load_models)
+_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+
+# Длительности этапов загрузки моделей в секундах
+startup_timings: Dict[str, float] = {}
+
+
+def load_models() -> Tuple[Any, Any]:
+    """
+    Возвращает сегментатор и морфологический теггер Natasha, загружая их
+    при первом вызове.
+
+    Загрузка потокобезопасна и выполняется один раз на процесс; если она
+    прошла до fork (preload в gunicorn), воркеры разделяют память моделей.
+
+    :return: Кортеж (Segmenter, NewsMorphTagger).
+    """
+    if not _models:
+        with _models_lock:
+            if not _models:
+                started = time.perf_counter()
+                from natasha import Segmenter, NewsEmbedding, NewsMorphTagger
+                startup_timings['natasha_import'] = time.perf_counter() - started
+
+                started = time.perf_counter()
+                segmenter = Segmenter()
+                startup_timings['segmenter'] = time.perf_counter() - started
+
+                started = time.perf_counter()
+                emb = NewsEmbedding()
+                startup_timings['embedding'] = time.perf_counter() - started
+
+                started = time.perf_counter()
+                morph_tagger = NewsMorphTagger(emb)
+                startup_timings['morph_tagger'] = time.perf_counter() - started
+
+                _models['segmenter'] = segmenter
+                _models['morph_tagger'] = morph_tagger
+    return _models['segmenter'], _models['morph_tagger']
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Заранее загружает модели Natasha, чтобы первый запрос не платил за это.
+
+    Предназначена для вызова из хуков gunicorn (when_ready при preload_app
+    или post_fork) и из CLI перед длительной симуляцией.
+
+    :return: Длительности этапов загрузки в секундах.
+    """
+    load_models()
+    return dict(startup_timings)
+
+
+class MorphAnalysis(NamedTuple):
+    """
+    Результат морфологического разбора одного слова.
+
+    word — очищенное слово, pos — метка части речи (или None),
+    gender — род в нижнем регистре ("masc", "fem", "neut" или "unknown"),
+    feats — все морфологические признаки токена.
+    """
+    word: str
+    pos: Optional[str]
+    gender: str
+    feats: Dict[str, str]
+
+
+class MorphCache:
+    """
+    Ограниченный по размеру LRU-кэш результатов морфологического разбора.
+
+    Кэш общий для всех запросов процесса, защищён блокировкой и ведёт
+    счётчики попаданий, промахов и вытеснений. Может сохраняться на диск
+    в JSON и загружаться обратно, чтобы прогретые воркеры и запуски CLI
+    стартовали с заполненным кэшем.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        """
+        :param max_size: Максимальное число хранимых слов (0 — кэш отключён).
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[str, MorphAnalysis]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, word: str) -> Optional[MorphAnalysis]:
+        """
+        Возвращает разбор слова из кэша и помечает его как недавно использованный.
+
+        :param word: Очищенное слово.
+        :return: MorphAnalysis или None при промахе.
+        """
+        with self._lock:
+            analysis = self._data.get(word)
+            if analysis is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(word)
+            self.hits += 1
+            return analysis
+
+    def put(self, word: str, analysis: MorphAnalysis) -> None:
+        """
+        Кладёт разбор в кэш, вытесняя самые давно использованные записи.
+
+        :param word: Очищенное слово.
+        :param analysis: Результат разбора.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[word] = analysis
+            self._data.move_to_end(word)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Очищает кэш и обнуляет счётчики."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: Словарь со счётчиками hits, misses, evictions, size и max_size.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'max_size': self.max_size,
+            }
+
+    def save(self, path: str) -> None:
+        """
+        Атомарно сохраняет содержимое кэша в JSON-файл в порядке LRU.
+
+        :param path: Путь к файлу кэша.
+        """
+        with self._lock:
+            records = [[a.word, a.pos, a.gender, a.feats] for a in self._data.values()]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> int:
+        """
+        Загружает записи из JSON-файла, сохранённого методом save.
+
+        :param path: Путь к файлу кэша.
+        :return: Количество загруженных записей (0, если файла нет или он повреждён).
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return 0
+        for word, pos, gender, feats in records:
+            self.put(word, MorphAnalysis(word, pos, gender, feats))
+        return len(records)
+
+
+# Размер и путь к файлу кэша задаются через переменные окружения
+MORPH_CACHE_SIZE = int(os.environ.get('MUTATO_MORPH_CACHE_SIZE', 100000))
+MORPH_CACHE_PATH = os.environ.get('MUTATO_MORPH_CACHE_PATH')
+
+morph_cache = MorphCache(MORPH_CACHE_SIZE)
+
+
+def save_morph_cache(path: Optional[str] = None) -> None:
+    """
+    Сохраняет общий кэш разбора на диск.
+
+    :param path: Путь к файлу; по умолчанию MUTATO_MORPH_CACHE_PATH.
+    """
+    path = path or MORPH_CACHE_PATH
+    if path:
+        morph_cache.save(path)
+
+
+if MORPH_CACHE_PATH:
+    morph_cache.load(MORPH_CACHE_PATH)
+    atexit.register(save_morph_cache)
+
+# Предвычисленный индекс слов корпуса (см. scripts/build_morph_index.py)
+MORPH_INDEX_PATH = os.environ.get(
+    'MUTATO_MORPH_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'data', 'corpus.morph.idx')
+)
+
+morph_index = open_index(MORPH_INDEX_PATH)
+
+
+def analyze_word(word: str) -> MorphAnalysis:
+    """
+    Выполняет морфологический разбор слова за один проход Natasha.
+
+    Слова корпуса берутся из предвычисленного индекса morph_index (в этом
+    случае feats содержит только род), остальные размечаются теггером,
+    а результаты запоминаются в общем LRU-кэше morph_cache.
+
+    :param word: Входное слово (возможно с вопросительными знаками).
+    :return: MorphAnalysis с частью речи, родом и признаками.
+    """
+    return analyze_words([word])[0]
+
+
+def analyze_words(words: List[str]) -> List[MorphAnalysis]:
+    """
+    Пакетный вариант analyze_word: слова, которых нет ни в индексе, ни в кэше,
+    размечаются одним вызовом теггера.
+
+    :param words: Входные слова (возможно с вопросительными знаками).
+    :return: Список MorphAnalysis в том же порядке.
+    """
+    results: List[Optional[MorphAnalysis]] = [None] * len(words)
+    missing: Dict[str, List[int]] = {}
+    index_hits = 0
+    for i, word in enumerate(words):
+        clean_word = word.replace("?", "")
+        if clean_word in missing:
+            missing[clean_word].append(i)
+            continue
+        if morph_index is not None:
+            entry = morph_index.lookup(clean_word)
+            if entry is not None:
+                results[i] = index_analysis(clean_word, *entry)
+                index_hits += 1
+                continue
+        analysis = morph_cache.get(clean_word)
+        if analysis is None:
+            missing[clean_word] = [i]
+        else:
+            results[i] = analysis
+    if index_hits:
+        registry.inc('mutato_morph_index_hits_total', index_hits)
+
+    if missing:
+        for analysis in tag_words(list(missing)):
+            morph_cache.put(analysis.word, analysis)
+            for i in missing[analysis.word]:
+                results[i] = analysis
+    return results
+
+
+def index_analysis(clean_word: str, pos: Optional[str], gender: str) -> MorphAnalysis:
+    """
+    Строит MorphAnalysis из записи предвычисленного индекса.
+
+    :param clean_word: Слово без вопросительных знаков.
+    :param pos: Часть речи из индекса.
+    :param gender: Род из индекса.
+    :return: MorphAnalysis, где feats содержит только признак Gender.
+    """
+    feats = {"Gender": gender.capitalize()} if gender != "unknown" else {}
+    return MorphAnalysis(clean_word, pos, gender, feats)
+
+
+def tag_word(clean_word: str) -> MorphAnalysis:
+    """
+    Размечает очищенное слово теггером Natasha без обращения к кэшу.
+
+    :param clean_word: Слово без вопросительных знаков.
+    :return: MorphAnalysis с частью речи, родом и признаками.
+    """
+    return tag_words([clean_word])[0]
+
+
+def tag_words(clean_words: List[str]) -> List[MorphAnalysis]:
+    """
+    Размечает список очищенных слов одним пакетным вызовом теггера Natasha.
+
+    Каждое слово подаётся теггеру отдельным предложением, поэтому результат
+    совпадает с разбором слова по одному, но модель работает батчами.
+
+    :param clean_words: Слова без вопросительных знаков.
+    :return: Список MorphAnalysis в том же порядке.
+    """
+    if not clean_words:
+        return []
+    segmenter, morph_tagger = load_models()
+    started = time.perf_counter()
+    sentences = [[token.text for token in segmenter.tokenize(word)] for word in clean_words]
+    markups = iter(list(morph_tagger.map([tokens for tokens in sentences if tokens])))
+    registry.inc('mutato_tagger_calls_total')
+    registry.inc('mutato_tagger_words_total', len(clean_words))
+    registry.inc('mutato_tagger_seconds_total', time.perf_counter() - started)
+    results = []
+    for word, tokens in zip(clean_words, sentences):
+        if not tokens:
+            results.append(MorphAnalysis(word, None, "unknown", {}))
+            continue
+        token = next(markups).tokens[0]
+        feats = dict(token.feats or {})
+        gender = feats["Gender"].lower() if "Gender" in feats else "unknown"
+        results.append(MorphAnalysis(word, token.pos, gender, feats))
+    return results
+
+
+def get_pos_natasha(word: str) -> Optional[str]:
+    """
+    Определяет часть речи для одного слова с помощью библиотеки Natasha.
+
+    :param word: Входное слово (возможно с вопросительными знаками).
+    :return: Метка части речи или None.
+    """
+    return analyze_word(word).pos
+
+
+def get_pos(word: str) -> str:
+    """
+    Обёртка над get_pos_natasha: очищает слово и возвращает часть речи.
+
+    :param word: Входное слово (возможно с вопросительными знаками).
+    :return: Метка части речи или "Unknown".
+    """
+    clean_word = word.replace("?", "")
+    return get_pos_natasha(clean_word)
+
+
+def get_gender(word: str) -> str:
+    """
+    Определяет грамматический род существительного.
+
+    :param word: Существительное в именительном падеже.
+    :return: Метка рода: "masc", "fem", "neut" или "unknown".
+    """
+    return analyze_word(word).gender
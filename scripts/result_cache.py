@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import unicodedata
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Служебные файлы запуска, которые не относятся к результату и не кэшируются
+EXCLUDED_FILES = frozenset(('status.json',))
+ENTRY_FILE = 'entry.json'
+
+
+def make_key(words: Iterable[str], params: Dict[str, Any], seed: int, rules_version: str) -> str:
+    """
+    Строит ключ кэша по содержимому запроса.
+
+    Слова приводятся к форме Unicode NFC, параметры сериализуются с
+    отсортированными ключами, поэтому одинаковые запросы дают одинаковый ключ.
+
+    :param words: Начальные слова.
+    :param params: Параметры симуляции.
+    :param seed: Зерно генератора.
+    :param rules_version: Версия (дайджест) таблицы правил мутаций.
+    :return: Шестнадцатеричный SHA-256.
+    """
+    payload = {
+        'words': [unicodedata.normalize('NFC', word) for word in words],
+        'params': params,
+        'seed': seed,
+        'rules': rules_version,
+    }
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _link_tree(src: str, dst: str, exclude: frozenset = frozenset()) -> int:
+    """
+    Переносит дерево файлов жёсткими ссылками (или копированием, если ссылки
+    недоступны).
+
+    :return: Суммарный размер файлов в байтах.
+    """
+    total = 0
+    for root, _, files in os.walk(src):
+        relative = os.path.relpath(root, src)
+        target_root = os.path.normpath(os.path.join(dst, relative))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            if relative == '.' and name in exclude:
+                continue
+            source = os.path.join(root, name)
+            target = os.path.join(target_root, name)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+            total += os.path.getsize(target)
+    return total
+
+
+def _publish_tree(tmp_dir: str, dest_dir: str) -> None:
+    """
+    Переносит готовую временную папку на место dest_dir: одним
+    переименованием, если dest_dir пуста (POSIX), иначе по элементам.
+    """
+    try:
+        os.replace(tmp_dir, dest_dir)
+        return
+    except OSError:
+        pass
+    os.makedirs(dest_dir, exist_ok=True)
+    for name in os.listdir(tmp_dir):
+        os.replace(os.path.join(tmp_dir, name), os.path.join(dest_dir, name))
+    os.rmdir(tmp_dir)
+
+
+class ResultCache:
+    """
+    Кэш готовых результатов запусков, адресуемый по содержимому запроса.
+
+    Каждая запись — папка <root>/<key> с артефактами запуска и файлом
+    entry.json (размер, время создания). Запись публикуется атомарным
+    переименованием, поэтому читатели никогда не видят её наполовину.
+    Время изменения entry.json обновляется при каждом попадании, и при
+    превышении max_bytes вытесняются давно не использованные записи.
+    Счётчики попаданий и промахов ведутся в пределах процесса.
+    """
+
+    def __init__(self, root: str, max_bytes: int) -> None:
+        """
+        :param root: Папка кэша.
+        :param max_bytes: Предельный суммарный размер записей (0 — кэш отключён).
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def restore(self, key: str, dest_dir: str) -> bool:
+        """
+        Восстанавливает результат из кэша в папку запуска.
+
+        Файлы связываются во временную папку рядом с dest_dir и переносятся
+        в неё только целиком. Если запись вытеснена посреди копирования,
+        в папке запуска не остаётся ссылок на файлы кэша: иначе задача,
+        запущенная после промаха, перезаписала бы их на месте и испортила
+        общие с кэшем inode.
+
+        :param key: Ключ из make_key.
+        :param dest_dir: Папка запуска (пустая или ещё не созданная).
+        :return: True при попадании, False при промахе.
+        """
+        if not self.enabled:
+            return False
+        entry_dir = self._entry_dir(key)
+        entry_file = os.path.join(entry_dir, ENTRY_FILE)
+        tmp_dir = f"{os.path.normpath(dest_dir)}.restore-{uuid.uuid4().hex}"
+        try:
+            os.utime(entry_file)
+            _link_tree(entry_dir, tmp_dir, frozenset((ENTRY_FILE,)))
+        except FileNotFoundError:
+            # Записи нет или она была вытеснена во время копирования
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            with self._lock:
+                self.misses += 1
+            return False
+        _publish_tree(tmp_dir, dest_dir)
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key: str, src_dir: str) -> None:
+        """
+        Сохраняет артефакты запуска в кэш и при необходимости вытесняет старые записи.
+
+        :param key: Ключ из make_key.
+        :param src_dir: Папка завершённого запуска.
+        """
+        if not self.enabled:
+            return
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return
+        tmp_dir = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        size = _link_tree(src_dir, tmp_dir, EXCLUDED_FILES)
+        with open(os.path.join(tmp_dir, ENTRY_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'size': size, 'created': time.time()}, f)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Ту же запись параллельно сохранил другой процесс
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        with self._lock:
+            self.stores += 1
+        self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        try:
+            scanned = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return entries
+        for entry in scanned:
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            entry_file = os.path.join(entry.path, ENTRY_FILE)
+            try:
+                with open(entry_file, 'r', encoding='utf-8') as f:
+                    size = int(json.load(f)['size'])
+                last_used = os.stat(entry_file).st_mtime
+            except (OSError, ValueError, KeyError):
+                continue
+            entries.append((last_used, size, entry.path))
+        return entries
+
+    def size(self) -> Tuple[int, int]:
+        """
+        :return: Кортеж (число записей, суммарный размер в байтах).
+        """
+        entries = self._entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def evict(self) -> int:
+        """
+        Удаляет давно не использованные записи, пока размер кэша превышает max_bytes.
+
+        :return: Количество удалённых записей.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed:
+            with self._lock:
+                self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: Счётчики процесса и текущий размер кэша на диске.
+        """
+        entries, size_bytes = self.size()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'entries': entries,
+                'size_bytes': size_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def open_result_cache(root: Optional[str] = None, max_bytes: Optional[int] = None) -> ResultCache:
+    """
+    Создаёт кэш результатов с настройками из окружения.
+
+    :param root: Папка кэша (по умолчанию MUTATO_RESULT_CACHE_DIR или results/cache).
+    :param max_bytes: Предельный размер (по умолчанию MUTATO_RESULT_CACHE_BYTES или 512 МБ).
+    :return: ResultCache.
+    """
+    root = root or os.environ.get('MUTATO_RESULT_CACHE_DIR', os.path.join('results', 'cache'))
+    if max_bytes is None:
+        max_bytes = int(os.environ.get('MUTATO_RESULT_CACHE_BYTES', 512 * 1024 * 1024))
+    os.makedirs(root, exist_ok=True)
+    return ResultCache(root, max_bytes)
@@ -0,0 +1,247 @@
+import hashlib
+import json
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+CONSONANTS = frozenset("бвгджзйклмнпрстфхцчшщ")
+ACTIONS = frozenset(("append", "prepend", "replace_last", "replace_ending", "alternate"))
+DEFAULT_POS = "*"
+
+# Ключ-маркер конца суффикса в узле trie (пустая строка не может быть буквой)
+_END = ""
+
+
+class SuffixTrie:
+    """
+    Trie по перевёрнутым суффиксам: находит самое длинное правило чередования,
+    которым оканчивается слово, за один проход с конца слова.
+    """
+    __slots__ = ('_root',)
+
+    def __init__(self, mapping: Dict[str, str]) -> None:
+        """
+        :param mapping: Словарь {старый_суффикс: новый_суффикс}.
+        """
+        self._root: Dict[str, Any] = {}
+        for old, new in mapping.items():
+            node = self._root
+            for char in reversed(old):
+                node = node.setdefault(char, {})
+            node[_END] = (old, new)
+
+    def longest_match(self, word: str) -> Optional[Tuple[str, str]]:
+        """
+        :param word: Слово для проверки.
+        :return: Пара (старый_суффикс, новый_суффикс) с самым длинным совпадением или None.
+        """
+        node = self._root
+        best = None
+        for char in reversed(word):
+            node = node.get(char)
+            if node is None:
+                break
+            best = node.get(_END, best)
+        return best
+
+    def replace(self, word: str) -> str:
+        """
+        Применяет самое длинное подходящее чередование.
+
+        :param word: Слово для трансформации.
+        :return: Модифицированное слово или исходное, если правило не найдено.
+        """
+        match = self.longest_match(word)
+        if match is None:
+            return word
+        old, new = match
+        return word[:-len(old)] + new
+
+
+class WeightedChoice:
+    """
+    Взвешенный выбор по заранее посчитанным кумулятивным весам:
+    одно равномерное число из [0, 1) превращается в элемент бинарным поиском.
+    """
+    __slots__ = ('items', 'cumulative')
+
+    def __init__(self, items: Sequence[Any], weights: Sequence[float]) -> None:
+        """
+        :param items: Варианты выбора.
+        :param weights: Положительные веса вариантов.
+        :raises ValueError: если варианты пусты или веса не положительны.
+        """
+        if not items or len(items) != len(weights):
+            raise ValueError("Нужен хотя бы один вариант и по весу на каждый вариант.")
+        if any(weight <= 0 for weight in weights):
+            raise ValueError("Веса вариантов должны быть положительными.")
+        total = float(sum(weights))
+        cumulative = []
+        running = 0.0
+        for weight in weights:
+            running += weight
+            cumulative.append(running / total)
+        self.items = tuple(items)
+        self.cumulative = tuple(cumulative)
+
+    def pick(self, u: float) -> Any:
+        """
+        :param u: Равномерное случайное число из [0, 1).
+        :return: Выбранный вариант.
+        """
+        return self.items[min(bisect_right(self.cumulative, u), len(self.items) - 1)]
+
+
+class RuleCase:
+    """
+    Одна ветка типа мутации: условия применимости, действие и варианты аффиксов.
+    """
+    __slots__ = ('last_chars', 'genders', 'endings', 'needs_alternation', 'action', 'affixes', 'info')
+
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        """
+        :param spec: Описание ветки из таблицы правил.
+        :raises ValueError: при неизвестном действии или условии.
+        """
+        when = dict(spec.get("when", {}))
+        last = when.pop("last", None)
+        if last is None:
+            self.last_chars = None
+        elif last == "consonant":
+            self.last_chars = CONSONANTS
+        else:
+            self.last_chars = frozenset(last)
+        genders = when.pop("gender", None)
+        self.genders = frozenset(genders) if genders is not None else None
+        endings = when.pop("endswith", None)
+        self.endings = tuple(sorted(endings, key=len, reverse=True)) if endings else None
+        self.needs_alternation = bool(when.pop("alternation", False))
+        if when:
+            raise ValueError(f"Неизвестные условия правила: {sorted(when)}")
+
+        self.action = spec["action"]
+        if self.action not in ACTIONS:
+            raise ValueError(f"Неизвестное действие правила: {self.action}")
+        if self.action == "replace_ending" and not self.endings:
+            raise ValueError("Действие replace_ending требует условия endswith.")
+        affixes = spec["affixes"]
+        if isinstance(affixes, dict):
+            self.affixes = WeightedChoice(list(affixes), list(affixes.values()))
+        else:
+            self.affixes = WeightedChoice(affixes, [1] * len(affixes))
+        self.info = spec.get("info", "+{affix}")
+
+    def match(self, word: str, last: str, gender: str,
+              alternation: Optional[Tuple[str, str]]) -> Optional[str]:
+        """
+        Проверяет условия ветки.
+
+        :return: Совпавшее окончание ("" если условие endswith не задано) или None.
+        """
+        if self.last_chars is not None and last not in self.last_chars:
+            return None
+        if self.genders is not None and gender not in self.genders:
+            return None
+        if self.needs_alternation and alternation is None:
+            return None
+        if self.endings is None:
+            return ""
+        for ending in self.endings:
+            if word.endswith(ending):
+                return ending
+        return None
+
+
+class CompiledRules:
+    """
+    Таблица правил мутаций, скомпилированная в структуры для быстрого поиска:
+    взвешенный выбор типа мутации по части речи, ветки с условиями и trie
+    чередований согласных.
+
+    digest — SHA-256 канонической формы таблицы: меняется при любом изменении
+    правил и служит их версией для кэшей результатов.
+    """
+    __slots__ = ('version', 'digest', 'alternations', 'by_pos', 'default')
+
+    def __init__(self, version: Any, digest: str, alternations: SuffixTrie,
+                 by_pos: Dict[str, WeightedChoice], default: WeightedChoice) -> None:
+        self.version = version
+        self.digest = digest
+        self.alternations = alternations
+        self.by_pos = by_pos
+        self.default = default
+
+    def apply(self, word: str, pos: Optional[str], gender: str,
+              u_type: float, u_affix: float) -> Tuple[str, str]:
+        """
+        Применяет правила к слову.
+
+        :param word: Очищенное слово.
+        :param pos: Часть речи слова.
+        :param gender: Род слова ("masc", "fem", "neut" или "unknown").
+        :param u_type: Равномерное число из [0, 1) для выбора типа мутации.
+        :param u_affix: Равномерное число из [0, 1) для выбора аффикса.
+        :return: Кортеж (новая_форма, информация_о_мутации).
+        """
+        cases = self.by_pos.get(pos, self.default).pick(u_type)
+        last = word[-1:].lower()
+        alternation = None
+        for case in cases:
+            if case.needs_alternation and alternation is None:
+                alternation = self.alternations.longest_match(word)
+            ending = case.match(word, last, gender, alternation)
+            if ending is None:
+                continue
+            affix = case.affixes.pick(u_affix)
+            action = case.action
+            if action == "append":
+                new_word = word + affix
+            elif action == "prepend":
+                new_word = affix + word
+            elif action == "replace_last":
+                new_word = word[:-1] + affix
+            elif action == "replace_ending":
+                new_word = word[:-len(ending)] + affix
+            else:  # alternate
+                old, new = alternation
+                new_word = word[:-len(old)] + new + affix
+            return new_word, case.info.format(affix=affix, last=last)
+        return word, ""
+
+
+def _compile_types(types: Iterable[Dict[str, Any]]) -> WeightedChoice:
+    types = list(types)
+    compiled = [tuple(RuleCase(case) for case in spec["cases"]) for spec in types]
+    return WeightedChoice(compiled, [spec.get("weight", 1) for spec in types])
+
+
+def compile_rules(table: Dict[str, Any]) -> CompiledRules:
+    """
+    Компилирует декларативную таблицу правил.
+
+    :param table: Таблица правил (см. data/mutation_rules.json).
+    :return: CompiledRules.
+    :raises ValueError: если таблица некорректна или нет правил по умолчанию ("*").
+    """
+    by_pos = {pos: _compile_types(types) for pos, types in table["pos"].items()}
+    if DEFAULT_POS not in by_pos:
+        raise ValueError(f"В таблице правил нет правил по умолчанию ({DEFAULT_POS!r}).")
+    default = by_pos.pop(DEFAULT_POS)
+    canonical = json.dumps(table, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return CompiledRules(
+        table.get("version"),
+        hashlib.sha256(canonical.encode('utf-8')).hexdigest(),
+        SuffixTrie(table.get("alternations", {})),
+        by_pos,
+        default,
+    )
+
+
+def load_rules(path: str) -> CompiledRules:
+    """
+    Загружает и компилирует таблицу правил из JSON-файла.
+
+    :param path: Путь к JSON-файлу с правилами.
+    :return: CompiledRules.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return compile_rules(json.load(f))
@@ -0,0 +1,219 @@
+import argparse
+import io
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+
+try:
+    from .graph_store import MutationGraph
+    from .history import TextHistoryWriter
+    from .morphology import warm_up
+    from .simulation import Simulation, load_corpus
+except ImportError:
+    from graph_store import MutationGraph
+    from history import TextHistoryWriter
+    from morphology import warm_up
+    from simulation import Simulation, load_corpus
+
+
+class SimulationTask(NamedTuple):
+    """Параметры одной независимой симуляции для запуска в отдельном процессе."""
+    words: Tuple[str, ...]
+    num_generations: int = 20
+    mutation_rate: float = 0.3
+    max_nodes: int = 50
+    seed: Optional[int] = None
+
+
+class SimulationResult(NamedTuple):
+    """Результат одной симуляции: задача, граф и текст истории мутаций."""
+    task: SimulationTask
+    graph: MutationGraph
+    history: str
+    generations: int
+
+
+def run_task(task: SimulationTask) -> SimulationResult:
+    """
+    Выполняет одну симуляцию. Функция верхнего уровня, чтобы её можно было
+    передать в ProcessPoolExecutor.
+
+    :param task: Параметры симуляции.
+    :return: SimulationResult.
+    """
+    simulation = Simulation(
+        list(task.words),
+        num_generations=task.num_generations,
+        mutation_rate=task.mutation_rate,
+        max_nodes=task.max_nodes,
+        seed=task.seed,
+    )
+    buffer = io.StringIO()
+    with TextHistoryWriter(buffer) as history:
+        graph = simulation.run(history)
+    return SimulationResult(task, graph, buffer.getvalue(), simulation.generation)
+
+
+def _init_worker() -> None:
+    """Загружает собственные модели Natasha в каждом рабочем процессе."""
+    warm_up()
+
+
+def derive_seeds(seed: Optional[int], count: int) -> List[int]:
+    """
+    Выводит независимые зёрна для задач из одного базового зерна.
+
+    :param seed: Базовое зерно (None — случайное).
+    :param count: Количество зёрен.
+    :return: Список целых зёрен, одинаковый для одинакового базового зерна.
+    """
+    children = np.random.SeedSequence(seed).spawn(count)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+
+def split_words(words: Sequence[str], chunk_size: int) -> List[Tuple[str, ...]]:
+    """
+    Делит начальные слова на группы для независимых поддеревьев.
+
+    :param words: Начальные слова.
+    :param chunk_size: Количество слов в одной группе.
+    :return: Список групп в исходном порядке.
+    """
+    chunk_size = max(1, chunk_size)
+    return [tuple(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
+
+
+def run_tasks(tasks: Sequence[SimulationTask], max_workers: Optional[int] = None) -> List[SimulationResult]:
+    """
+    Запускает симуляции параллельно в пуле процессов.
+
+    Результаты возвращаются в порядке задач, а не завершения, поэтому итог
+    не зависит от числа процессов и планирования.
+
+    :param tasks: Задачи.
+    :param max_workers: Число процессов (по умолчанию — число ядер).
+    :return: Список SimulationResult в порядке задач.
+    """
+    if max_workers == 1 or len(tasks) <= 1:
+        return [run_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+        return list(executor.map(run_task, tasks))
+
+
+def merge_results(results: Iterable[SimulationResult]) -> Tuple[MutationGraph, str]:
+    """
+    Детерминированно объединяет графы и истории нескольких симуляций.
+
+    :param results: Результаты в нужном порядке.
+    :return: Кортеж (объединённый граф, объединённая история).
+    """
+    graph = MutationGraph()
+    histories = []
+    for result in results:
+        graph.merge(result.graph)
+        histories.append(result.history)
+    return graph, "".join(histories)
+
+
+def run_population(words: Sequence[str], chunk_size: int, num_generations: int = 20,
+                   mutation_rate: float = 0.3, max_nodes: int = 50,
+                   seed: Optional[int] = None,
+                   max_workers: Optional[int] = None) -> Tuple[MutationGraph, str]:
+    """
+    Разбивает начальные слова на группы, симулирует их параллельно и объединяет результат.
+
+    :param words: Начальные слова.
+    :param chunk_size: Количество начальных слов в одной задаче.
+    :param num_generations: Число поколений каждой задачи.
+    :param mutation_rate: Доля мутирующих узлов за поколение.
+    :param max_nodes: Предельное число узлов каждой задачи.
+    :param seed: Базовое зерно.
+    :param max_workers: Число процессов.
+    :return: Кортеж (объединённый граф, объединённая история).
+    """
+    groups = split_words(words, chunk_size)
+    tasks = [
+        SimulationTask(group, num_generations, mutation_rate, max_nodes, task_seed)
+        for group, task_seed in zip(groups, derive_seeds(seed, len(groups)))
+    ]
+    return merge_results(run_tasks(tasks, max_workers))
+
+
+def parameter_sweep(words: Sequence[str], grid: Dict[str, Sequence[Any]],
+                    seed: Optional[int] = None,
+                    max_workers: Optional[int] = None) -> List[SimulationResult]:
+    """
+    Запускает симуляции для всех сочетаний параметров из сетки.
+
+    Сочетания перебираются в порядке itertools.product по отсортированным
+    именам параметров, и каждому достаётся своё зерно из derive_seeds.
+
+    :param words: Начальные слова, общие для всех запусков.
+    :param grid: Значения параметров num_generations, mutation_rate и max_nodes.
+    :param seed: Базовое зерно.
+    :param max_workers: Число процессов.
+    :return: Список SimulationResult в порядке сочетаний.
+    :raises ValueError: если в сетке есть неизвестные параметры.
+    """
+    allowed = {'num_generations', 'mutation_rate', 'max_nodes'}
+    unknown = set(grid) - allowed
+    if unknown:
+        raise ValueError(f"Неизвестные параметры сетки: {sorted(unknown)}")
+    names = sorted(grid)
+    combinations = list(itertools.product(*(grid[name] for name in names)))
+    tasks = [
+        SimulationTask(tuple(words), seed=task_seed, **dict(zip(names, values)))
+        for values, task_seed in zip(combinations, derive_seeds(seed, len(combinations)))
+    ]
+    return run_tasks(tasks, max_workers)
+
+
+def _parse_values(text: str, cast) -> List[Any]:
+    return [cast(value) for value in text.split(',') if value]
+
+
+if __name__ == '__main__':
+    from visualization import save_graph
+
+    parser = argparse.ArgumentParser(description="Параллельный запуск симуляций мутаций.")
+    parser.add_argument('--seed', type=int, default=None, help="базовое зерно")
+    parser.add_argument('--words', type=int, default=100, help="сколько начальных слов взять из корпуса")
+    parser.add_argument('--chunk-size', type=int, default=5, help="начальных слов на одну задачу")
+    parser.add_argument('--workers', type=int, default=None, help="число процессов")
+    parser.add_argument('--generations', default='20', help="число поколений (через запятую для перебора)")
+    parser.add_argument('--rate', default='0.3', help="доля мутаций (через запятую для перебора)")
+    parser.add_argument('--max-nodes', default='50', help="лимит узлов (через запятую для перебора)")
+    parser.add_argument('--sweep', action='store_true', help="перебрать все сочетания параметров")
+    args = parser.parse_args()
+
+    full_corpus = load_corpus()
+    words = full_corpus.sample(args.words, random.Random(args.seed))
+    generations = _parse_values(args.generations, int)
+    rates = _parse_values(args.rate, float)
+    max_nodes = _parse_values(args.max_nodes, int)
+
+    if args.sweep:
+        results = parameter_sweep(
+            words,
+            {'num_generations': generations, 'mutation_rate': rates, 'max_nodes': max_nodes},
+            seed=args.seed,
+            max_workers=args.workers,
+        )
+        for result in results:
+            task = result.task
+            print(f"generations={task.num_generations} rate={task.mutation_rate} "
+                  f"max_nodes={task.max_nodes}: узлов {len(result.graph)}, "
+                  f"рёбер {result.graph.number_of_edges()}, поколений {result.generations}")
+    else:
+        graph, history = run_population(
+            words, args.chunk_size, generations[0], rates[0], max_nodes[0],
+            seed=args.seed, max_workers=args.workers,
+        )
+        os.makedirs('results', exist_ok=True)
+        with open(os.path.join('results', 'mutation_history.txt'), 'w', encoding='utf-8') as f:
+            f.write(history)
+        print(f"Узлов: {len(graph)}, рёбер: {graph.number_of_edges()}")
+        save_graph(graph.to_networkx())
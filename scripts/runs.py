@@ -0,0 +1,92 @@
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Optional, Tuple
+
+# Каждый запуск пишет результаты в собственную папку results/runs/<run_id>.
+# Папки на диске, а не в памяти, потому что их видят все воркеры gunicorn.
+RUNS_DIR = os.environ.get('MUTATO_RUNS_DIR', os.path.join('results', 'runs'))
+RUN_TTL = int(os.environ.get('MUTATO_RUN_TTL', 3600))
+CLEANUP_INTERVAL = 60
+
+_RUN_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+_cleanup_lock = threading.Lock()
+_last_cleanup = 0.0
+
+
+def is_valid_run_id(run_id: str) -> bool:
+    """
+    :param run_id: Идентификатор запуска из URL.
+    :return: True, если идентификатор имеет формат uuid4().hex.
+    """
+    return bool(_RUN_ID_RE.match(run_id))
+
+
+def new_run() -> Tuple[str, str]:
+    """
+    Создаёт папку для нового запуска и заодно удаляет устаревшие.
+
+    :return: Кортеж (run_id, путь_к_папке).
+    """
+    maybe_cleanup_runs()
+    run_id = uuid.uuid4().hex
+    path = os.path.join(RUNS_DIR, run_id)
+    os.makedirs(path)
+    return run_id, path
+
+
+def run_dir(run_id: str) -> Optional[str]:
+    """
+    :param run_id: Идентификатор запуска.
+    :return: Путь к папке запуска или None, если идентификатор некорректен
+        или запуск не найден (например, удалён по TTL).
+    """
+    if not is_valid_run_id(run_id):
+        return None
+    path = os.path.join(RUNS_DIR, run_id)
+    return path if os.path.isdir(path) else None
+
+
+def cleanup_runs(ttl: int = RUN_TTL, now: Optional[float] = None) -> int:
+    """
+    Удаляет папки запусков, изменённые раньше, чем ttl секунд назад.
+
+    :param ttl: Время жизни результатов в секундах.
+    :param now: Текущее время (для тестов и повторяемости).
+    :return: Количество удалённых запусков.
+    """
+    now = time.time() if now is None else now
+    try:
+        entries = list(os.scandir(RUNS_DIR))
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for entry in entries:
+        if not (entry.is_dir() and is_valid_run_id(entry.name)):
+            continue
+        try:
+            expired = now - entry.stat().st_mtime > ttl
+        except FileNotFoundError:
+            continue
+        if expired:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def maybe_cleanup_runs() -> int:
+    """
+    Запускает cleanup_runs не чаще одного раза в CLEANUP_INTERVAL секунд на процесс.
+
+    :return: Количество удалённых запусков.
+    """
+    global _last_cleanup
+    with _cleanup_lock:
+        now = time.time()
+        if now - _last_cleanup < CLEANUP_INTERVAL:
+            return 0
+        _last_cleanup = now
+    return cleanup_runs(now=now)
@@ -1,8 +1,340 @@
+import argparse
+import os
 import random
-from typing import List, Optional
-from mutation import mutate_word
-from visualization import plot_mutation_tree_static, plot_mutation_tree_interactive, save_graph
-import networkx as nx
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+import numpy as np
+
+try:
+    from .bloom import BloomFilter
+    from .corpus import CORPUS_PATH, Corpus
+    from .checkpoint import CHECKPOINT_FORMATS, has_checkpoint, read_checkpoint, write_checkpoint
+    from .graph_store import MutationGraph
+    from .history import (HISTORY_FORMATS, HistoryRecord, HistoryWriter, history_filename,
+                          open_history, truncate_history)
+    from .mutation import mutate_words, analyze_words, rules
+except ImportError:
+    from bloom import BloomFilter
+    from corpus import CORPUS_PATH, Corpus
+    from checkpoint import CHECKPOINT_FORMATS, has_checkpoint, read_checkpoint, write_checkpoint
+    from graph_store import MutationGraph
+    from history import (HISTORY_FORMATS, HistoryRecord, HistoryWriter, history_filename,
+                         open_history, truncate_history)
+    from mutation import mutate_words, analyze_words, rules
+
+# Политики совпадения мутанта с уже известным словом: merge и distinct
+# передаются графу (см. graph_store.CONVERGENCE_POLICIES), resample
+# повторяет мутацию, пока не получится новое слово.
+CONVERGENCE_POLICIES = ('merge', 'distinct', 'resample')
+# Сколько раз resample тянет новую мутацию, прежде чем отказаться от неё
+RESAMPLE_ATTEMPTS = 3
+# Способы проверки, встречалось ли слово: точный (таблица слов графа) или
+# фильтр Блума (постоянная память, только для distinct)
+MEMBERSHIP_MODES = ('exact', 'bloom')
+BLOOM_ERROR_RATE = 0.001
+# Контрольная точка переписывает весь граф и делает fsync, поэтому по
+# умолчанию она сохраняется не чаще раза в CHECKPOINT_SECONDS секунд,
+# а не каждое поколение; в конце запуска — всегда.
+CHECKPOINT_SECONDS = 60.0
+
+
+class GenerationDelta(NamedTuple):
+    """
+    Что добавило одно поколение: узлы с id в [node_start, node_stop) и рёбра
+    с индексами в [edge_start, edge_stop) графа симуляции.
+    """
+    generation: int
+    node_start: int
+    node_stop: int
+    edge_start: int
+    edge_stop: int
+
+
+class Simulation:
+    """
+    Воспроизводимая симуляция мутаций слов.
+
+    Все случайные решения берутся из собственного numpy.random.Generator:
+    при одинаковом seed и одинаковых начальных словах получается один и тот же
+    граф. Граф хранится в компактном MutationGraph, поэтому выбор слов для
+    мутации — это выбор целочисленных id; nx.DiGraph строится только при
+    экспорте через to_networkx.
+
+    Состояние (граф, состояние генератора, номер поколения, смещение истории)
+    сохраняется в контрольные точки; симуляция, возобновлённая через resume,
+    продолжается так же, как если бы не прерывалась.
+    """
+
+    def __init__(self, initial_words: List[str], num_generations: int = 20,
+                 mutation_rate: float = 0.3, max_nodes: int = 50,
+                 seed: Optional[int] = None, convergence: str = 'merge',
+                 membership: str = 'exact') -> None:
+        """
+        :param initial_words: Начальные слова.
+        :param num_generations: Максимальное число поколений.
+        :param mutation_rate: Доля узлов, мутирующих за поколение.
+        :param max_nodes: Предельное число узлов графа.
+        :param seed: Зерно генератора случайных чисел (None — случайное).
+        :param convergence: Что делать с мутантом, совпавшим с известным словом:
+            'merge' — ребро в существующий узел, 'distinct' — новый узел с тем же
+            словом, 'resample' — повторить мутацию (до RESAMPLE_ATTEMPTS раз,
+            затем отказаться от неё).
+        :param membership: 'exact' или 'bloom' — фильтр Блума вместо таблицы
+            слов для подсчёта совпадений (только при convergence='distinct').
+        :raises ValueError: при неизвестной или несовместимой политике.
+        """
+        if convergence not in CONVERGENCE_POLICIES:
+            raise ValueError(f"Неизвестная политика совпадений: {convergence}")
+        if membership not in MEMBERSHIP_MODES:
+            raise ValueError(f"Неизвестный способ проверки слов: {membership}")
+        if membership == 'bloom' and convergence != 'distinct':
+            raise ValueError("Фильтр Блума допустим только при convergence='distinct': "
+                             "слияние и повторная выборка требуют точной проверки.")
+        self.num_generations = num_generations
+        self.mutation_rate = mutation_rate
+        self.max_nodes = max_nodes
+        self.seed = seed
+        self.convergence = convergence
+        self.membership = membership
+        self.rng = np.random.default_rng(seed)
+        self.graph = MutationGraph('distinct' if convergence == 'distinct' else 'merge')
+        self.generation = 0
+        self.stop_reason: Optional[str] = None
+        # Смещение истории из контрольной точки, с которой возобновлена симуляция
+        self.history_offset: Optional[int] = None
+        # convergences — мутанты, совпавшие с известным словом; resampled —
+        # повторные мутации политики resample; rejected — мутации, от которых она отказалась
+        self.convergence_stats: Dict[str, int] = {'convergences': 0, 'resampled': 0, 'rejected': 0}
+        self._seen_filter: Optional[BloomFilter] = None
+
+        for word, analysis in zip(initial_words, analyze_words(initial_words)):
+            self.graph.add_node(word, analysis.pos)
+        self._reset_membership()
+
+    def _reset_membership(self) -> None:
+        """Заново заполняет фильтр Блума словами текущего графа."""
+        if self.membership != 'bloom':
+            return
+        self._seen_filter = BloomFilter(max(2 * self.max_nodes, len(self.graph), 1024), BLOOM_ERROR_RATE)
+        for word in self.graph.words:
+            self._seen_filter.add(word)
+
+    def _is_known(self, word: str) -> bool:
+        if self._seen_filter is not None:
+            return word in self._seen_filter
+        return word in self.graph
+
+    @classmethod
+    def from_graph(cls, graph: MutationGraph, generations: int = 20, mutation_rate: float = 0.3,
+                   max_nodes: int = 50, seed: Optional[int] = None, convergence: Optional[str] = None,
+                   membership: str = 'exact') -> 'Simulation':
+        """
+        Продолжает ранее сохранённый граф ещё несколькими поколениями.
+
+        Номера новых поколений продолжают нумерацию графа.
+
+        :param graph: Граф мутаций (например, из load_mutation_graph).
+        :param generations: Сколько поколений добавить.
+        :param mutation_rate: Доля узлов, мутирующих за поколение.
+        :param max_nodes: Предельное число узлов графа.
+        :param seed: Зерно генератора случайных чисел (None — случайное).
+        :param convergence: Политика совпадений (по умолчанию — политика графа).
+        :param membership: Способ проверки известных слов.
+        :return: Simulation поверх переданного графа.
+        :raises ValueError: если политика несовместима с графом.
+        """
+        convergence = convergence or graph.convergence
+        simulation = cls([], mutation_rate=mutation_rate, max_nodes=max_nodes, seed=seed,
+                         convergence=convergence, membership=membership)
+        if graph.convergence != simulation.graph.convergence:
+            raise ValueError(f"Граф сохранён с политикой совпадений {graph.convergence}, "
+                             f"а симуляция использует {convergence}.")
+        simulation.graph = graph
+        simulation.generation = max(max(graph.node_generation, default=0),
+                                    max(graph.edge_generation, default=0))
+        simulation.num_generations = simulation.generation + generations
+        simulation._reset_membership()
+        return simulation
+
+    def state(self) -> Dict[str, Any]:
+        """
+        :return: Состояние симуляции без графа (JSON-сериализуемое).
+        """
+        return {
+            'generation': self.generation,
+            'num_generations': self.num_generations,
+            'mutation_rate': self.mutation_rate,
+            'max_nodes': self.max_nodes,
+            'seed': self.seed,
+            'convergence': self.convergence,
+            'membership': self.membership,
+            'convergence_stats': dict(self.convergence_stats),
+            'rng_state': self.rng.bit_generator.state,
+            'rules': rules.digest,
+        }
+
+    def save_checkpoint(self, directory: str, history: Optional[HistoryWriter] = None,
+                        graph_format: str = 'binary') -> str:
+        """
+        Сохраняет контрольную точку симуляции.
+
+        История мутаций сбрасывается на диск, и её смещение записывается
+        в контрольную точку, чтобы при возобновлении отбросить записи поколений
+        после неё.
+
+        :param directory: Папка контрольной точки.
+        :param history: Приёмник истории мутаций или None.
+        :param graph_format: Формат файла графа: 'binary' или 'npz'.
+        :return: Путь к файлу состояния.
+        """
+        state = self.state()
+        if history is not None:
+            state['history_offset'] = history.checkpoint()
+            state['history_records'] = history.records_written
+        return write_checkpoint(directory, self.graph, state, graph_format)
+
+    @classmethod
+    def resume(cls, directory: str) -> 'Simulation':
+        """
+        Восстанавливает симуляцию из последней контрольной точки.
+
+        Смещение истории сохраняется в атрибуте history_offset (None, если
+        история не велась); файл истории нужно обрезать до него через
+        truncate_history и открыть с append=True.
+
+        :param directory: Папка контрольной точки.
+        :return: Simulation в состоянии на момент контрольной точки.
+        """
+        graph, state = read_checkpoint(directory)
+        if state.get('rules') != rules.digest:
+            print("Внимание: правила мутаций изменились после контрольной точки, "
+                  "продолжение не совпадёт с непрерывным запуском.")
+        simulation = cls(
+            [],
+            num_generations=state['num_generations'],
+            mutation_rate=state['mutation_rate'],
+            max_nodes=state['max_nodes'],
+            seed=state['seed'],
+            convergence=state.get('convergence', 'merge'),
+            membership=state.get('membership', 'exact'),
+        )
+        simulation.graph = graph
+        simulation.generation = state['generation']
+        simulation.rng.bit_generator.state = state['rng_state']
+        simulation.history_offset = state.get('history_offset')
+        simulation.convergence_stats.update(state.get('convergence_stats', {}))
+        simulation._reset_membership()
+        return simulation
+
+    def check_stop(self) -> Optional[str]:
+        """
+        :return: Причина остановки симуляции или None, если её можно продолжать.
+        """
+        if self.generation >= self.num_generations:
+            return f"Выполнено поколений: {self.num_generations}."
+        if len(self.graph) >= self.max_nodes:
+            return f"Достигнут лимит узлов ({self.max_nodes}), симуляция остановлена."
+        if not len(self.graph):
+            return "Граф пуст, мутации невозможны."
+        return None
+
+    def step(self, history: Optional[HistoryWriter] = None) -> int:
+        """
+        Выполняет одно поколение мутаций.
+
+        Id мутирующих узлов и пары чисел для выбора типа мутации и аффикса
+        вытягиваются из генератора одним пакетом на поколение. Совпадения
+        мутантов с известными словами обрабатываются по политике convergence
+        и учитываются в convergence_stats.
+
+        :param history: Приёмник истории мутаций или None.
+        :return: Количество мутаций, добавленных в граф.
+        """
+        graph = self.graph
+        n = len(graph)
+        count = min(max(1, int(n * self.mutation_rate)), n)
+        node_ids = self.rng.choice(n, size=count, replace=False).tolist()
+        draws = self.rng.random((count, 2)).tolist()
+        words = [graph.words[i] for i in node_ids]
+        generation = self.generation + 1
+        stats = self.convergence_stats
+        seen_filter = self._seen_filter
+        added = 0
+        for node_id, word, (new_word, pos, mutation_info) in zip(node_ids, words, mutate_words(words, draws)):
+            if self._is_known(new_word):
+                stats['convergences'] += 1
+                if self.convergence == 'resample':
+                    for _ in range(RESAMPLE_ATTEMPTS):
+                        stats['resampled'] += 1
+                        new_word, pos, mutation_info = mutate_words([word], self.rng.random((1, 2)).tolist())[0]
+                        if not self._is_known(new_word):
+                            break
+                    else:
+                        stats['rejected'] += 1
+                        continue
+            if history is not None:
+                history.write(HistoryRecord(generation, word, graph.pos(node_id), new_word, pos, mutation_info))
+            new_id = graph.add_node(new_word, pos, generation, node_id)
+            graph.add_edge(node_id, new_id, mutation_info, generation)
+            if seen_filter is not None:
+                seen_filter.add(new_word)
+            added += 1
+        self.generation = generation
+        return added
+
+    def iter_generations(self, history: Optional[HistoryWriter] = None) -> Iterator[GenerationDelta]:
+        """
+        Выполняет поколения, пока не сработает условие остановки, и после
+        каждого отдаёт добавленные им узлы и рёбра — например, чтобы
+        передавать граф клиенту по мере роста.
+
+        Причина остановки сохраняется в атрибуте stop_reason.
+
+        :param history: Приёмник истории мутаций или None.
+        :return: Итератор GenerationDelta.
+        """
+        while True:
+            self.stop_reason = self.check_stop()
+            if self.stop_reason is not None:
+                return
+            node_start, edge_start = len(self.graph), self.graph.number_of_edges()
+            self.step(history)
+            yield GenerationDelta(self.generation, node_start, len(self.graph),
+                                  edge_start, self.graph.number_of_edges())
+
+    def run(self, history: Optional[HistoryWriter] = None, checkpoint_dir: Optional[str] = None,
+            checkpoint_every: Optional[int] = None, graph_format: str = 'binary',
+            checkpoint_seconds: Optional[float] = CHECKPOINT_SECONDS) -> MutationGraph:
+        """
+        Выполняет поколения, пока не сработает одно из условий остановки.
+
+        Промежуточная контрольная точка сохраняется, когда с предыдущей прошло
+        checkpoint_every поколений или checkpoint_seconds секунд (что раньше);
+        после последнего поколения точка сохраняется всегда.
+        Причина остановки сохраняется в атрибуте stop_reason.
+
+        :param history: Приёмник истории мутаций или None.
+        :param checkpoint_dir: Папка контрольных точек или None (без них).
+        :param checkpoint_every: Через сколько поколений сохранять контрольную точку
+            или None (только по времени).
+        :param graph_format: Формат графа в контрольных точках.
+        :param checkpoint_seconds: Через сколько секунд сохранять контрольную точку
+            или None (только по числу поколений).
+        :return: Граф мутаций (для NetworkX — run().to_networkx()).
+        """
+        saved_generation, saved_at = self.generation, time.monotonic()
+        for _ in self.iter_generations(history):
+            if checkpoint_dir is None:
+                continue
+            due = checkpoint_every is not None and self.generation - saved_generation >= max(1, checkpoint_every)
+            if checkpoint_seconds is not None and time.monotonic() - saved_at >= checkpoint_seconds:
+                due = True
+            if due:
+                self.save_checkpoint(checkpoint_dir, history, graph_format)
+                saved_generation, saved_at = self.generation, time.monotonic()
+        if checkpoint_dir is not None:
+            self.save_checkpoint(checkpoint_dir, history, graph_format)
+        return self.graph
 
 
 def get_user_words() -> Optional[List[str]]:
@@ -33,19 +365,18 @@ def get_user_words() -> Optional[List[str]]:
     return None
 
 
-def load_corpus() -> List[str]:
+def load_corpus() -> Corpus:
     """
-    Загружает список слов из файла data/corpus.txt.
+    Открывает корпус data/corpus.txt (или MUTATO_CORPUS_PATH).
 
-    Файл читается построчно. Если файл пуст или не найден,
+    Корпус не читается в память: строки доступны через индекс смещений,
+    а выборка слов — через Corpus.sample. Если файл пуст или не найден,
     программа выводит сообщение об ошибке и завершает работу.
 
-    :raises FileNotFoundError: если файл не найден.
-    :return: Список слов из корпуса.
+    :return: Corpus.
     """
     try:
-        with open('data/corpus.txt', 'r', encoding='utf-8') as f:
-            full_corpus = f.read().splitlines()
+        full_corpus = Corpus(CORPUS_PATH)
     except FileNotFoundError:
         print("Файл corpus.txt не найден. Пожалуйста, добавьте файл в папку data.")
         exit(1)
@@ -58,47 +389,97 @@ def load_corpus() -> List[str]:
 
 # Основной блок исполнения
 if __name__ == '__main__':
-    # Получаем начальные слова
-    user_words = get_user_words()
-    if user_words is not None:
-        initial_corpus: List[str] = user_words
-    else:
-        full_corpus = load_corpus()
-        initial_corpus = random.sample(full_corpus, min(5, len(full_corpus)))
+    from visualization import compute_layout, plot_mutation_tree_static, plot_mutation_tree_interactive, save_graph
+    from graph_io import GRAPH_FORMATS, graph_filename, load_mutation_graph, save_mutation_graph
 
-    # Создаём направленный граф мутаций
-    G = nx.DiGraph()
+    parser = argparse.ArgumentParser(description="Симуляция мутаций слов.")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="зерно генератора для воспроизводимого запуска")
+    parser.add_argument('--history-format', choices=sorted(HISTORY_FORMATS), default='text',
+                        help="формат файла истории мутаций")
+    parser.add_argument('--gzip', action='store_true', help="сжимать историю gzip")
+    parser.add_argument('--graph-format', action='append', choices=sorted(GRAPH_FORMATS), default=[],
+                        help="дополнительный формат экспорта графа (можно указать несколько раз)")
+    parser.add_argument('--generations', type=int, default=20, help="число поколений")
+    parser.add_argument('--max-nodes', type=int, default=50, help="предельное число узлов графа")
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help="папка контрольных точек; если в ней уже есть точка, симуляция возобновляется")
+    parser.add_argument('--checkpoint-every', type=int, default=None,
+                        help="сохранять контрольную точку каждые N поколений")
+    parser.add_argument('--checkpoint-seconds', type=float, default=CHECKPOINT_SECONDS,
+                        help=f"сохранять контрольную точку каждые N секунд (по умолчанию {CHECKPOINT_SECONDS:g})")
+    parser.add_argument('--checkpoint-format', choices=CHECKPOINT_FORMATS, default='binary',
+                        help="формат графа в контрольных точках")
+    parser.add_argument('--extend', default=None, metavar='GRAPH',
+                        help="продолжить сохранённый граф (.npz, .mgb, .jsonl.gz, ...) ещё --generations поколениями")
+    parser.add_argument('--convergence', choices=CONVERGENCE_POLICIES, default=None,
+                        help="что делать с мутантом, совпавшим с известным словом (по умолчанию merge)")
+    parser.add_argument('--membership', choices=MEMBERSHIP_MODES, default='exact',
+                        help="проверка известных слов: точная или фильтром Блума (для distinct)")
+    args = parser.parse_args()
 
-    # Добавляем начальные слова в граф с их частями речи
-    for word in initial_corpus:
-        _, pos, _ = mutate_word(word)
-        G.add_node(word, pos=pos)
+    history_path = os.path.join('results', history_filename('mutation_history', args.history_format, args.gzip))
+    resuming = args.checkpoint_dir is not None and has_checkpoint(args.checkpoint_dir)
+    if resuming:
+        # Возобновление: история обрезается до контрольной точки и дописывается
+        simulation = Simulation.resume(args.checkpoint_dir)
+        if simulation.history_offset is not None and os.path.exists(history_path):
+            truncate_history(history_path, simulation.history_offset)
+        print(f"Симуляция возобновлена с поколения {simulation.generation}.")
+    elif args.extend is not None:
+        simulation = Simulation.from_graph(
+            load_mutation_graph(args.extend),
+            generations=args.generations,
+            mutation_rate=0.3,
+            max_nodes=args.max_nodes,
+            seed=args.seed,
+            convergence=args.convergence,
+            membership=args.membership,
+        )
+    else:
+        # Получаем начальные слова
+        user_words = get_user_words()
+        if user_words is not None:
+            initial_corpus: List[str] = user_words
+        else:
+            full_corpus = load_corpus()
+            initial_corpus = full_corpus.sample(5, random.Random(args.seed))
 
-    # Параметры симуляции
-    num_generations: int = 20
-    mutation_rate: float = 0.3
-    max_nodes: int = 50
+        # Параметры симуляции
+        simulation = Simulation(
+            initial_corpus,
+            num_generations=args.generations,
+            mutation_rate=0.3,
+            max_nodes=args.max_nodes,
+            seed=args.seed,
+            convergence=args.convergence or 'merge',
+            membership=args.membership,
+        )
 
     # Файл для истории мутаций
-    with open('results/mutation_history.txt', 'w', encoding='utf-8') as history_file:
-        for generation in range(num_generations):
-            if len(G.nodes) >= max_nodes:
-                print(f"Достигнут лимит узлов ({max_nodes}), симуляция остановлена.")
-                break
-            if not G.nodes:
-                print("Граф пуст, мутации невозможны.")
-                break
-            num_to_mutate = max(1, int(len(G.nodes) * mutation_rate))
-            words_to_mutate = random.sample(list(G.nodes), min(num_to_mutate, len(G.nodes)))
-            for word in words_to_mutate:
-                new_word, pos, mutation_info = mutate_word(word)
-                G.add_node(new_word, pos=pos)
-                G.add_edge(word, new_word, mutation=mutation_info)
-                history_file.write(f"{word} ({G.nodes[word]['pos']}) -> {new_word} ({pos}): {mutation_info}\n")
-
-    # Визуализация графа
-    plot_mutation_tree_static(G)
-    plot_mutation_tree_interactive(G)
+    with open_history(history_path, args.history_format, args.gzip, append=resuming) as history:
+        mutation_graph = simulation.run(
+            history,
+            checkpoint_dir=args.checkpoint_dir,
+            checkpoint_every=args.checkpoint_every,
+            graph_format=args.checkpoint_format,
+            checkpoint_seconds=args.checkpoint_seconds,
+        )
+    G = mutation_graph.to_networkx()
+    if simulation.generation < simulation.num_generations:
+        print(simulation.stop_reason)
+    stats = simulation.convergence_stats
+    print(f"Совпадений мутантов с известными словами ({simulation.convergence}): {stats['convergences']}, "
+          f"повторных мутаций: {stats['resampled']}, отклонено: {stats['rejected']}.")
+
+    # Визуализация графа: глубины и дерево раскладки берутся из индекса родословной
+    layout = compute_layout(G, lineage=mutation_graph.lineage())
+    plot_mutation_tree_static(G, layout=layout, show=True)
+    plot_mutation_tree_interactive(G, layout=layout, show=True)
 
     # Сохранение графа в файл
-    save_graph(G)
\ No newline at end of file
+    save_graph(G)
+    for fmt in args.graph_format:
+        graph_path = os.path.join('results', graph_filename('mutation_graph', fmt))
+        save_mutation_graph(mutation_graph, graph_path, fmt)
+        print(f"Граф сохранён в формате {fmt} по пути: {graph_path}")
\ No newline at end of file
@@ -1,170 +1,288 @@
+import heapq
 import networkx as nx
-import matplotlib.pyplot as plt
+import numpy as np
 import plotly.graph_objects as go
-from networkx.drawing.nx_agraph import graphviz_layout
 import os
-from typing import Optional
+import threading
+from matplotlib import cm
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+from typing import Dict, Hashable, List, Optional, Tuple, Union
 
-def plot_mutation_tree_static(graph: nx.DiGraph) -> None:
+try:
+    from .layout import GraphLayout, compute_layout
+except ImportError:
+    from layout import GraphLayout, compute_layout
+
+# Настройки статического рендеринга
+STATIC_FORMATS = ('png', 'svg', 'webp')
+STATIC_FORMAT = os.environ.get('MUTATO_STATIC_FORMAT', 'png')
+STATIC_DPI = int(os.environ.get('MUTATO_STATIC_DPI', 150))
+STATIC_FIGSIZE = (25.0, 18.0)
+# До этого числа узлов маркеры рисуются в полный размер
+DETAIL_NODES = 50
+# Пределы постоянных подписей на графах (уровень детализации)
+MAX_NODE_LABELS = 200
+MAX_EDGE_LABELS = 100
+
+def _word(graph: nx.DiGraph, node: Hashable) -> str:
+    """
+    :return: Слово узла: атрибут 'word' (узлы MutationGraph.to_networkx —
+        id) или сам узел для графов, где узлы названы словами.
+    """
+    return graph.nodes[node].get('word', node)
+
+
+def _label_budget(graph: nx.DiGraph, depths: Dict[Hashable, int], max_labels: int) -> List[Hashable]:
+    """
+    Выбирает узлы, которые получат подписи: все узлы, если их не больше
+    max_labels, иначе корни и узлы с наибольшей степенью.
+
+    :return: Список узлов для подписи.
+    """
+    nodes = list(graph.nodes)
+    if len(nodes) <= max_labels:
+        return nodes
+    return heapq.nlargest(max_labels, nodes, key=lambda node: (depths.get(node, 0) == 0, graph.degree(node)))
+
+
+def plot_mutation_tree_static(graph: nx.DiGraph, output_dir: Optional[str] = None,
+                              layout: Optional[GraphLayout] = None,
+                              fmt: str = STATIC_FORMAT, dpi: int = STATIC_DPI,
+                              figsize: Tuple[float, float] = STATIC_FIGSIZE,
+                              max_labels: int = MAX_NODE_LABELS,
+                              max_edge_labels: int = MAX_EDGE_LABELS,
+                              show: bool = False) -> Optional[str]:
     """
     Статично визуализирует дерево мутаций слов и сохраняет изображение.
 
-    :param graph: Направленный граф NetworkX с узлами-словами и атрибутами 'pos'.
-    :return: None. Сохраняет PNG в папке results/plots.
+    Рисует на холсте Agg без pyplot, поэтому работает на сервере без дисплея
+    и из нескольких потоков. Все рёбра — одна LineCollection, все узлы — один
+    scatter, а подписи ограничены по уровню детализации: на больших графах
+    подписываются только корни и самые ветвистые узлы, подписи рёбер
+    пропадают совсем. Время рендеринга растёт линейно с размером графа.
+
+    :param graph: Направленный граф NetworkX с атрибутами узлов 'word' и 'pos'.
+    :param output_dir: Папка для изображения (по умолчанию results/plots).
+    :param layout: Готовая раскладка (по умолчанию compute_layout(graph)).
+    :param fmt: Формат файла: 'png', 'svg' или 'webp'.
+    :param dpi: Разрешение растровых форматов.
+    :param figsize: Размер рисунка в дюймах.
+    :param max_labels: Наибольшее число подписей узлов.
+    :param max_edge_labels: Подписи рёбер рисуются, только если рёбер не больше.
+    :param show: Показать рисунок в окне (для запуска из консоли).
+    :return: Путь к сохранённому изображению или None, если граф пуст.
+    :raises ValueError: при неподдерживаемом формате.
     """
+    if fmt not in STATIC_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат изображения: {fmt}")
     if not graph.nodes:
         print("Граф пуст, визуализация невозможна.")
-        return
+        return None
 
-    output_dir = os.path.join(os.getcwd(), 'results', 'plots')
+    output_dir = output_dir or os.path.join(os.getcwd(), 'results', 'plots')
     os.makedirs(output_dir, exist_ok=True)
-    
-    fig = plt.figure(figsize=(25, 18), facecolor='#f0f0f0')
+
+    if show:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=figsize, facecolor='#f0f0f0')
+    else:
+        fig = Figure(figsize=figsize, facecolor='#f0f0f0')
+        FigureCanvasAgg(fig)
     ax = fig.add_subplot(111)
     ax.set_facecolor('#e6f3ff')
-    
-    pos = graphviz_layout(graph, prog='dot', args='-Granksep=3 -Gnodesep=2')
-    
-    depths = nx.shortest_path_length(graph, list(graph.nodes)[0]) if graph.nodes else {}
-    max_depth = max(depths.values()) if depths else 1
-    if max_depth == 0:
-        max_depth = 1
-
-    node_colors = [plt.cm.RdYlGn(depths.get(node, 0) / max_depth) for node in graph.nodes]
-    node_sizes = [3000 + 1000 * graph.degree(node) for node in graph.nodes]
-    
-    edge_colors = []
-    for u, v in graph.edges():
-        depth_u, depth_v = depths.get(u, 0), depths.get(v, 0)
-        avg = (depth_u + depth_v) / 2 / max_depth
-        edge_colors.append(plt.cm.coolwarm(avg))
-    
-    nx.draw_networkx_edges(
-        graph, pos,
-        edge_color=edge_colors,
-        arrows=True,
-        arrowstyle='->',
-        arrowsize=25,
-        width=2,
-        alpha=0.7
-    )
-    nx.draw_networkx_nodes(
-        graph, pos,
-        node_color=node_colors,
-        node_size=node_sizes,
+
+    layout = layout or compute_layout(graph)
+    pos, depths, max_depth = layout.positions, layout.depths, layout.max_depth
+
+    nodes = list(graph.nodes)
+    # Чем больше узлов, тем мельче маркеры, чтобы они не сливались в пятно
+    scale = min(1.0, DETAIL_NODES / len(nodes))
+    node_xy = np.array([pos[node] for node in nodes], dtype=float)
+    node_depth = np.array([depths.get(node, 0) for node in nodes], dtype=float) / max_depth
+    node_sizes = np.array([max(4.0, (3000 + 1000 * graph.degree(node)) * scale) for node in nodes])
+
+    edges = list(graph.edges())
+    if edges:
+        segments = np.array([(pos[u], pos[v]) for u, v in edges], dtype=float)
+        edge_depth = np.array(
+            [(depths.get(u, 0) + depths.get(v, 0)) / 2 for u, v in edges], dtype=float
+        ) / max_depth
+        ax.add_collection(LineCollection(
+            segments,
+            colors=cm.coolwarm(edge_depth),
+            linewidths=max(0.3, 2 * scale),
+            alpha=0.7,
+            zorder=1,
+        ))
+
+    ax.scatter(
+        node_xy[:, 0], node_xy[:, 1],
+        s=node_sizes,
+        c=node_depth,
+        cmap=cm.RdYlGn,
+        vmin=0, vmax=1,
         edgecolors='black',
-        linewidths=1.5,
-        alpha=0.9
-    )
-    
-    labels = {node: f"{node}\n({graph.nodes[node]['pos']})" for node in graph.nodes}
-    nx.draw_networkx_labels(
-        graph, pos,
-        labels=labels,
-        font_size=12,
-        font_weight='bold',
-        font_family='Arial',
-        font_color='black'
+        linewidths=1.5 * scale,
+        alpha=0.9,
+        zorder=2,
     )
-    
-    edge_labels = {(u, v): graph[u][v]['mutation'] for u, v in graph.edges()}
-    nx.draw_networkx_edge_labels(
-        graph, pos,
-        edge_labels=edge_labels,
-        font_size=10,
-        font_color='red'
-    )
-    
-    plt.title(
+
+    for node in _label_budget(graph, depths, max_labels):
+        x, y = pos[node]
+        ax.text(
+            x, y, f"{_word(graph, node)}\n({graph.nodes[node]['pos']})",
+            fontsize=12 if scale == 1.0 else 8,
+            fontweight='bold',
+            ha='center', va='center',
+            color='black',
+            zorder=3,
+        )
+
+    if len(edges) <= max_edge_labels:
+        for u, v in edges:
+            (x0, y0), (x1, y1) = pos[u], pos[v]
+            ax.text(
+                (x0 + x1) / 2, (y0 + y1) / 2, graph[u][v]['mutation'],
+                fontsize=10,
+                ha='center', va='center',
+                color='red',
+                bbox=dict(boxstyle='round', fc='white', ec='none', alpha=0.7),
+                zorder=3,
+            )
+
+    ax.autoscale_view()
+    ax.margins(0.05)
+    ax.set_title(
         "Дерево мутаций слов: Эволюция слов",
         fontsize=20,
         pad=30,
         fontweight='bold',
         color='#333333'
     )
-    
-    sm = plt.cm.ScalarMappable(
-        cmap=plt.cm.RdYlGn,
-        norm=plt.Normalize(vmin=0, vmax=max_depth)
-    )
-    plt.colorbar(sm, ax=ax, label='Глубина мутации', shrink=0.5, pad=0.02)
-    
-    plt.axis('off')
-    
-    static_path = os.path.join(output_dir, 'mutation_tree_static.png')
-    plt.savefig(static_path, dpi=300, bbox_inches='tight')
+
+    sm = cm.ScalarMappable(cmap=cm.RdYlGn, norm=Normalize(vmin=0, vmax=max_depth))
+    fig.colorbar(sm, ax=ax, label='Глубина мутации', shrink=0.5, pad=0.02)
+    ax.axis('off')
+
+    static_path = os.path.join(output_dir, f'mutation_tree_static.{fmt}')
+    fig.savefig(static_path, dpi=dpi, facecolor=fig.get_facecolor())
     print(f"Статичный график сохранён по пути: {static_path}")
-    plt.show()
+    if show:
+        import matplotlib.pyplot as plt
+        plt.show()
+    return static_path
+
+
+def ensure_plotly_js(static_dir: str) -> str:
+    """
+    Один раз копирует plotly.js из пакета plotly в папку статики, чтобы
+    HTML-графы ссылались на общий файл, а не встраивали его (~4.5 МБ) каждый.
 
+    Имя файла содержит версию plotly.js, поэтому после обновления plotly
+    браузеры не возьмут устаревшую копию из кэша.
 
-def plot_mutation_tree_interactive(graph: nx.DiGraph) -> None:
+    :param static_dir: Папка статических файлов веб-приложения.
+    :return: Имя файла plotly.js внутри static_dir.
+    """
+    filename = f"plotly-{get_plotlyjs_version()}.min.js"
+    path = os.path.join(static_dir, filename)
+    if not os.path.exists(path):
+        os.makedirs(static_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        os.replace(tmp_path, path)
+    return filename
+
+
+def plot_mutation_tree_interactive(graph: nx.DiGraph, output_dir: Optional[str] = None,
+                                   layout: Optional[GraphLayout] = None,
+                                   plotly_js: Union[bool, str] = True,
+                                   max_labels: int = MAX_NODE_LABELS,
+                                   max_edge_labels: int = MAX_EDGE_LABELS,
+                                   json_output: bool = False,
+                                   show: bool = False) -> Optional[str]:
     """
     Создаёт интерактивное дерево мутаций с помощью Plotly и сохраняет HTML-файл.
 
-    :param graph: Directed graph NetworkX с узлами и атрибутами 'pos'.
-    :return: None. Сохраняет HTML в results/plots.
+    Узлы и рёбра рисуются трассами Scattergl (WebGL), числа передаются
+    двоичными массивами, а мутации показываются во всплывающих подсказках
+    у середины рёбер вместо отдельной аннотации на каждое ребро. Подписи
+    видны постоянно только на небольших графах.
+
+    :param graph: Directed graph NetworkX с атрибутами узлов 'word' и 'pos'.
+    :param output_dir: Папка для HTML-файла (по умолчанию results/plots).
+    :param layout: Готовая раскладка (по умолчанию compute_layout(graph)).
+    :param plotly_js: Как подключить plotly.js: True — встроить в файл,
+        строка — URL общей копии (см. ensure_plotly_js).
+    :param max_labels: Подписи узлов видны постоянно, только если узлов не больше.
+    :param max_edge_labels: Подписи рёбер видны постоянно, только если рёбер не больше.
+    :param json_output: Дополнительно сохранить фигуру в JSON
+        (mutation_tree_interactive.json) для отрисовки на стороне клиента.
+    :param show: Открыть граф в браузере (для запуска из консоли).
+    :return: Путь к HTML-файлу или None, если граф пуст или не сохранён.
     """
     if not graph.nodes:
         print("Граф пуст, визуализация невозможна.")
-        return
+        return None
 
-    output_dir = os.path.join(os.getcwd(), 'results', 'plots')
+    output_dir = output_dir or os.path.join(os.getcwd(), 'results', 'plots')
     os.makedirs(output_dir, exist_ok=True)
-    
-    pos = graphviz_layout(graph, prog='dot', args='-Granksep=3 -Gnodesep=2')
-    depths = nx.shortest_path_length(graph, list(graph.nodes)[0]) if graph.nodes else {}
-    max_depth = max(depths.values()) if depths else 1
-    if max_depth == 0:
-        max_depth = 1
-
-    edge_x, edge_y, edge_text = [], [], []
-    annotations = []
-    for u, v in graph.edges():
-        x0, y0 = pos[u]
-        x1, y1 = pos[v]
-        edge_x += [x0, x1, None]
-        edge_y += [y0, y1, None]
-        mutation = graph[u][v]['mutation']
-        edge_text += [mutation, mutation, None]
-        mid_x, mid_y = (x0 + x1) / 2, (y0 + y1) / 2
-        annotations.append(
-            dict(
-                x=mid_x,
-                y=mid_y,
-                xref="x",
-                yref="y",
-                text=mutation,
-                showarrow=False,
-                font=dict(size=10, color="red"),
-                align="center"
-            )
-        )
 
-    edge_trace = go.Scatter(
-        x=edge_x,
-        y=edge_y,
+    layout = layout or compute_layout(graph)
+    pos, depths, max_depth = layout.positions, layout.depths, layout.max_depth
+
+    # Рёбра — одна линия с разрывами (NaN) между отрезками
+    edges = list(graph.edges())
+    edge_xy = np.full((len(edges) * 3, 2), np.nan)
+    mid_xy = np.empty((len(edges), 2))
+    edge_text = []
+    for i, (u, v) in enumerate(edges):
+        edge_xy[3 * i] = pos[u]
+        edge_xy[3 * i + 1] = pos[v]
+        mid_xy[i] = (edge_xy[3 * i] + edge_xy[3 * i + 1]) / 2
+        edge_text.append(graph[u][v]['mutation'])
+
+    edge_trace = go.Scattergl(
+        x=edge_xy[:, 0],
+        y=edge_xy[:, 1],
         mode='lines',
         line=dict(width=2, color='#888'),
-        hoverinfo='text',
-        text=edge_text,
+        hoverinfo='skip',
         opacity=0.7
     )
-    
-    node_x = [pos[node][0] for node in graph.nodes()]
-    node_y = [pos[node][1] for node in graph.nodes()]
-    node_colors = [depths.get(node, 0) / max_depth for node in graph.nodes()]
-    node_sizes = [20 + 10 * graph.degree(node) for node in graph.nodes()]
-    node_labels = [f"{node} ({graph.nodes[node]['pos']})" for node in graph.nodes()]
+    edge_label_trace = go.Scattergl(
+        x=mid_xy[:, 0],
+        y=mid_xy[:, 1],
+        mode='markers+text' if len(edges) <= max_edge_labels else 'markers',
+        text=edge_text,
+        textfont=dict(size=10, color='red'),
+        hoverinfo='text',
+        hovertext=[f"{_word(graph, u)} → {_word(graph, v)}<br>Мутация: {text}"
+                   for (u, v), text in zip(edges, edge_text)],
+        marker=dict(size=8, color='red', opacity=0.3)
+    )
+
+    nodes = list(graph.nodes())
+    node_xy = np.array([pos[node] for node in nodes], dtype=float)
+    node_colors = np.array([depths.get(node, 0) for node in nodes], dtype=float) / max_depth
+    scale = min(1.0, DETAIL_NODES / len(nodes))
+    node_sizes = np.array([max(4.0, (20 + 10 * graph.degree(node)) * scale) for node in nodes])
+    node_labels = [f"{_word(graph, node)} ({graph.nodes[node]['pos']})" for node in nodes]
     node_text = [
-        f"Слово: {node}<br>Часть речи: {graph.nodes[node]['pos']}<br>"
+        f"Слово: {_word(graph, node)}<br>Часть речи: {graph.nodes[node]['pos']}<br>"
         f"Глубина: {depths.get(node, 0)}<br>Степень: {graph.degree(node)}"
-        for node in graph.nodes()
+        for node in nodes
     ]
-    
-    node_trace = go.Scatter(
-        x=node_x,
-        y=node_y,
-        mode='markers+text',
+
+    node_trace = go.Scattergl(
+        x=node_xy[:, 0],
+        y=node_xy[:, 1],
+        mode='markers+text' if len(nodes) <= max_labels else 'markers',
         text=node_labels,
         textposition='top center',
         hoverinfo='text',
@@ -179,14 +297,15 @@ def plot_mutation_tree_interactive(graph: nx.DiGraph) -> None:
                 title=dict(text='Глубина'),
                 xanchor='left'
             ),
-            line=dict(width=2, color='black')
+            line=dict(width=2 * scale, color='black')
         ),
         opacity=0.9
     )
-    
+
     fig = go.Figure(
-        data=[edge_trace, node_trace],
+        data=[edge_trace, edge_label_trace, node_trace],
         layout=go.Layout(
+            template='none',
             title=dict(
                 text='Интерактивное дерево мутаций слов',
                 font=dict(size=24, color='#333333'),
@@ -200,7 +319,6 @@ def plot_mutation_tree_interactive(graph: nx.DiGraph) -> None:
             yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
             plot_bgcolor='#e6f3ff',
             paper_bgcolor='#f0f0f0',
-            annotations=annotations,
             dragmode='zoom',
             uirevision='true'
         )
@@ -221,23 +339,38 @@ def plot_mutation_tree_interactive(graph: nx.DiGraph) -> None:
 
     output_path = os.path.join(output_dir, 'mutation_tree_interactive.html')
     try:
-        fig.write_html(output_path, config=config)
+        fig.write_html(output_path, config=config, include_plotlyjs=plotly_js)
         print(f"Интерактивный граф сохранён по пути: {output_path}")
     except Exception as e:
         print("Ошибка при сохранении HTML-файла:", e)
-    
-    fig.show(config=config)
+        return None
+
+    if json_output:
+        json_path = os.path.join(output_dir, 'mutation_tree_interactive.json')
+        fig.write_json(json_path)
+        print(f"JSON интерактивного графа сохранён по пути: {json_path}")
+
+    if show:
+        fig.show(config=config)
+    return output_path
 
 
-def save_graph(graph: nx.DiGraph) -> None:
+def save_graph(graph: nx.DiGraph, output_dir: Optional[str] = None) -> None:
     """
     Сохраняет граф мутаций в формате GraphML.
 
     :param graph: NetworkX граф мутаций.
-    :return: None. Сохраняет файл в папке results.
+    :param output_dir: Папка для файла (по умолчанию results).
+    :return: None. Сохраняет файл в папке output_dir.
     """
-    output_dir = os.path.join(os.getcwd(), 'results')
+    output_dir = output_dir or os.path.join(os.getcwd(), 'results')
     os.makedirs(output_dir, exist_ok=True)
     graph_path = os.path.join(output_dir, 'mutation_graph.graphml')
+    if any(value is None for _, data in graph.nodes(data=True) for value in data.values()):
+        # GraphML не хранит None: узел без части речи записывается без атрибута 'pos'
+        graph = graph.copy()
+        for _, data in graph.nodes(data=True):
+            for key in [key for key, value in data.items() if value is None]:
+                del data[key]
     nx.write_graphml(graph, graph_path)
     print(f"Граф сохранён в формате GraphML по пути: {graph_path}")
\ No newline at end of file
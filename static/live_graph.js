@@ -0,0 +1,266 @@
+// Живой граф мутаций: читает поколения из потока /runs/<id>/events
+// (Server-Sent Events) и дорисовывает дерево в SVG по мере генерации.
+// Раскладка та же, что у серверного графа: по вертикали — глубина мутации,
+// по горизонтали — порядок листьев, родитель над серединой своих детей.
+//
+// Элементы SVG создаются один раз — для узлов и рёбер из очередного
+// поколения, и новый узел сразу встаёт под своим родителем, так что событие
+// стоит O(размер поколения). Полная раскладка пересчитывается не чаще раза
+// в RELAYOUT_MS, и в DOM меняются только координаты сдвинувшихся узлов.
+(function () {
+    "use strict";
+
+    const SVG_NS = "http://www.w3.org/2000/svg";
+    const MAX_LABELS = 100;        // больше узлов — подписи только во всплывающих подсказках
+    const MAX_EDGE_LABELS = 60;
+    const STEP_X = 120, STEP_Y = 90, PAD = 60;
+    const RELAYOUT_MS = 1000;
+    const PLASMA = ["#0d0887", "#6a00a8", "#b12a90", "#e16462", "#fca636", "#f0f921"];
+
+    function depthColor(depth, maxDepth) {
+        const t = maxDepth > 0 ? depth / maxDepth : 0;
+        return PLASMA[Math.min(PLASMA.length - 1, Math.round(t * (PLASMA.length - 1)))];
+    }
+
+    function element(name, attributes, text) {
+        const node = document.createElementNS(SVG_NS, name);
+        for (const key in attributes) {
+            node.setAttribute(key, attributes[key]);
+        }
+        if (text !== undefined) {
+            const title = document.createElementNS(SVG_NS, "title");
+            title.textContent = text;
+            node.appendChild(title);
+        }
+        return node;
+    }
+
+    class LiveGraph {
+        constructor(container) {
+            this.container = container;
+            this.nodes = [];        // [id, слово, часть речи, родитель, глубина]
+            this.edges = [];        // [источник, цель, мутация]
+            this.children = [];
+            this.roots = [];
+            this.generation = 0;
+            this.maxDepth = 0;
+            this.coloredDepth = 0;  // maxDepth, по которому раскрашены узлы
+            this.x = [];            // текущие координаты x узлов в DOM (в шагах раскладки)
+            this.width = 0;         // число колонок (листьев) раскладки
+            this.nodeElements = [];
+            this.edgeElements = [];
+            this.fresh = [];
+            this.pending = [];      // новые узлы и рёбра, ещё не попавшие в DOM
+            this.frame = null;
+            this.layoutTimer = null;
+            this.lastLayout = 0;
+            this.svg = null;
+        }
+
+        add(event) {
+            for (const node of event.nodes) {
+                this.nodes[node[0]] = node;
+                this.children[node[0]] = [];
+                (node[3] >= 0 ? this.children[node[3]] : this.roots).push(node[0]);
+                this.maxDepth = Math.max(this.maxDepth, node[4]);
+            }
+            this.edges.push(...event.edges);
+            this.generation = event.generation;
+            this.pending.push(event);
+            // Пачка событий (например, повтор завершённого запуска) — одна перерисовка
+            if (this.frame === null && typeof requestAnimationFrame === "function") {
+                this.frame = requestAnimationFrame(() => this.flush());
+            }
+        }
+
+        layout() {
+            // Обход в глубину без рекурсии: листья получают x по порядку,
+            // родитель — середину между крайними детьми
+            const children = this.children;
+            const x = new Array(this.nodes.length);
+            let leaf = 0;
+            const stack = this.roots.slice().reverse().map((id) => [id, false]);
+            while (stack.length) {
+                const [id, visited] = stack.pop();
+                const kids = children[id];
+                if (!kids.length) {
+                    x[id] = leaf++;
+                } else if (visited) {
+                    x[id] = (x[kids[0]] + x[kids[kids.length - 1]]) / 2;
+                } else {
+                    stack.push([id, true]);
+                    for (let i = kids.length - 1; i >= 0; i--) {
+                        stack.push([kids[i], false]);
+                    }
+                }
+            }
+            return {x: x, width: Math.max(leaf, 1)};
+        }
+
+        point(id) {
+            return [PAD + this.x[id] * STEP_X, PAD + this.nodes[id][4] * STEP_Y];
+        }
+
+        ensureSvg() {
+            if (this.svg === null) {
+                this.svg = element("svg", {preserveAspectRatio: "xMidYMin meet"});
+                this.edgeLayer = element("g", {class: "edges"});
+                this.nodeLayer = element("g", {class: "nodes"});
+                this.svg.append(this.edgeLayer, this.nodeLayer);
+                this.container.replaceChildren(this.svg);
+            }
+        }
+
+        flush() {
+            this.frame = null;
+            if (!this.pending.length) {
+                return;
+            }
+            this.ensureSvg();
+            const events = this.pending;
+            this.pending = [];
+
+            for (const id of this.fresh) {
+                this.nodeElements[id].group.classList.remove("new");
+            }
+            this.fresh = [];
+            for (const event of events) {
+                for (const node of event.nodes) {
+                    // До следующей раскладки узел стоит под родителем, корень — справа
+                    const parent = node[3];
+                    this.x[node[0]] = parent >= 0 ? this.x[parent] : this.width++;
+                    this.createNode(node);
+                    this.placeNode(node[0]);
+                }
+                for (const edge of event.edges) {
+                    this.createEdge(edge);
+                }
+            }
+            this.updateView();
+            this.scheduleLayout();
+        }
+
+        scheduleLayout() {
+            if (this.layoutTimer === null) {
+                const delay = Math.max(0, this.lastLayout + RELAYOUT_MS - Date.now());
+                this.layoutTimer = setTimeout(() => this.relayout(), delay);
+            }
+        }
+
+        relayout() {
+            // Таймер срабатывает и тогда, когда кадр отрисовки ещё не пришёл
+            // (вкладка в фоне): сначала дорисовываем принятые узлы, иначе
+            // у части id нет элементов. Пока layoutTimer не сброшен,
+            // flush не планирует ещё одну раскладку.
+            if (this.frame !== null) {
+                cancelAnimationFrame(this.frame);
+            }
+            this.flush();
+            this.layoutTimer = null;
+            this.lastLayout = Date.now();
+            const {x, width} = this.layout();
+            const previous = this.x;
+            this.x = x;
+            this.width = width;
+            const recolor = this.coloredDepth !== this.maxDepth;
+            this.coloredDepth = this.maxDepth;
+
+            // Сдвигаем только узлы, чья позиция изменилась, и их рёбра
+            const moved = new Set();
+            for (let id = 0; id < x.length; id++) {
+                if (previous[id] !== x[id]) {
+                    moved.add(id);
+                    this.placeNode(id);
+                }
+                if (recolor) {
+                    this.nodeElements[id].circle.setAttribute("fill", depthColor(this.nodes[id][4], this.maxDepth));
+                }
+            }
+            if (moved.size) {
+                for (const item of this.edgeElements) {
+                    if (moved.has(item.source) || moved.has(item.target)) {
+                        this.placeEdge(item);
+                    }
+                }
+            }
+            this.updateView();
+        }
+
+        updateView() {
+            this.svg.setAttribute("viewBox",
+                `0 0 ${2 * PAD + (Math.max(this.width, 1) - 1) * STEP_X} ${2 * PAD + this.maxDepth * STEP_Y}`);
+            this.svg.classList.toggle("no-labels", this.nodes.length > MAX_LABELS);
+            this.svg.classList.toggle("no-edge-labels", this.edges.length > MAX_EDGE_LABELS);
+        }
+
+        createNode([id, word, pos, , depth]) {
+            const group = element("g", {class: "node new"},
+                `Слово: ${word}\nЧасть речи: ${pos}\nГлубина: ${depth}`);
+            const circle = element("circle", {r: 10, fill: depthColor(depth, this.coloredDepth)});
+            const label = element("text", {});
+            label.textContent = `${word} (${pos})`;
+            group.append(circle, label);
+            this.nodeLayer.appendChild(group);
+            this.nodeElements[id] = {group: group, circle: circle, label: label};
+            this.fresh.push(id);
+        }
+
+        createEdge([source, target, mutation]) {
+            const words = `${this.nodes[source][1]} → ${this.nodes[target][1]}`;
+            const line = element("line", {class: "edge"}, `${words}\nМутация: ${mutation}`);
+            const label = element("text", {class: "edge-label"});
+            label.textContent = mutation;
+            this.edgeLayer.append(line, label);
+            const item = {source: source, target: target, line: line, label: label};
+            this.edgeElements.push(item);
+            this.placeEdge(item);
+        }
+
+        placeNode(id) {
+            const [cx, cy] = this.point(id);
+            const {circle, label} = this.nodeElements[id];
+            circle.setAttribute("cx", cx);
+            circle.setAttribute("cy", cy);
+            label.setAttribute("x", cx);
+            label.setAttribute("y", cy - 16);
+        }
+
+        placeEdge(item) {
+            const [x1, y1] = this.point(item.source), [x2, y2] = this.point(item.target);
+            item.line.setAttribute("x1", x1);
+            item.line.setAttribute("y1", y1);
+            item.line.setAttribute("x2", x2);
+            item.line.setAttribute("y2", y2);
+            item.label.setAttribute("x", (x1 + x2) / 2);
+            item.label.setAttribute("y", (y1 + y2) / 2);
+        }
+    }
+
+    // Подключает граф к потоку запуска. handlers: onStatus(status),
+    // onDone(status), onFailed(status), onGeneration(graph) — все необязательны.
+    // Сервер закрывает поток, когда в нём долго нет событий; EventSource
+    // переподключается сам и продолжает с последнего полученного поколения.
+    function connect(url, container, handlers) {
+        handlers = handlers || {};
+        const graph = new LiveGraph(container);
+        const source = new EventSource(url);
+        source.addEventListener("generation", (event) => {
+            graph.add(JSON.parse(event.data));
+            if (handlers.onGeneration) handlers.onGeneration(graph);
+        });
+        source.addEventListener("status", (event) => {
+            if (handlers.onStatus) handlers.onStatus(JSON.parse(event.data));
+        });
+        for (const name of ["done", "failed"]) {
+            source.addEventListener(name, (event) => {
+                // Иначе EventSource переподключится после закрытия потока сервером
+                source.close();
+                const handler = name === "done" ? handlers.onDone : handlers.onFailed;
+                if (handler) handler(JSON.parse(event.data));
+            });
+        }
+        return {graph: graph, source: source};
+    }
+
+    window.MutatoLiveGraph = {connect: connect, LiveGraph: LiveGraph};
+})();
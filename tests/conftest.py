@@ -0,0 +1,55 @@
+import os
+import random
+import sys
+
+import pytest
+
+# Тесты импортируют модули как пакет scripts, так же как app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.graph_store import MutationGraph  # noqa: E402
+
+POS = [None, 'NOUN', 'VERB', 'ADJ', 'ADV']
+
+
+def random_graph(seed: int, size: int = 200, convergence: str = 'merge') -> MutationGraph:
+    """
+    Строит случайный граф мутаций без симуляции и морфологии: несколько
+    начальных слов, потомки с повторяющимися словами (для 'distinct') и
+    узлы без части речи.
+    """
+    rng = random.Random(seed)
+    graph = MutationGraph(convergence)
+    for i in range(rng.randint(1, 5)):
+        graph.add_node(f"корень{i}", rng.choice(POS))
+    for generation in range(1, size):
+        parent = rng.randrange(len(graph))
+        word = f"слово{rng.randrange(size // 2)}"
+        node_id = graph.add_node(word, rng.choice(POS), generation, parent)
+        graph.add_edge(parent, node_id, f"мутация {rng.randrange(7)}", generation)
+    return graph
+
+
+def columns(graph: MutationGraph) -> dict:
+    """
+    :return: Столбцы графа в виде списков (строки мутаций вместо кодов)
+        для сравнения графов целиком.
+    """
+    return {
+        'words': graph.words,
+        'parent': list(graph.parent),
+        'node_generation': list(graph.node_generation),
+        'pos': [graph.pos(i) for i in range(len(graph))],
+        'root': list(graph.root),
+        'depth': list(graph.depth),
+        'edge_source': list(graph.edge_source),
+        'edge_target': list(graph.edge_target),
+        'edge_mutation': [graph.mutations[code] for code in graph.edge_mutation],
+        'edge_generation': list(graph.edge_generation),
+        'convergence': graph.convergence,
+    }
+
+
+@pytest.fixture(params=['merge', 'distinct'])
+def graph(request) -> MutationGraph:
+    return random_graph(1, convergence=request.param)
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from scripts.bloom import BloomFilter
+
+
+@pytest.mark.parametrize('error_rate', [0.01, 0.001])
+def test_no_false_negatives_and_error_rate_within_target(error_rate):
+    capacity = 20000
+    bloom = BloomFilter(capacity, error_rate)
+    words = [f"слово{i}" for i in range(capacity)]
+    for word in words:
+        bloom.add(word)
+
+    assert all(word in bloom for word in words)
+    trials = 200000
+    false_positives = sum(f"чужое{i}" in bloom for i in range(trials))
+    # Запас вдвое: доля ошибок — случайная величина около error_rate
+    assert false_positives / trials < 2 * error_rate
+
+
+def test_add_reports_repeats():
+    bloom = BloomFilter(100)
+    assert bloom.add('дом') is False
+    assert bloom.add('дом') is True
+    assert 'дом' in bloom and 'лес' not in bloom
+    assert len(bloom) == 1
+
+
+def test_positions_do_not_depend_on_hash_seed():
+    # В отличие от hash(), позиции одинаковы в любом процессе
+    script = (
+        "from scripts.bloom import BloomFilter\n"
+        "bloom = BloomFilter(1000)\n"
+        "for i in range(500): bloom.add(f'слово{i}')\n"
+        "print(bytes(bloom._bits).hex())\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    outputs = {
+        subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, check=True,
+                       env={**os.environ, 'PYTHONHASHSEED': seed}).stdout
+        for seed in ('1', '2')
+    }
+    assert len(outputs) == 1
+
+
+@pytest.mark.parametrize('capacity, error_rate', [(0, 0.01), (10, 0), (10, 1)])
+def test_invalid_parameters(capacity, error_rate):
+    with pytest.raises(ValueError):
+        BloomFilter(capacity, error_rate)
@@ -0,0 +1,104 @@
+import pytest
+
+# Симуляция размечает мутанты морфологическим анализатором
+pytest.importorskip('natasha')
+
+from scripts.checkpoint import CHECKPOINT_FORMATS, has_checkpoint  # noqa: E402
+from scripts.history import open_history, read_history, truncate_history  # noqa: E402
+from scripts.simulation import Simulation  # noqa: E402
+
+from conftest import columns  # noqa: E402
+
+WORDS = ['дом', 'лес', 'бежать', 'красный']
+POLICIES = [('merge', 'exact'), ('distinct', 'exact'), ('distinct', 'bloom'), ('resample', 'exact')]
+
+
+def simulation(convergence: str, membership: str) -> Simulation:
+    return Simulation(WORDS, num_generations=8, mutation_rate=0.5, max_nodes=10 ** 6,
+                      seed=7, convergence=convergence, membership=membership)
+
+
+def assert_same_run(resumed: Simulation, expected: Simulation) -> None:
+    assert columns(resumed.graph) == columns(expected.graph)
+    assert resumed.generation == expected.generation
+    assert resumed.convergence_stats == expected.convergence_stats
+    assert resumed.stop_reason == expected.stop_reason
+
+
+@pytest.mark.parametrize('graph_format', CHECKPOINT_FORMATS)
+@pytest.mark.parametrize('convergence, membership', POLICIES)
+def test_resume_matches_uninterrupted_run(convergence, membership, graph_format, tmp_path):
+    expected = simulation(convergence, membership)
+    expected.run()
+
+    interrupted = simulation(convergence, membership)
+    generations = interrupted.iter_generations()
+    for _ in range(3):
+        next(generations)
+    interrupted.save_checkpoint(str(tmp_path), graph_format=graph_format)
+
+    resumed = Simulation.resume(str(tmp_path))
+    assert resumed.generation == 3
+    assert columns(resumed.graph) == columns(interrupted.graph)
+    resumed.run()
+    assert_same_run(resumed, expected)
+
+
+def test_resume_truncates_history_to_checkpoint(tmp_path):
+    expected_path = str(tmp_path / 'expected.jsonl')
+    with open_history(expected_path, 'jsonl', buffer_size=3) as history:
+        expected = simulation('merge', 'exact')
+        expected.run(history)
+
+    # Обрыв после поколения 5: контрольная точка на поколении 4,
+    # а история успела записать и часть поколения 5
+    path = str(tmp_path / 'history.jsonl')
+    checkpoints = str(tmp_path / 'checkpoints')
+    history = open_history(path, 'jsonl', buffer_size=3)
+    interrupted = simulation('merge', 'exact')
+    for delta in interrupted.iter_generations(history):
+        if delta.generation == 4:
+            interrupted.save_checkpoint(checkpoints, history)
+        if delta.generation == 5:
+            break
+    history.close()
+    assert has_checkpoint(checkpoints)
+
+    resumed = Simulation.resume(checkpoints)
+    truncate_history(path, resumed.history_offset)
+    with open_history(path, 'jsonl', buffer_size=3, append=True) as history:
+        resumed.run(history)
+
+    assert_same_run(resumed, expected)
+    assert list(read_history(path)) == list(read_history(expected_path))
+
+
+def test_run_with_checkpoints_resumes_at_last_generation(tmp_path):
+    expected = simulation('distinct', 'exact')
+    expected.run(checkpoint_dir=str(tmp_path), checkpoint_every=3)
+
+    # Последняя контрольная точка — конец запуска: продолжать нечего
+    resumed = Simulation.resume(str(tmp_path))
+    resumed.run()
+    assert_same_run(resumed, expected)
+
+
+@pytest.mark.parametrize('checkpoint_every, checkpoint_seconds, saved', [
+    (None, 3600, [8]),
+    (3, 3600, [3, 6, 8]),
+    (None, 0, list(range(1, 9)) + [8]),
+])
+def test_checkpoint_interval(checkpoint_every, checkpoint_seconds, saved, tmp_path, monkeypatch):
+    # По умолчанию точка сохраняется по времени, а не каждое поколение;
+    # последняя сохраняется всегда
+    generations = []
+    save_checkpoint = Simulation.save_checkpoint
+
+    def counting_save(self, *args, **kwargs):
+        generations.append(self.generation)
+        return save_checkpoint(self, *args, **kwargs)
+
+    monkeypatch.setattr(Simulation, 'save_checkpoint', counting_save)
+    simulation('merge', 'exact').run(checkpoint_dir=str(tmp_path), checkpoint_every=checkpoint_every,
+                                     checkpoint_seconds=checkpoint_seconds)
+    assert generations == saved
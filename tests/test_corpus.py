@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from scripts import corpus as corpus_module
+from scripts.corpus import Corpus
+
+TEXT = (
+    "кот\n"
+    "\n"
+    "   \n"
+    "дом\r\n"
+    "\r\n"
+    "\t \r\n"
+    " 　\n"
+    "  лес  \n"
+    " \n"
+    "мир \n"
+    "река"
+)
+
+
+def expected_words(text: str):
+    return [word for word in (line.strip() for line in text.split('\n')) if word]
+
+
+@pytest.mark.parametrize('chunk_size', [3, 7, 64 * 1024])
+@pytest.mark.parametrize('text', [TEXT, TEXT + '\n', '\n \n'])
+def test_index_skips_blank_lines(tmp_path, monkeypatch, text, chunk_size):
+    monkeypatch.setattr(corpus_module, 'BUILD_CHUNK_SIZE', chunk_size)
+    path = tmp_path / 'corpus.txt'
+    path.write_bytes(text.encode('utf-8'))
+    words = expected_words(text)
+    with Corpus(str(path)) as corpus:
+        assert len(corpus) == len(words)
+        assert [corpus[i] for i in range(len(corpus))] == words
+        assert list(corpus) == words
+        assert [word for chunk in corpus.iter_chunks(2) for word in chunk] == words
+
+
+def test_sample_matches_random_sample(tmp_path):
+    path = tmp_path / 'corpus.txt'
+    path.write_bytes(TEXT.encode('utf-8'))
+    words = expected_words(TEXT)
+    with Corpus(str(path)) as corpus:
+        for seed in range(20):
+            assert corpus.sample(3, random.Random(seed)) == random.Random(seed).sample(words, 3)
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    path = tmp_path / 'corpus.txt'
+    path.write_text("кот\n", encoding='utf-8')
+    with Corpus(str(path)) as corpus:
+        assert len(corpus) == 1
+    path.write_text("кот\n  \nдом\n", encoding='utf-8')
+    with Corpus(str(path)) as corpus:
+        assert list(corpus) == ['кот', 'дом']
@@ -0,0 +1,37 @@
+import re
+
+from scripts.events import EventLog, iter_sse
+from scripts.jobs import DONE, RUNNING, write_status
+from scripts.simulation import GenerationDelta
+
+from conftest import random_graph
+
+
+def write_events(job_dir: str, graph) -> int:
+    with EventLog(job_dir) as events:
+        events.write(graph, GenerationDelta(0, 0, 3, 0, 0))
+        for generation, start in enumerate(range(3, len(graph), 10), 1):
+            stop = min(start + 10, len(graph))
+            events.write(graph, GenerationDelta(generation, start, stop, start - 3, stop - 3))
+    return generation + 1
+
+
+def test_stream_ends_with_done_and_resumes_from_last_event_id(tmp_path):
+    graph = random_graph(2, size=50, convergence='distinct')
+    count = write_events(str(tmp_path), graph)
+    write_status(str(tmp_path), DONE)
+
+    body = ''.join(iter_sse(str(tmp_path)))
+    ids = re.findall(r'^id: (\d+)$', body, re.M)
+    assert len(ids) == body.count('event: generation') == count
+    assert body.rstrip().split('\n\n')[-1].startswith('event: done')
+
+    resumed = ''.join(iter_sse(str(tmp_path), int(ids[1])))
+    assert re.findall(r'^id: (\d+)$', resumed, re.M) == ids[2:]
+
+
+def test_idle_stream_closes_without_done(tmp_path):
+    write_status(str(tmp_path), RUNNING, stage='layout')
+    body = ''.join(iter_sse(str(tmp_path), idle_seconds=0.3))
+    assert 'event: status' in body
+    assert 'event: done' not in body
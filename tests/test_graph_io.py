@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from scripts.graph_io import GRAPH_FORMATS, graph_filename, load_mutation_graph, save_mutation_graph
+from scripts.graph_store import MutationGraph
+
+from conftest import columns
+
+
+@pytest.fixture(params=sorted(GRAPH_FORMATS))
+def fmt(request) -> str:
+    if request.param == 'parquet':
+        pytest.importorskip('pyarrow')
+    return request.param
+
+
+def test_round_trip(graph, fmt, tmp_path):
+    path = save_mutation_graph(graph, str(tmp_path / graph_filename('graph', fmt)), fmt)
+    loaded = load_mutation_graph(path)
+    assert columns(loaded) == columns(graph)
+
+
+def test_round_trip_empty(fmt, tmp_path):
+    path = save_mutation_graph(MutationGraph(), str(tmp_path / graph_filename('graph', fmt)), fmt)
+    assert len(load_mutation_graph(path)) == 0
+
+
+def test_loaded_graph_can_grow(graph, fmt, tmp_path):
+    path = save_mutation_graph(graph, str(tmp_path / graph_filename('graph', fmt)), fmt)
+    loaded = load_mutation_graph(path)
+    node_id = loaded.add_node('новое', None, 99, 0)
+    loaded.add_edge(0, node_id, 'новая мутация', 99)
+    assert loaded.pos(node_id) is None
+    assert loaded.depth[node_id] == 1
+    assert loaded.mutations[loaded.edge_mutation[-1]] == 'новая мутация'
+
+
+def test_parquet_pos_is_nullable(graph, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = save_mutation_graph(graph, str(tmp_path / 'graph.parquet'))
+    pos = pq.read_table(f"{path}/nodes.parquet").column('pos').to_pylist()
+    assert pos == [graph.pos(i) for i in range(len(graph))]
+    assert None in pos
+    assert np.all(np.array(pos, dtype=object) != '')
@@ -0,0 +1,34 @@
+from scripts.graph_store import MutationGraph
+
+from conftest import random_graph
+
+
+def test_to_networkx_keeps_distinct_nodes_with_hash_in_word():
+    graph = MutationGraph('distinct')
+    first = graph.add_node('слово', 'NOUN')
+    second = graph.add_node('слово', 'NOUN', 1, first)
+    third = graph.add_node('слово#2', 'NOUN', 1, first)
+    graph.add_edge(first, second, 'повтор', 1)
+    graph.add_edge(first, third, 'суффикс', 1)
+
+    nx_graph = graph.to_networkx()
+    assert nx_graph.number_of_nodes() == 3
+    assert nx_graph.number_of_edges() == 2
+    assert [nx_graph.nodes[i]['word'] for i in range(3)] == ['слово', 'слово', 'слово#2']
+
+
+def test_to_networkx_matches_columns(graph):
+    nx_graph = graph.to_networkx()
+    assert list(nx_graph.nodes) == list(range(len(graph)))
+    for node_id in range(len(graph)):
+        assert nx_graph.nodes[node_id] == {'word': graph.words[node_id], 'pos': graph.pos(node_id)}
+    assert nx_graph.number_of_edges() == len(set(zip(graph.edge_source, graph.edge_target)))
+
+
+def test_lineage_tree_uses_networkx_keys():
+    graph = random_graph(3, convergence='distinct')
+    nx_graph = graph.to_networkx()
+    roots, depths, parents = graph.lineage().as_tree()
+    assert set(depths) == set(nx_graph.nodes)
+    assert all(nx_graph.has_edge(parent, child) for child, parent in parents.items())
+    assert all(depths[root] == 0 for root in roots)
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from scripts.jobs import (
+    DONE, FAILED, ORPHANED_ERROR, QUEUED, RUNNING, JobQueue,
+    fail_unfinished_jobs, is_orphaned, read_status, write_status,
+)
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_job_runs_to_done(tmp_path):
+    queue = JobQueue(max_workers=1)
+    finished = threading.Event()
+
+    def job(context, value):
+        context.progress('work', 1, 1)
+        context.stats['value'] = value
+        finished.set()
+
+    queue.submit(str(tmp_path), job, 42)
+    assert finished.wait(5)
+    queue.shutdown()
+    status = read_status(str(tmp_path))
+    assert status['status'] == DONE
+    assert status['stats'] == {'value': 42}
+    assert 'pid' not in status
+
+
+def test_running_status_of_live_process_is_kept(tmp_path):
+    write_status(str(tmp_path), RUNNING, stage='layout')
+    assert read_status(str(tmp_path))['status'] == RUNNING
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="pid не проверяется на Windows")
+def test_status_of_dead_process_becomes_failed(tmp_path):
+    write_status(str(tmp_path), QUEUED)
+    status_path = tmp_path / 'status.json'
+    status_path.write_text(status_path.read_text().replace(str(os.getpid()), str(dead_pid())))
+    status = read_status(str(tmp_path))
+    assert status['status'] == FAILED
+    assert status['error'] == ORPHANED_ERROR
+
+
+def test_old_status_of_live_process_is_not_orphaned():
+    # Задача в очереди или на долгом этапе не обновляет статус, но жива
+    status = {'status': QUEUED, 'updated': time.time() - 86400, 'pid': os.getpid()}
+    assert not is_orphaned(status)
+    assert not is_orphaned({**status, 'status': RUNNING})
+    assert not is_orphaned({**status, 'status': DONE, 'pid': None})
+
+
+def test_fail_unfinished_jobs(tmp_path):
+    for name, state in (('a', QUEUED), ('b', RUNNING), ('c', DONE)):
+        (tmp_path / name).mkdir()
+        write_status(str(tmp_path / name), state)
+    assert fail_unfinished_jobs(str(tmp_path)) == 2
+    assert [read_status(str(tmp_path / name))['status'] for name in 'abc'] == [FAILED, FAILED, DONE]
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from scripts.graph_store import MutationGraph
+from scripts.lineage import euler_intervals, lineage_columns
+
+from conftest import random_graph
+
+
+def brute_force(graph: MutationGraph) -> dict:
+    """
+    Родословная обходом родителей и рекурсивным обходом в глубину
+    (дети и корни — в порядке добавления).
+    """
+    n = len(graph)
+    chains = []
+    for node in range(n):
+        chain = []
+        current = graph.parent[node]
+        while current >= 0:
+            chain.append(current)
+            current = graph.parent[current]
+        chains.append(chain)
+    children = [[] for _ in range(n)]
+    for node in range(n):
+        if graph.parent[node] >= 0:
+            children[graph.parent[node]].append(node)
+
+    def walk(node):
+        yield node
+        for child in children[node]:
+            yield from walk(child)
+
+    return {
+        'chains': chains,
+        'subtrees': [list(walk(node)) for node in range(n)],
+        'roots': [node for node in range(n) if graph.parent[node] < 0],
+    }
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_index_matches_brute_force(seed):
+    graph = random_graph(seed, size=120, convergence='distinct')
+    expected = brute_force(graph)
+    index = graph.lineage()
+    n = len(graph)
+
+    for node in range(n):
+        chain = expected['chains'][node]
+        assert index.depth(node) == len(chain)
+        assert graph.words[graph.root[node]] == index.root(node) == graph.words[(chain or [node])[-1]]
+        assert index.ancestors(node) == [graph.words[i] for i in chain]
+        assert index.subtree_ids(node).tolist() == expected['subtrees'][node]
+        assert index.subtree_size(node) == len(expected['subtrees'][node])
+    for a in range(n):
+        descendants = set(expected['subtrees'][a])
+        for b in range(n):
+            assert index.is_ancestor(a, b) == (b in descendants)
+
+    assert index.roots() == [graph.words[r] for r in expected['roots']]
+    stats = index.root_stats()
+    assert [s.root for s in stats] == index.roots()
+    for stat, root in zip(stats, expected['roots']):
+        subtree = expected['subtrees'][root]
+        depths = [len(expected['chains'][i]) for i in subtree]
+        assert stat.nodes == len(subtree)
+        assert stat.leaves == sum(1 for i in subtree if len(expected['subtrees'][i]) == 1)
+        assert stat.max_depth == max(depths)
+        assert stat.mean_depth == pytest.approx(sum(depths) / len(depths))
+    assert sum(s.nodes for s in stats) == n
+
+
+def test_index_follows_graph_growth():
+    graph = random_graph(3, size=40)
+    index = graph.lineage()
+    assert index.subtree_size(0) == len(brute_force(graph)['subtrees'][0])
+    stats = index.root_stats()
+
+    leaf = graph.add_node('новое', 'NOUN', 41, 0)
+    graph.add_edge(0, leaf, 'мутация', 41)
+    expected = brute_force(graph)
+    assert index.subtree_ids(0).tolist() == expected['subtrees'][0]
+    assert index.is_ancestor(0, leaf) and not index.is_ancestor(leaf, 0)
+    assert index.root_stats()[0].nodes == stats[0].nodes + 1
+
+
+def test_deep_chain():
+    # Цепочка проверяет удвоение указателей на высоте, не равной степени двойки
+    graph = MutationGraph('distinct')
+    graph.add_node('слово0', 'NOUN')
+    for i in range(1, 1001):
+        graph.add_node(f"слово{i}", 'NOUN', i, i - 1)
+        graph.add_edge(i - 1, i, 'мутация', i)
+
+    parent = np.frombuffer(graph.parent, dtype=np.int32)
+    root, depth = lineage_columns(parent)
+    assert root.tolist() == [0] * 1001
+    assert depth.tolist() == list(range(1001))
+    tin, tout, order = euler_intervals(parent, depth)
+    assert tin.tolist() == order.tolist() == list(range(1001))
+    assert (tout == 1001).all()
+    assert graph.lineage().ancestors(1000) == [f"слово{i}" for i in range(999, -1, -1)]
+
+
+def test_empty_graph():
+    index = MutationGraph().lineage()
+    assert index.roots() == []
+    assert index.root_stats() == []
+    tin, tout, order = euler_intervals(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    assert len(tin) == len(tout) == len(order) == 0
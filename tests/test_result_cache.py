@@ -0,0 +1,63 @@
+import os
+
+from scripts import result_cache as result_cache_module
+from scripts.result_cache import ResultCache, make_key
+
+
+def make_run(path, files):
+    for name, content in files.items():
+        target = path / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content, encoding='utf-8')
+    (path / 'status.json').write_text('{}', encoding='utf-8')
+
+
+FILES = {'mutation_history.txt': 'кот -> кит', 'plots/mutation_tree_static.png': 'png', 'events.jsonl': '{}\n'}
+
+
+def test_store_and_restore(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), 1 << 20)
+    make_run(tmp_path / 'run', FILES)
+    key = make_key(['кот'], {}, 1, 'rules')
+    cache.store(key, str(tmp_path / 'run'))
+
+    dest = tmp_path / 'restored'
+    dest.mkdir()
+    assert cache.restore(key, str(dest))
+    restored = {str(p.relative_to(dest)): p.read_text(encoding='utf-8') for p in dest.rglob('*') if p.is_file()}
+    assert restored == FILES
+    assert sorted(os.listdir(tmp_path)) == ['cache', 'restored', 'run']
+
+
+def test_restore_miss_leaves_destination_untouched(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), 1 << 20)
+    dest = tmp_path / 'restored'
+    dest.mkdir()
+    assert not cache.restore('missing', str(dest))
+    assert os.listdir(dest) == []
+    assert cache.misses == 1
+
+
+def test_eviction_during_restore_leaves_no_linked_files(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / 'cache'), 1 << 20)
+    make_run(tmp_path / 'run', FILES)
+    key = make_key(['кот'], {}, 1, 'rules')
+    cache.store(key, str(tmp_path / 'run'))
+
+    link = os.link
+    calls = []
+
+    def evicting_link(source, target):
+        # Запись вытесняется после первого связанного файла
+        if calls:
+            cache.max_bytes = 1
+            cache.evict()
+        calls.append(source)
+        link(source, target)
+
+    monkeypatch.setattr(result_cache_module.os, 'link', evicting_link)
+    dest = tmp_path / 'restored'
+    dest.mkdir()
+    assert not cache.restore(key, str(dest))
+    assert os.listdir(dest) == []
+    assert sorted(os.listdir(tmp_path)) == ['cache', 'restored', 'run']